@@ -0,0 +1,71 @@
+"""
+Taille et temps d'encodage de la réponse /calc selon la disposition de courbe et le format.
+
+Usage (depuis api/) :
+    python bench/bench_calc_encoding.py [--runs 200] [--days 365]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services import encoding  # noqa: E402
+from services.calc import compute_projection  # noqa: E402
+from services.entries import normalize_entries  # noqa: E402
+
+
+def sample_entries():
+    return normalize_entries([
+        {"type": "income", "amount": 2500, "rec": "monthly", "cat": "fixed"},
+        {"type": "income", "amount": 180, "rec": "biweekly", "cat": "fixed"},
+        {"type": "expense", "amount": 950, "rec": "monthly", "cat": "fixed"},
+        {"type": "expense", "amount": 62.4, "rec": "weekly", "cat": "variable"},
+        {"type": "expense", "amount": 14.9, "rec": "every_n_days", "every_days": 3, "cat": "variable"},
+        {"type": "expense", "amount": 310, "rec": "monthly", "cat": "credit"},
+        {"type": "expense", "amount": 420, "rec": "quarterly", "cat": "fixed"},
+    ])
+
+
+def stdlib_json(obj):
+    # Encodage historique (json.dumps, comme JSONResponse)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timeit(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--days", type=int, default=365)
+    args = ap.parse_args()
+
+    result = compute_projection(1200.0, "€", args.days, sample_entries())
+
+    cases = [("points", "json (stdlib)", lambda: stdlib_json(result))]
+    for layout in encoding.CURVE_LAYOUTS:
+        for fmt in encoding.available_formats():
+            if fmt == "f32" and layout == "points":
+                continue
+            cases.append((layout, fmt, lambda layout=layout, fmt=fmt: encoding.encode_projection(result, layout, fmt)))
+
+    print(f"orjson: {'oui' if encoding.orjson else 'non'}   msgpack: {'oui' if encoding.msgpack else 'non'}")
+    print(f"{'courbe':<10} {'format':<14} {'octets':>8} {'médiane µs':>11} {'min µs':>8}")
+    for layout, fmt, fn in cases:
+        size = len(fn())
+        s = timeit(fn, args.runs)
+        print(f"{layout:<10} {fmt:<14} {size:>8} {statistics.median(s):>11.1f} {min(s):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Réduction de courbe (LTTB) : contrôle de conservation du minimum et des découverts,
+coût de la réduction, taille de la réponse /calc et du SVG du PDF.
+
+Usage (depuis api/) :
+    python bench/bench_downsample.py [--series 2000] [--max-points 120]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench.generators import calc_payload  # noqa: E402
+from services.calc import compute_projection  # noqa: E402
+from services.downsample import downsample_projection, lttb_indices  # noqa: E402
+from services.encoding import encode_projection  # noqa: E402
+from services.entries import normalize_entries  # noqa: E402
+
+
+def random_walk(rnd: random.Random, n: int):
+    value, out = rnd.uniform(-500, 3000), []
+    for _ in range(n):
+        if rnd.random() < 0.05:
+            value += rnd.choice((-1, 1)) * rnd.uniform(200, 2500)  # loyer, salaire...
+        value += rnd.uniform(-40, 25)
+        out.append(round(value, 2))
+    return out
+
+
+def check_invariants(series: int, max_points: int) -> int:
+    """Minimum global et premier passage sous zéro conservés, extrémités gardées."""
+    rnd = random.Random(0)
+    failures = 0
+    for _ in range(series):
+        values = random_walk(rnd, rnd.randint(max_points + 1, 3000))
+        kept = lttb_indices(values, max_points)
+        sampled = [values[i] for i in kept]
+        ok = (
+            len(kept) <= max_points
+            and kept == sorted(set(kept))
+            and kept[0] == 0 and kept[-1] == len(values) - 1
+            and min(sampled) == min(values)
+            and (min(values) >= 0) == (min(sampled) >= 0)
+            and (min(values) >= 0 or next(i for i, y in enumerate(values) if y < 0) in kept)
+        )
+        failures += not ok
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--series", type=int, default=2000)
+    ap.add_argument("--max-points", type=int, default=120)
+    args = ap.parse_args()
+
+    failures = check_invariants(args.series, args.max_points)
+    print(f"invariants sur {args.series} séries : {failures} échec(s)")
+
+    values = random_walk(random.Random(1), 100_000)
+    t0 = time.perf_counter()
+    lttb_indices(values, 1000)
+    print(f"LTTB 100 000 -> 1 000 points : {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    payload = calc_payload(200, 365, True)
+    result = compute_projection(
+        payload["base"], payload["currency"], 365, normalize_entries(payload["entries"]), payload["scenario"]
+    )
+    for layout in ("points", "columnar"):
+        full = len(encode_projection(result, layout))
+        reduced = len(encode_projection(downsample_projection(result, args.max_points), layout))
+        print(f"/calc 365 j {layout:<9}: {full:7d} o -> {reduced:7d} o avec max_points={args.max_points}")
+
+    try:
+        from services.pdf import _sparkline_svg
+    except (ImportError, OSError) as e:  # WeasyPrint sans Pango/Cairo
+        print(f"SVG ignoré : {e}")
+    else:
+        curve = result["curve"]
+        reduced = _sparkline_svg(curve)
+        full = _sparkline_svg(curve, px_per_point=1)
+        print(f"sparkline 365 j : {len(full)} o -> {len(reduced)} o")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
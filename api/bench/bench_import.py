@@ -0,0 +1,154 @@
+"""
+Import de relevés : temps de lecture + détection des récurrences sur un relevé
+synthétique (CSV au format banque française, ou OFX), et séries retrouvées.
+
+Profil réaliste : quelques achats carte par jour (--per-day) pour un budget
+courant mensuel donné (--monthly) ; le relevé couvre autant de jours qu'il faut
+pour atteindre --rows (2 ans au minimum). Solde courant en colonne CSV / LEDGERBAL
+OFX : la base et les dépenses courantes détectées sont comparées aux valeurs générées.
+
+Usage (depuis api/) :
+    python bench/bench_import.py [--rows 50000] [--format csv|ofx] [--repeat 3] [--per-day 4] [--monthly 650]
+"""
+import argparse
+import io
+import math
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.statement import import_statement  # noqa: E402
+
+# (libellé, montant signé, pas en jours ou "M" / "Q" / "Y", variation relative)
+RECURRING = [
+    ("VIR SEPA SALAIRE ACME SAS", 2450.00, "M", 0.0),
+    ("PRLV SEPA LOYER IMMO GESTION", -890.00, "M", 0.0),
+    ("PRLV SEPA EDF CLIENTS PARTICULIERS", -74.30, "M", 0.0),
+    ("PRLV SEPA FREE MOBILE", -19.99, "M", 0.0),
+    ("CB NETFLIX.COM", -13.49, "M", 0.0),
+    ("PRLV SEPA ECHEANCE PRET AUTO", -310.55, "M", 0.0),
+    ("PRLV SEPA ASSURANCE HABITATION", -96.00, "Q", 0.0),
+    ("PRLV TAXE FONCIERE DGFIP", -1140.00, "Y", 0.0),
+    ("VIR ALLOCATIONS CAF", 180.00, "M", 0.0),
+    ("CB MARCHE BIO DU SAMEDI", -42.00, 7, 0.15),
+    ("VIR EPARGNE LIVRET A", -100.00, 14, 0.0),
+]
+SHOPS = ["CARREFOUR", "AMAZON EU", "SNCF", "FNAC", "BOULANGERIE", "PHARMACIE", "TOTAL ENERGIES", "DECATHLON",
+         "UBER EATS", "LEROY MERLIN", "ZARA", "CINEMA", "RESTAURANT", "LIDL", "MONOPRIX"]
+
+
+OPENING_BALANCE = 1500.00
+CARD_SIGMA = 0.9  # dispersion (lognormale) des achats carte
+
+
+def synthetic_transactions(rows: int, per_day: float = 4.0, monthly: float = 650.0, seed: int = 0):
+    """Transactions (date, montant, libellé) du plus récent au plus ancien, et total des achats carte."""
+    rnd = random.Random(seed)
+    recurring_per_day = 20 / 30.44  # ordre de grandeur des lignes de RECURRING
+    span = max(730, math.ceil(rows / (per_day + recurring_per_day)))
+    end = date.today() - timedelta(days=1)
+    start = end - timedelta(days=span)
+    # Montant moyen d'un achat tel que per_day achats / jour font `monthly` par mois
+    mean = monthly / 30.44 / per_day
+    mu = math.log(mean) - CARD_SIGMA ** 2 / 2
+    txs = []
+    for label, amount, step, spread in RECURRING:
+        d = start + timedelta(days=rnd.randrange(28))
+        while d <= end:
+            value = round(amount * (1 + rnd.uniform(-spread, spread)), 2)
+            txs.append((d, value, label))
+            if step == "M":
+                d = (d.replace(day=1) + timedelta(days=32)).replace(day=min(d.day, 28))
+            elif step == "Q":
+                d = (d.replace(day=1) + timedelta(days=93)).replace(day=min(d.day, 28))
+            elif step == "Y":
+                d = d.replace(year=d.year + 1)
+            else:
+                d += timedelta(days=step)
+    card = 0.0
+    while len(txs) < rows:
+        d = start + timedelta(days=rnd.randrange(span + 1))
+        shop = rnd.choice(SHOPS)
+        amount = round(rnd.lognormvariate(mu, CARD_SIGMA), 2) or 0.01
+        card += amount
+        txs.append((d, -amount, f"CB {shop} {d:%d/%m} {rnd.randrange(10**6):06d}"))
+    txs.sort(key=lambda t: t[0])
+    # Solde après chaque opération, puis plus récent en premier, comme les exports bancaires
+    balance, out = OPENING_BALANCE, []
+    for d, amount, label in txs:
+        balance = round(balance + amount, 2)
+        out.append((d, amount, label, balance))
+    out.reverse()
+    return out, card
+
+
+def fr_amount(value: float) -> str:
+    return f"{value:.2f}".replace(".", ",")
+
+
+def to_csv(txs) -> bytes:
+    out = io.StringIO()
+    out.write("Date opération;Date valeur;Libellé;Débit;Crédit;Solde\n")
+    for d, amount, label, balance in txs:
+        value = fr_amount(abs(amount))
+        debit, credit = (value, "") if amount < 0 else ("", value)
+        out.write(f"{d:%d/%m/%Y};{d:%d/%m/%Y};{label};{debit};{credit};{fr_amount(balance)}\n")
+    return out.getvalue().encode("cp1252")
+
+
+def to_ofx(txs) -> bytes:
+    out = io.StringIO()
+    out.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nCHARSET:1252\n\n<OFX>\n<BANKMSGSRSV1><STMTTRNRS><STMTRS>\n<BANKTRANLIST>\n")
+    for i, (d, amount, label, _) in enumerate(txs):
+        out.write(f"<STMTTRN>\n<TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}\n<DTPOSTED>{d:%Y%m%d}\n"
+                  f"<TRNAMT>{amount:.2f}\n<FITID>{i}\n<NAME>{label[:32]}\n</STMTTRN>\n")
+    last_day, _, _, balance = txs[0]
+    out.write(f"</BANKTRANLIST>\n<LEDGERBAL><BALAMT>{balance:.2f}\n<DTASOF>{last_day:%Y%m%d}\n</LEDGERBAL>\n"
+              "</STMTRS></STMTTRNRS></BANKMSGSRSV1>\n</OFX>\n")
+    return out.getvalue().encode("cp1252")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--format", choices=("csv", "ofx"), default="csv")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--per-day", type=float, default=4.0, help="achats carte par jour")
+    ap.add_argument("--monthly", type=float, default=650.0, help="budget courant (achats carte) par mois")
+    args = ap.parse_args()
+
+    txs, card = synthetic_transactions(args.rows, args.per_day, args.monthly)
+    data = to_csv(txs) if args.format == "csv" else to_ofx(txs)
+    print(f"{args.format} : {len(txs)} transactions du {txs[-1][0]} au {txs[0][0]}, "
+          f"{len(data) / 1024 / 1024:.1f} Mo")
+
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        result = import_statement(io.BytesIO(data))
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    print(f"import : min {min(timings):.0f} ms, max {max(timings):.0f} ms")
+
+    tracemalloc.start()
+    import_statement(io.BytesIO(data))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"pic mémoire Python : {peak / 1024 / 1024:.1f} Mo (fichier : {len(data) / 1024 / 1024:.1f} Mo)")
+
+    print(f"\n{len(result['recurring'])} séries détectées / {len(RECURRING)} générées :")
+    for e in result["recurring"]:
+        print(f"  {e['rec']:<10} {e['type']:<8} {e['cat']:<9} {e['amount']:>9.2f}  {e['label']} ({e['occurrences']}x)")
+    # Contrôle : achats carte générés ramenés au mois, sur la même période que l'import
+    months = result["everyday_spending"]["months"]
+    print(f"dépenses courantes : {result['everyday_spending']['monthly']:.2f} / mois "
+          f"(générées : {card / months:.2f} / mois sur {months} mois)")
+    print(f"base : {result['request']['base']:.2f} (solde généré : {txs[0][3]:.2f})")
+
+
+if __name__ == "__main__":
+    main()
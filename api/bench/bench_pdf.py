@@ -0,0 +1,87 @@
+"""
+Latence par PDF : rendu "à froid" (comportement historique) vs rendu préchauffé.
+
+Usage (depuis api/) :
+    python bench/bench_pdf.py [--runs 20] [--days 365]
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from weasyprint import CSS, HTML  # noqa: E402
+
+from services import pdf  # noqa: E402
+
+
+def sample_payload(days: int):
+    start = date.today()
+    curve = [
+        {"date": (start + timedelta(days=d)).isoformat(), "balance": 1500.0 + 40 * ((d % 30) - 15) - 3 * d}
+        for d in range(days + 1)
+    ]
+    return {
+        "meta": {"currency": "€", "horizon_days": days, "generated_at": "2025-01-01T00:00:00Z"},
+        "summary": {
+            "score": 72,
+            "level": "jaune",
+            "message": "Base saine",
+            "kpi": {"inc": 2500, "total_exp": 2100, "fix": 1200, "vari": 600, "cred": 300,
+                    "debt_pct": 12, "reste_a_vivre": 400, "save_pct": 16},
+        },
+        "milestones": {"m1": 1400, "m6": 900, "m12": 300},
+        "curve": curve,
+        "breakdown": {
+            "by_category": [{"label": "Fixe", "amount": 1200}, {"label": "Variable", "amount": 600},
+                            {"label": "Crédit", "amount": 300}],
+            "by_recurring": [{"label": "Mensuel", "amount": 2100}],
+        },
+        "tips": ["Augmente l’épargne mensuelle."],
+    }
+
+
+def render_cold(data):
+    """Rendu historique : CSS, polices et templates résolus à chaque appel."""
+    ctx = pdf._merge_defaults(data)
+    cur = ctx["meta"]["currency"]
+    ctx["fmt"] = lambda v: pdf._fmt_money(v, cur)
+    ctx["sparkline_svg"] = pdf._sparkline_svg(ctx.get("curve", []))
+    page1 = pdf._env.get_template("page1.html").render(**ctx)
+    page2 = pdf._env.get_template("page2.html").render(**ctx)
+    css = CSS(filename=str(pdf.TEMPLATES_DIR / "base.css"))
+    html = HTML(string=page1 + '<p style="page-break-before: always"></p>' + page2, base_url=str(pdf.TEMPLATES_DIR))
+    return html.write_pdf(stylesheets=[css])
+
+
+def timeit(fn, data, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(data)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--days", type=int, default=365)
+    args = ap.parse_args()
+
+    data = sample_payload(args.days)
+    t0 = time.perf_counter()
+    pdf.warmup()
+    print(f"warmup: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    for label, fn in (("avant (à froid)", render_cold), ("après (préchauffé)", pdf.render_pdf)):
+        fn(data)  # premier rendu hors mesure
+        s = timeit(fn, data, args.runs)
+        print(f"{label:<20} médiane {statistics.median(s):7.1f} ms   min {min(s):7.1f} ms   max {max(s):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
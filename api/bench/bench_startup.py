@@ -0,0 +1,165 @@
+"""
+Démarrage à froid de l'API par rôle (SERENITY_ROLE) : temps d'import par module,
+durée du cycle de vie (lifespan) et mémoire résidente du worker et de ses
+processus enfants (pools PDF / calcul).
+
+Chaque mesure tourne dans un interpréteur neuf (`python -X importtime`).
+
+Usage (depuis api/) :
+    python bench/bench_startup.py [--roles all,calc,pdf] [--repeat 3] [--top 12] [--prewarm] [--out startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+API_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(API_DIR))
+
+PROJECT_PACKAGES = ("main", "routers", "services")
+
+# Exécuté dans le processus mesuré : une ligne JSON sur stdout
+CHILD = r"""
+import asyncio, json, os, sys, time
+
+def rss_kb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def children_rss_kb():
+    me, total, count = str(os.getpid()), 0, 0
+    for pid in os.listdir("/proc") if os.path.isdir("/proc") else ():
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as fh:
+                ppid = fh.read().rsplit(")", 1)[1].split()[1]
+        except (OSError, IndexError):
+            continue
+        if ppid == me:
+            total += rss_kb(pid)
+            count += 1
+    return total, count
+
+out = {}
+t0 = time.perf_counter()
+import main
+out["import_s"] = time.perf_counter() - t0
+out["rss_import_kb"] = rss_kb()
+out["weasyprint_loaded"] = "weasyprint" in sys.modules
+# Les processus de pool héritent de -X importtime : leurs imports ne comptent pas ici
+sys.stderr.flush()
+os.dup2(os.open(os.devnull, os.O_WRONLY), 2)
+
+async def lifespan():
+    t1 = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        out["lifespan_s"] = time.perf_counter() - t1
+        out["rss_ready_kb"] = rss_kb()
+        out["children_rss_kb"], out["children"] = children_rss_kb()
+
+if LIFESPAN:
+    try:
+        asyncio.run(lifespan())
+    except BaseException as e:
+        out["lifespan_error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(out))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Lignes `import time: self | cumulé | module` -> [(module, self_us, cumulé_us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us), int(cumulative)))
+    return rows
+
+
+def run_role(role: str, lifespan: bool, prewarm: bool) -> Dict[str, Any]:
+    env = {**os.environ, "SERENITY_ROLE": role}
+    if prewarm:
+        env["SERENITY_PDF_PREWARM"] = "1"
+    code = CHILD.replace("if LIFESPAN:", f"if {lifespan!r}:")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(API_DIR), env=env, capture_output=True, text=True, timeout=300,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["?"]
+        return {"error": tail[0]}
+    result = json.loads(lines[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize_imports(imports: List[Tuple[str, int, int]], top: int) -> Dict[str, Any]:
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in imports:
+        by_package[name.split(".")[0]] += self_us
+    project = {
+        name: round(cumulative / 1000.0, 1)
+        for name, _, cumulative in imports
+        if name.split(".")[0] in PROJECT_PACKAGES
+    }
+    packages = sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+    return {
+        "modules": len(imports),
+        "packages_ms": {name: round(us / 1000.0, 1) for name, us in packages},
+        "project_cumulative_ms": dict(sorted(project.items(), key=lambda kv: -kv[1])[:top]),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--roles", default="all,calc,pdf")
+    ap.add_argument("--repeat", type=int, default=3, help="mesures par rôle (on garde l'import le plus rapide)")
+    ap.add_argument("--top", type=int, default=12)
+    ap.add_argument("--no-lifespan", action="store_true", help="import seul, sans démarrer les pools")
+    ap.add_argument("--prewarm", action="store_true", help="SERENITY_PDF_PREWARM=1 (pool PDF démarré au lancement)")
+    ap.add_argument("--out", type=Path, help="résultats JSON")
+    args = ap.parse_args()
+
+    report: Dict[str, Any] = {}
+    for role in args.roles.split(","):
+        runs = [run_role(role, not args.no_lifespan, args.prewarm) for _ in range(max(1, args.repeat))]
+        ok = [r for r in runs if "error" not in r]
+        if not ok:
+            print(f"\n[{role}] échec : {runs[0]['error']}")
+            report[role] = {"error": runs[0]["error"]}
+            continue
+        best = min(ok, key=lambda r: r["import_s"])
+        entry = {k: v for k, v in best.items() if k != "imports"}
+        entry.update(summarize_imports(best["imports"], args.top))
+        report[role] = entry
+
+        print(f"\n[{role}] import {entry['import_s'] * 1000:.0f} ms ({entry['modules']} modules), "
+              f"RSS {entry['rss_import_kb'] / 1024:.1f} Mo, WeasyPrint chargé : {'oui' if entry['weasyprint_loaded'] else 'non'}")
+        if "lifespan_s" in entry:
+            print(f"  démarrage (lifespan) {entry['lifespan_s'] * 1000:.0f} ms, RSS prêt {entry['rss_ready_kb'] / 1024:.1f} Mo, "
+                  f"enfants {entry['children']} ({entry['children_rss_kb'] / 1024:.1f} Mo)")
+        if "lifespan_error" in entry:
+            print(f"  démarrage en échec : {entry['lifespan_error']}")
+        print("  import par paquet (self, ms) : " + ", ".join(f"{k} {v}" for k, v in entry["packages_ms"].items()))
+        print("  modules du projet (cumulé, ms) : " + ", ".join(f"{k} {v}" for k, v in entry["project_cumulative_ms"].items()))
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"\nRésultats écrits dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()
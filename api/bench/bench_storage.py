@@ -0,0 +1,117 @@
+"""
+Charge sur services.storage : débit d'écriture (événements groupés vs commit par ligne,
+snapshots) et latence de lecture des snapshots sous lecteurs concurrents.
+
+Usage (depuis api/) :
+    python bench/bench_storage.py [--events 50000] [--snapshots 2000] [--readers 16] [--reads 2000]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.storage import SQL_INSERT_EVENT, Storage  # noqa: E402
+
+
+def sample_budget(i: int):
+    rnd = random.Random(i)
+    return {
+        "base": rnd.randint(0, 5000),
+        "currency": "€",
+        "horizon_days": 90,
+        "entries": [
+            {"type": rnd.choice(["income", "expense"]), "amount": round(rnd.uniform(5, 2000), 2),
+             "rec": rnd.choice(["monthly", "weekly", "oneoff"]), "cat": rnd.choice(["fixed", "variable", "credit"])}
+            for _ in range(rnd.randint(3, 30))
+        ],
+    }
+
+
+def bench_events_per_row(db: Storage, n: int) -> float:
+    # Référence : un commit par événement
+    conn = db.connection()
+    t0 = time.perf_counter()
+    for i in range(n):
+        with conn:
+            conn.execute(SQL_INSERT_EVENT, (time.time(), "bench_row", f"v{i % 500}", None))
+    return n / (time.perf_counter() - t0)
+
+
+def bench_events_batched(db: Storage, n: int) -> float:
+    db.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        while not db.log_event("bench_batch", f"v{i % 500}"):
+            time.sleep(0.001)  # file pleine : on laisse le writer rattraper
+    db.flush(timeout=60)
+    return n / (time.perf_counter() - t0)
+
+
+def bench_snapshots(db: Storage, n: int, owners: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        # Un budget sur deux est un doublon : stocké une seule fois
+        db.save_snapshot(f"user{i % owners}", "budget", sample_budget(i // 2))
+    return n / (time.perf_counter() - t0)
+
+
+def bench_reads(db: Storage, readers: int, reads: int, owners: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def reader(seed: int):
+        rnd = random.Random(seed)
+        local = []
+        for _ in range(reads):
+            t0 = time.perf_counter()
+            db.latest_snapshot(f"user{rnd.randrange(owners)}")
+            local.append((time.perf_counter() - t0) * 1000.0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=50000)
+    ap.add_argument("--snapshots", type=int, default=2000)
+    ap.add_argument("--owners", type=int, default=500)
+    ap.add_argument("--readers", type=int, default=16)
+    ap.add_argument("--reads", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Storage(Path(tmp) / "bench.db")
+        per_row = bench_events_per_row(db, min(args.events, 5000))
+        batched = bench_events_batched(db, args.events)
+        print(f"événements, commit par ligne : {per_row:10.0f} écritures/s")
+        print(f"événements, commit groupé    : {batched:10.0f} écritures/s  ({db.batches} lots)")
+
+        rate = bench_snapshots(db, args.snapshots, args.owners)
+        blobs = db.connection().execute("SELECT COUNT(*), SUM(size), SUM(raw_size) FROM blobs").fetchone()
+        print(f"snapshots                    : {rate:10.0f} écritures/s  ({blobs[0]} blobs, "
+              f"{blobs[1] / 1024:.0f} Ko compressés / {blobs[2] / 1024:.0f} Ko bruts)")
+
+        throughput, p50, p99 = bench_reads(db, args.readers, args.reads, args.owners)
+        print(f"lectures ({args.readers} threads)         : {throughput:10.0f} lectures/s  "
+              f"p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+        db.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Budgets synthétiques reproductibles pour les benchmarks (graine fixe par taille).
+"""
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+RECURRENCES = (
+    ("monthly", 40),
+    ("weekly", 15),
+    ("biweekly", 8),
+    ("every_n_days", 5),
+    ("quarterly", 6),
+    ("yearly", 4),
+    ("last_business_day", 4),
+    ("oneoff", 18),
+)
+CATEGORIES = (("fixed", 45), ("variable", 40), ("credit", 15))
+
+SCENARIO = {"var_mul": 0.9, "extra_income": 150.0, "extra_credit": 80.0}
+NO_SCENARIO = {"var_mul": 1.0, "extra_income": 0.0, "extra_credit": 0.0}
+
+
+def _weighted(rnd: random.Random, table):
+    values, weights = zip(*table)
+    return rnd.choices(values, weights=weights)[0]
+
+
+def synthetic_entries(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n` lignes brutes (forme Entry) : ~1/4 de revenus, récurrences et catégories mélangées."""
+    rnd = random.Random(seed * 100_003 + n)
+    today = date.today()
+    entries = []
+    for _ in range(n):
+        income = rnd.random() < 0.25
+        rec = _weighted(rnd, RECURRENCES)
+        e: Dict[str, Any] = {
+            "type": "income" if income else "expense",
+            "amount": round(rnd.uniform(100, 3000) if income else rnd.lognormvariate(3.5, 1.0), 2),
+            "rec": rec,
+            "cat": "fixed" if income else _weighted(rnd, CATEGORIES),
+        }
+        if rnd.random() < 0.7:
+            e["start"] = (today + timedelta(days=rnd.randint(-60, 200))).isoformat()
+        if rnd.random() < 0.1:
+            e["end"] = (today + timedelta(days=rnd.randint(30, 400))).isoformat()
+        if rec == "every_n_days":
+            e["every_days"] = rnd.randint(2, 21)
+        entries.append(e)
+    return entries
+
+
+def calc_payload(n: int, horizon_days: int, scenario: bool, seed: int = 0) -> Dict[str, Any]:
+    """Corps de requête /calc complet."""
+    return {
+        "base": 1500.0,
+        "currency": "€",
+        "horizon_days": horizon_days,
+        "entries": synthetic_entries(n, seed),
+        "scenario": dict(SCENARIO if scenario else NO_SCENARIO),
+    }
+
+
+def pdf_payload(days: int) -> Dict[str, Any]:
+    """Payload d'export PDF avec une courbe de `days` + 1 points."""
+    start = date.today()
+    curve = [
+        {"date": (start + timedelta(days=d)).isoformat(), "balance": 1500.0 + 40 * ((d % 30) - 15) - 3 * d}
+        for d in range(days + 1)
+    ]
+    return {
+        "meta": {"currency": "€", "horizon_days": days, "generated_at": "2025-01-01T00:00:00Z"},
+        "summary": {
+            "score": 72,
+            "level": "jaune",
+            "message": "Base saine",
+            "kpi": {"inc": 2500, "total_exp": 2100, "fix": 1200, "vari": 600, "cred": 300,
+                    "debt_pct": 12, "reste_a_vivre": 400, "save_pct": 16},
+        },
+        "milestones": {"m1": 1400, "m6": 900, "m12": 300},
+        "curve": curve,
+        "breakdown": {
+            "by_category": [{"label": "Fixe", "amount": 1200}, {"label": "Variable", "amount": 600},
+                            {"label": "Crédit", "amount": 300}],
+            "by_recurring": [{"label": "Mensuel", "amount": 2100}],
+        },
+        "tips": ["Augmente l’épargne mensuelle."],
+    }
@@ -0,0 +1,212 @@
+"""
+Suite de benchmarks calc / PDF, résultats JSON et comparaison à une référence.
+
+Usage (depuis api/) :
+    python bench/run_suite.py --out bench/results.json
+    python bench/run_suite.py --quick --baseline bench/baseline.json --threshold 0.15
+
+Cas mesurés :
+    calc.<n>x<horizon>[.scn]      compute_projection (n lignes, avec/sans scénario)
+    calc.<...>.stage.<span>       sous-étapes (spans de services.metrics)
+    http.calc.<n>x<horizon>       POST /api/calc de bout en bout (client ASGI local, cache vidé)
+    pdf.render.<jours>            render_pdf (petite / grande courbe), si WeasyPrint est disponible
+
+Avec --baseline, toute médiane plus lente que la référence de plus de `threshold`
+(et d'au moins --min-delta-ms) est signalée et le code de sortie vaut 1.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench.generators import calc_payload, pdf_payload  # noqa: E402
+from services.calc import compute_projection  # noqa: E402
+from services.entries import normalize_entries  # noqa: E402
+from services.metrics import collect_spans  # noqa: E402
+
+SIZES = (10, 100, 1000, 5000)
+HORIZONS = (30, 90, 365)
+QUICK_SIZES = (10, 1000)
+QUICK_HORIZONS = (90, 365)
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "runs": len(ordered),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "min_ms": round(ordered[0], 4),
+    }
+
+
+def measure(fn: Callable[[], Any], min_runs: int, min_seconds: float) -> List[float]:
+    """Répète `fn` au moins `min_runs` fois et au moins `min_seconds` (après un appel de chauffe)."""
+    fn()
+    samples = []
+    t_end = time.perf_counter() + min_seconds
+    while len(samples) < min_runs or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+        if len(samples) >= 10_000:
+            break
+    return samples
+
+
+def bench_calc(results: Dict[str, Any], sizes, horizons, min_runs: int, min_seconds: float) -> None:
+    for n in sizes:
+        for horizon in horizons:
+            for with_scenario in (False, True):
+                payload = calc_payload(n, horizon, with_scenario)
+                entries = normalize_entries(payload["entries"])
+                name = f"calc.{n}x{horizon}" + (".scn" if with_scenario else "")
+                stages: Dict[str, List[float]] = defaultdict(list)
+
+                def run():
+                    with collect_spans() as spans:
+                        compute_projection(payload["base"], payload["currency"], horizon, entries, payload["scenario"])
+                    for stage, seconds in spans:
+                        stages[stage].append(seconds * 1000.0)
+
+                results[name] = summarize(measure(run, min_runs, min_seconds))
+                for stage, samples in sorted(stages.items()):
+                    results[f"{name}.stage.{stage}"] = summarize(samples)
+                print(f"{name:<28} {results[name]['median_ms']:9.3f} ms", flush=True)
+
+
+def bench_http(results: Dict[str, Any], sizes, horizons, min_runs: int, min_seconds: float) -> None:
+    import httpx
+    from fastapi import FastAPI
+    from routers import calc as calc_router
+    from services.cache import projection_cache
+
+    # Application minimale : seul le routeur calc, sans pool PDF
+    app = FastAPI()
+    app.include_router(calc_router.router, prefix="/api")
+
+    async def run_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for n in sizes:
+                for horizon in horizons:
+                    body = json.dumps(calc_payload(n, horizon, True)).encode("utf-8")
+                    samples = []
+                    t_end = time.perf_counter() + min_seconds
+                    for i in range(10_000):
+                        if i > min_runs and time.perf_counter() > t_end:
+                            break
+                        projection_cache.clear()  # mesure le calcul, pas le cache
+                        t0 = time.perf_counter()
+                        resp = await client.post(
+                            "/api/calc", content=body, headers={"Content-Type": "application/json"}
+                        )
+                        resp.raise_for_status()
+                        if i:  # premier appel = chauffe
+                            samples.append((time.perf_counter() - t0) * 1000.0)
+                    name = f"http.calc.{n}x{horizon}"
+                    results[name] = summarize(samples)
+                    print(f"{name:<28} {results[name]['median_ms']:9.3f} ms", flush=True)
+
+    asyncio.run(run_all())
+
+
+def bench_pdf(results: Dict[str, Any], min_runs: int, min_seconds: float) -> None:
+    try:
+        from services import pdf
+    except (ImportError, OSError) as e:  # WeasyPrint sans Pango/Cairo
+        print(f"pdf ignoré : {e}")
+        return
+    pdf.warmup()
+    for days in (30, 365):
+        data = pdf_payload(days)
+        name = f"pdf.render.{days}"
+        results[name] = summarize(measure(lambda: pdf.render_pdf(data), max(3, min_runs // 5), min_seconds))
+        print(f"{name:<28} {results[name]['median_ms']:9.3f} ms", flush=True)
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    """Cas plus lents que la référence (médiane), au-delà du seuil relatif et absolu."""
+    regressions = []
+    print(f"\n{'cas':<44} {'réf ms':>10} {'actuel ms':>10} {'écart':>8}")
+    for name, cur in sorted(results.items()):
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        before, after = ref["median_ms"], cur["median_ms"]
+        ratio = (after - before) / before if before else 0.0
+        flag = ""
+        if ratio > threshold and after - before > min_delta_ms:
+            regressions.append(name)
+            flag = "  RÉGRESSION"
+        elif ratio < -threshold and before - after > min_delta_ms:
+            flag = "  gain"
+        print(f"{name:<44} {before:>10.3f} {after:>10.3f} {ratio:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", type=Path, help="Fichier JSON de résultats")
+    ap.add_argument("--baseline", type=Path, help="Résultats de référence à comparer")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Ralentissement relatif toléré (0.15 = +15%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.05, help="Écart absolu ignoré (bruit)")
+    ap.add_argument("--quick", action="store_true", help="Matrice réduite (CI)")
+    ap.add_argument("--min-runs", type=int, default=20)
+    ap.add_argument("--min-seconds", type=float, default=0.5)
+    ap.add_argument("--only", choices=("calc", "http", "pdf"), action="append", help="Sous-ensemble de cas")
+    args = ap.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    horizons = QUICK_HORIZONS if args.quick else HORIZONS
+    groups = set(args.only or ("calc", "http", "pdf"))
+
+    results: Dict[str, Any] = {}
+    if "calc" in groups:
+        bench_calc(results, sizes, horizons, args.min_runs, args.min_seconds)
+    if "http" in groups:
+        bench_http(results, sizes, horizons, args.min_runs, args.min_seconds)
+    if "pdf" in groups:
+        bench_pdf(results, args.min_runs, args.min_seconds)
+
+    report = {"environment": environment(), "results": results}
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nrésultats écrits dans {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("results", baseline), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,69 @@
+import logging
+from contextlib import asynccontextmanager
+from importlib import import_module
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-# IMPORT DES ROUTERS
-from routers import pdf_export, calc, ping
+from services.limits import MAX_IMPORT_BYTES, BodyLimitMiddleware
+from services.metrics import MetricsMiddleware
+from services.notify import dispatcher
+from services.roles import PDF_PREWARM, ROLE, serves
+from services.storage import storage
+
+# -----------------------------------------------------
+# IMPORT DES ROUTERS — selon le rôle du processus (SERENITY_ROLE, cf. services/roles.py)
+# (module, tags, fonctionnalité requise ; None = tous les rôles)
+# -----------------------------------------------------
+ROUTERS = (
+    ("pdf_export", ["export"], "pdf"),
+    ("calc", ["calc"], "calc"),
+    ("ping", ["monitoring"], None),
+    ("feedback", ["feedback"], "calc"),
+    ("pro", ["pro"], "calc"),
+    ("stripe", ["billing"], "calc"),
+    ("metrics", ["monitoring"], None),
+    ("statement", ["import"], "calc"),
+)
+
+if serves("calc"):
+    from services.calc_executor import calc_executor
+    from services.static_assets import FRONTEND_PREFIX, static_bundle
+if serves("pdf"):
+    # Pool seul : WeasyPrint n'est chargé que dans les processus de rendu
+    from services.pdf_pool import pdf_pool
+
+# -----------------------------------------------------
+# CYCLE DE VIE : pool de calcul démarré à chaud, pool PDF au premier export
+# (ou préchauffé, SERENITY_PDF_PREWARM), notifications Telegram et journaux
+# SQLite écrits en arrière-plan, front statique haché et précompressé
+# avant la première requête
+# -----------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if serves("calc"):
+        static_bundle.load()
+        await calc_executor.start()
+    if serves("pdf") and PDF_PREWARM:
+        await pdf_pool.start()
+    await dispatcher.start()
+    storage.start()
+    yield
+    storage.stop()
+    await dispatcher.stop()
+    if serves("pdf"):
+        pdf_pool.shutdown()
+    if serves("calc"):
+        calc_executor.shutdown()
+        static_bundle.close()
 
 # -----------------------------------------------------
 # CRÉATION DE L'APPLICATION FASTAPI
 # -----------------------------------------------------
 app = FastAPI(
     title="Serenity Web API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # -----------------------------------------------------
@@ -23,16 +77,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -----------------------------------------------------
+# LIMITES : corps des requêtes /api/calc et des imports bornés avant parsing (413)
+# -----------------------------------------------------
+app.add_middleware(BodyLimitMiddleware)
+app.add_middleware(BodyLimitMiddleware, max_bytes=MAX_IMPORT_BYTES, prefixes=("/api/import",))
+
+# -----------------------------------------------------
+# MESURES : durée par route, spans détaillés sur demande (Server-Timing)
+# Ajouté en dernier = couche la plus externe : les 413 des limites sont comptés
+# -----------------------------------------------------
+app.add_middleware(MetricsMiddleware)
+
 # -----------------------------------------------------
 # INCLUSION DES ROUTERS — UNIQUEMENT APRÈS CRÉATION DE app
 # -----------------------------------------------------
-app.include_router(pdf_export.router, prefix="/api", tags=["export"])
-app.include_router(calc.router, prefix="/api", tags=["calc"])
-app.include_router(ping.router, prefix="/api", tags=["monitoring"])
+for module, tags, feature in ROUTERS:
+    if feature is None or serves(feature):
+        app.include_router(import_module(f"routers.{module}").router, prefix="/api", tags=tags)
+
+# -----------------------------------------------------
+# FRONT STATIQUE (Frontend/) : assets hachés immuables, variantes gzip / brotli
+# -----------------------------------------------------
+if serves("calc"):
+    if static_bundle.available:
+        app.mount(FRONTEND_PREFIX, static_bundle, name="frontend")
+    else:
+        # Image construite depuis api/ seul (cf. dockerfile) : le front n'y est pas
+        logging.getLogger("serenity").warning(
+            "Front statique absent (%s) : %s non servi ; définir SERENITY_FRONTEND_DIR",
+            static_bundle.root, FRONTEND_PREFIX,
+        )
 
 # -----------------------------------------------------
 # ENDPOINT DE TEST / RACINE
 # -----------------------------------------------------
 @app.get("/")
 def home():
-    return {"message": "Bienvenue sur l'API Serenity Web 🚀"}
+    return {"message": "Bienvenue sur l'API Serenity Web 🚀", "role": ROLE}
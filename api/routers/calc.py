@@ -1,7 +1,17 @@
-from typing import Any, Dict, List, Optional
-from fastapi import APIRouter
-from pydantic import BaseModel, Field
-from services.calc import compute_projection
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field, model_validator
+from services.cache import etag_matches, projection_cache, projection_key, variant_key
+from services.calc import clamp_horizon, compute_projection_batch, today0
+from services.calc_executor import CalcSaturated, cached_projection_async, calc_executor
+from services.encoding import MEDIA_TYPES, UnsupportedFormat, curve_headers, negotiate_format
+from services.entries import normalize_entries
+from services.horizon import DEFAULT_DAILY_DAYS, DEFAULT_WEEKLY_DAYS, MAX_YEARS, compute_long_projection
+from services.limits import MAX_ENTRIES
+from services.metrics import span
+from services.solver import LEVERS, TARGETS, SolveError, solve
+from services.sessions import InvalidPatch, SessionNotFound, close_session, open_session, patch_session
 
 router = APIRouter()
 
@@ -9,9 +19,21 @@ router = APIRouter()
 class Entry(BaseModel):
     type: str = Field(..., description="income ou expense")
     amount: float = Field(..., description="Montant brut de la ligne")
-    rec: str = Field("monthly", description="oneoff | weekly | monthly | quarterly | yearly")
+    rec: str = Field(
+        "monthly",
+        description="oneoff | weekly | biweekly | every_n_days | monthly | quarterly | yearly | last_business_day",
+    )
     cat: str = Field("fixed", description="fixed | variable | credit")
     start: Optional[str] = Field(None, description="Date de début au format YYYY-MM-DD")
+    end: Optional[str] = Field(None, description="Date de fin (incluse) au format YYYY-MM-DD")
+    every_days: Optional[int] = Field(None, ge=1, description="Période en jours pour rec=every_n_days")
+
+    @model_validator(mode="after")
+    def _period_required(self) -> "Entry":
+        # Sans période, la ligne serait projetée chaque jour (pas de 1 par défaut) : 422
+        if self.rec == "every_n_days" and self.every_days is None:
+            raise ValueError("every_days est obligatoire pour rec=every_n_days")
+        return self
 
 
 class Scenario(BaseModel):
@@ -24,12 +46,68 @@ class CalcRequest(BaseModel):
     base: float = 0.0
     currency: str = "$"
     horizon_days: int = 90
-    entries: List[Entry] = []
+    entries: List[Entry] = Field([], max_length=MAX_ENTRIES)
     scenario: Scenario = Scenario()
 
 
+class BatchCalcRequest(BaseModel):
+    base: float = 0.0
+    currency: str = "$"
+    horizon_days: int = 90
+    entries: List[Entry] = Field([], max_length=MAX_ENTRIES)
+    scenarios: List[Scenario] = Field([Scenario()], max_length=64, description="Variantes à évaluer sur le même budget")
+
+
+class RiskRequest(CalcRequest):
+    simulations: Optional[int] = Field(None, ge=1, le=100_000, description="Nombre de tirages (borné par le budget serveur)")
+    seed: Optional[int] = Field(None, ge=0, description="Graine ; absente = dérivée des entrées (résultat reproductible)")
+    var_sigma: float = Field(0.15, ge=0, le=2, description="Écart-type (log) des dépenses variables")
+    income_jitter_days: int = Field(3, ge=0, le=15, description="Décalage max (jours) des versements de revenus")
+    shock_rate: float = Field(0.3, ge=0, le=10, description="Chocs ponctuels attendus par mois")
+    shock_amount: Optional[float] = Field(None, ge=0, description="Montant moyen d'un choc (défaut: 10% des dépenses mensuelles)")
+
+
+class SolveRequest(CalcRequest):
+    lever: Literal[LEVERS] = Field(..., description="Levier résolu : extra_income | extra_credit | var_mul")
+    target: Literal[TARGETS] = Field(..., description="balance_at | never_negative | savings_rate")
+    amount: float = Field(0.0, description="Solde visé (balance_at) ou plancher (never_negative)")
+    date: Optional[str] = Field(None, description="Date visée YYYY-MM-DD (balance_at ; défaut : fin de l'horizon)")
+    rate: float = Field(0.20, gt=0, lt=1, description="Taux d'épargne visé (savings_rate)")
+
+
+class LongRangeRequest(BaseModel):
+    base: float = 0.0
+    currency: str = "$"
+    horizon_years: int = Field(5, ge=1, le=MAX_YEARS, description="Horizon en années")
+    daily_days: int = Field(DEFAULT_DAILY_DAYS, ge=0, le=366, description="Jours au pas journalier")
+    weekly_days: int = Field(DEFAULT_WEEKLY_DAYS, ge=0, le=3660, description="Fin du palier hebdomadaire (jours depuis J0)")
+    entries: List[Entry] = Field([], max_length=MAX_ENTRIES)
+    scenario: Scenario = Scenario()
+
+
+class SessionOp(BaseModel):
+    op: Literal["add", "update", "remove", "base", "scenario"]
+    id: Optional[str] = Field(None, description="Identifiant de ligne (update / remove)")
+    entry: Optional[Entry] = Field(None, description="Ligne complète (add / update)")
+    value: Optional[float] = Field(None, description="Nouveau solde initial (base)")
+    scenario: Optional[Scenario] = Field(None, description="Nouveau scénario (scenario)")
+
+
+class SessionPatch(BaseModel):
+    ops: List[SessionOp] = Field(..., max_length=256, description="Opérations appliquées dans l'ordre")
+
+
 @router.post("/calc")
-def calc_projection(payload: CalcRequest) -> Dict[str, Any]:
+async def calc_projection(
+    payload: CalcRequest,
+    curve: Literal["points", "columnar", "deltas"] = Query("points", description="Disposition de la courbe"),
+    fmt: Optional[str] = Query(None, alias="format", description="json | msgpack | f32 (sinon selon Accept)"),
+    max_points: Optional[int] = Query(
+        None, ge=3, le=10_000, description="Nombre max de points de courbe (réduction LTTB pour l'affichage)"
+    ),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
     Moteur de calcul Serenity Web.
 
@@ -42,12 +120,233 @@ def calc_projection(payload: CalcRequest) -> Dict[str, Any]:
 
     Retourne:
     - meta, kpi, score, milestones, curve, breakdown, tips
+
+    La réponse porte un ETag dérivé des entrées (et de la date du jour) :
+    un If-None-Match identique renvoie 304 sans recalcul.
+
+    Encodages compacts (optionnels, cf. services.encoding) :
+    - `?curve=columnar` : date de début + tableau des soldes
+    - `?curve=deltas`   : date de début + premier solde + variations journalières
+    - `?format=msgpack` / `Accept: application/msgpack` : même structure en msgpack
+    - `?format=f32` / `Accept: application/octet-stream` : la courbe seule en float32,
+      décrite par les en-têtes X-Curve-Start / X-Curve-Layout / X-Curve-Length
+
+    Le calcul tourne hors de la boucle async (services.calc_executor) ; des requêtes
+    identiques simultanées partagent un seul calcul. 503 + Retry-After si saturé.
+
+    `?max_points=N` : courbe réduite à N points au plus (LTTB, minimum et passages
+    sous zéro conservés) ; chaque point garde sa date, `curve_sampling` décrit la réduction.
+    """
+    try:
+        fmt = negotiate_format(fmt, accept)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    if max_points and fmt == "f32":
+        raise HTTPException(status_code=400, detail="max_points n'est pas disponible avec format=f32")
+
+    # Normalisation unique des lignes : tout le moteur travaille sur BudgetEntry
+    with span("calc.normalize"):
+        entries = normalize_entries(payload.entries)
+        scenario = payload.scenario.model_dump()
+        key = projection_key(payload.base, payload.currency, payload.horizon_days, entries, scenario)
+    variant = "" if (curve, fmt) == ("points", "json") else f"-{curve}-{fmt}"
+    if max_points:
+        variant += f"-s{max_points}"
+    etag = f'"{key}{variant}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if fmt == "f32":
+        headers.update(curve_headers(today0().isoformat(), clamp_horizon(payload.horizon_days) + 1, curve))
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        body = await cached_projection_async(
+            variant_key(key, curve, fmt, max_points),
+            base=payload.base,
+            currency=payload.currency,
+            horizon_days=payload.horizon_days,
+            entries=entries,
+            scenario=scenario,
+            layout=curve,
+            fmt=fmt,
+            max_points=max_points,
+        )
+    except CalcSaturated as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/calc/cache")
+def calc_cache_stats() -> Dict[str, Any]:
+    """Compteurs du cache de projections (hits, misses, évictions)."""
+    return projection_cache.stats()
+
+
+@router.get("/calc/executor")
+def calc_executor_stats() -> Dict[str, Any]:
+    """Exécuteur de /calc : calculs faits, fusionnés (single-flight), refusés."""
+    return calc_executor.stats()
+
+
+@router.post("/calc/batch")
+def calc_projection_batch(payload: BatchCalcRequest) -> Dict[str, Any]:
+    """
+    Évalue plusieurs scénarios ("et si…") sur un même budget en une requête.
+
+    Les récurrences de base ne sont développées qu'une fois ; chaque scénario
+    est appliqué en surcouche. Retourne `results` dans l'ordre des scénarios,
+    chaque élément ayant la même forme que /calc.
+    """
+    results = compute_projection_batch(
+        base=payload.base,
+        currency=payload.currency,
+        horizon_days=payload.horizon_days,
+        entries=normalize_entries(payload.entries),
+        scenarios=[s.model_dump() for s in payload.scenarios],
+    )
+    return {"results": results}
+
+
+@router.post("/calc/risk")
+async def calc_risk(payload: RiskRequest) -> Dict[str, Any]:
+    """
+    Projection Monte Carlo du budget.
+
+    Retourne les bandes de solde p5/p50/p95 (format colonne), la probabilité
+    de passer sous zéro sur l'horizon et jour par jour (`overdraft_by_day`,
+    plus les jalons m1/m6/m12), et le solde minimum attendu.
+
+    Simulé sur le pool de calcul (services.calc_executor) : simulations simultanées
+    bornées par ses workers, requêtes identiques fusionnées, 503 + Retry-After si saturé.
+    """
+    entries = normalize_entries(payload.entries)
+    scenario = payload.scenario.model_dump()
+    key = projection_key(payload.base, payload.currency, payload.horizon_days, entries, scenario)
+    seed = payload.seed
+    if seed is None:
+        seed = int(key[:8], 16)
+    params = (
+        payload.simulations, seed, payload.var_sigma, payload.income_jitter_days,
+        payload.shock_rate, payload.shock_amount,
+    )
+    try:
+        return await calc_executor.risk(
+            f"{key}:{params}",
+            base=payload.base,
+            currency=payload.currency,
+            horizon_days=payload.horizon_days,
+            entries=entries,
+            scenario=scenario,
+            simulations=payload.simulations,
+            seed=seed,
+            var_sigma=payload.var_sigma,
+            income_jitter_days=payload.income_jitter_days,
+            shock_rate=payload.shock_rate,
+            shock_amount=payload.shock_amount,
+        )
+    except CalcSaturated as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+@router.post("/calc/solve")
+def calc_solve(payload: SolveRequest) -> Dict[str, Any]:
+    """
+    Résout un levier du scénario pour atteindre un objectif.
+
+    Ex: "combien de revenu en plus pour avoir 5000 au 1er juin" (extra_income,
+    balance_at), "quelle mensualité de crédit sans jamais passer sous zéro"
+    (extra_credit, never_negative), "de combien réduire les dépenses variables
+    pour épargner 20 %" (var_mul, savings_rate).
+
+    Retourne `value`, `status` (ok | already_met | bound | infeasible | unbounded),
+    `method` et le nombre d'évaluations ; si une valeur est trouvée, `scenario`
+    à renvoyer à /calc et `outcome` (solde visé, solde minimum, taux d'épargne).
+    """
+    try:
+        on = date.fromisoformat(payload.date) if payload.date else None
+        return solve(
+            base=payload.base,
+            currency=payload.currency,
+            horizon_days=payload.horizon_days,
+            entries=normalize_entries(payload.entries),
+            scenario=payload.scenario.model_dump(),
+            lever=payload.lever,
+            target=payload.target,
+            amount=payload.amount,
+            on=on,
+            rate=payload.rate,
+        )
+    except (SolveError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/calc/horizon")
+def calc_long_horizon(payload: LongRangeRequest) -> Dict[str, Any]:
     """
-    data = compute_projection(
+    Projection pluriannuelle (1 à 30 ans) par paliers.
+
+    `curve` : points journaliers jusqu'à `daily_days` ; `buckets` : seaux
+    hebdomadaires jusqu'à `weekly_days`, puis mensuels, chacun avec les soldes
+    min / max / close. Jalons m1/m6/m12 et annuels (y1..yN), `min_balance`
+    sur tout l'horizon ; KPI, score, répartitions et conseils comme /calc.
+    """
+    return compute_long_projection(
+        base=payload.base,
+        currency=payload.currency,
+        horizon_years=payload.horizon_years,
+        entries=normalize_entries(payload.entries),
+        scenario=payload.scenario.model_dump(),
+        daily_days=payload.daily_days,
+        weekly_days=payload.weekly_days,
+    )
+
+
+@router.post("/calc/session")
+def calc_session_open(payload: CalcRequest) -> Dict[str, Any]:
+    """
+    Ouvre une session de calcul incrémental.
+
+    Retourne `session_id`, les identifiants des lignes (`entry_ids`, dans l'ordre
+    de `entries`) et un résultat complet de même forme que /calc.
+    """
+    session_id, session = open_session(
         base=payload.base,
         currency=payload.currency,
         horizon_days=payload.horizon_days,
-        entries=[e.model_dump() for e in payload.entries],
+        entries=payload.entries,
         scenario=payload.scenario.model_dump(),
     )
-    return data
+    return {"session_id": session_id, "entry_ids": list(session.entries), **session.snapshot(full=True)}
+
+
+@router.post("/calc/session/{session_id}/patch")
+def calc_session_patch(session_id: str, payload: SessionPatch) -> Dict[str, Any]:
+    """
+    Applique des modifications à une session : add, update, remove, base, scenario.
+
+    Seuls les jours concernés sont recalculés. La réponse contient les KPI,
+    score, jalons, répartition et conseils à jour, plus `curve_diff`
+    (`start` + points `[jour, solde]` modifiés). Après un changement de jour,
+    la session est reconstruite et la courbe complète (`curve`) est renvoyée.
+    Les opérations sont appliquées en tout ou rien.
+    """
+    ops = [op.model_dump(exclude_none=True) for op in payload.ops]
+    try:
+        return patch_session(session_id, ops)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+    except InvalidPatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/calc/session/{session_id}")
+def calc_session_close(session_id: str) -> Dict[str, Any]:
+    """Ferme une session (libère sa mémoire avant l'expiration d'inactivité)."""
+    if not close_session(session_id):
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+    return {"ok": True}
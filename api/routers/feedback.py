@@ -0,0 +1,19 @@
+from typing import Literal, Optional
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+from services.storage import storage
+
+router = APIRouter()
+
+
+class Feedback(BaseModel):
+    verdict: Literal["juste", "a_ajuster"] = Field(..., description="Score juste / à ajuster ?")
+    score: Optional[int] = Field(None, ge=0, le=100, description="Score affiché au moment du retour")
+    comment: Optional[str] = Field(None, max_length=1000)
+
+
+@router.post("/feedback")
+def feedback(payload: Feedback):
+    # Écrit en différé, par lots (services.storage)
+    accepted = storage.log_feedback(payload.verdict, payload.score, payload.comment)
+    return {"status": "ok" if accepted else "dropped"}
@@ -0,0 +1,56 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from services.metrics import PROFILE_MAX_SECONDS, PROFILE_MIN_INTERVAL, profiler, registry
+
+router = APIRouter()
+
+METRICS_TOKEN = os.getenv("SERENITY_METRICS_TOKEN")
+
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)) -> None:
+    # Sans SERENITY_METRICS_TOKEN, les métriques restent ouvertes (Beta)
+    if METRICS_TOKEN and x_metrics_token != METRICS_TOKEN:
+        raise HTTPException(status_code=403, detail="Jeton de métriques invalide")
+
+
+def require_profiler_token(x_metrics_token: Optional[str] = Header(None)) -> None:
+    # Le profileur ralentit tout le worker : jamais ouvert sans SERENITY_METRICS_TOKEN
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Profileur désactivé (SERENITY_METRICS_TOKEN non défini)")
+    require_metrics_token(x_metrics_token)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+def metrics():
+    """Histogrammes (requêtes HTTP par route, spans calc/pdf) au format Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.post("/metrics/profiler", dependencies=[Depends(require_profiler_token)])
+def toggle_profiler(
+    enabled: bool = Query(..., description="Active / arrête l'échantillonnage des piles"),
+    interval_ms: Optional[float] = Query(None, ge=PROFILE_MIN_INTERVAL * 1000.0, le=1000, description="Période d'échantillonnage"),
+    reset: bool = Query(False, description="Vide les piles déjà collectées"),
+    duration_s: float = Query(
+        30.0, gt=0, le=PROFILE_MAX_SECONDS, description="Arrêt automatique après cette durée (secondes)"
+    ),
+):
+    """
+    Échantillonneur de piles du processus qui reçoit l'appel : il voit toutes les
+    requêtes de ce worker (pas une requête isolée) et s'arrête seul après `duration_s`.
+    """
+    if reset:
+        profiler.reset()
+    if enabled:
+        profiler.start(interval_ms / 1000.0 if interval_ms else None, duration=duration_s)
+    else:
+        profiler.stop()
+    return profiler.stats()
+
+
+@router.get("/metrics/profile", response_class=PlainTextResponse, dependencies=[Depends(require_profiler_token)])
+def profile(limit: int = Query(500, ge=1, le=20_000)):
+    """Piles repliées ("a;b;c N"), à passer à flamegraph.pl ou speedscope."""
+    return PlainTextResponse(profiler.folded(limit))
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import Any, Dict, List, Optional
-from services.pdf import render_pdf
+from services.cache import etag_matches
+from services.pdf_cache import iter_file, pdf_cache, pdf_cache_key
+from services.pdf_pool import PoolSaturated, PoolUnavailable, pdf_pool
+from routers.pro import require_pro
 
 router = APIRouter()
 
@@ -15,17 +20,59 @@ class ExportPayload(BaseModel):
     tips: Optional[List[str]] = None
     disclaimer: Optional[str] = None
 
-@router.post("/export-pdf", response_class=Response)
-def export_pdf(payload: ExportPayload):
-    try:
-        # (Beta) Pas d’auth complexe ici. Plus tard: vérifier licence/clé.
-        pdf_bytes = render_pdf(payload.model_dump())
-        return Response(
-            content=pdf_bytes,
+PDF_HEADERS = {
+    "Content-Disposition": 'attachment; filename="serenity-web-projection.pdf"',
+    "Cache-Control": "private, no-cache",
+}
+
+
+@router.post("/export-pdf", response_class=Response, dependencies=[Depends(require_pro)])
+async def export_pdf(payload: ExportPayload, if_none_match: Optional[str] = Header(None)):
+    data = payload.model_dump()
+    key = pdf_cache_key(data)
+    headers = {**PDF_HEADERS, "ETag": f'"{key}"'}
+
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # PDF déjà rendu pour ce contenu : mémoire, sinon disque (streamé)
+    cached = pdf_cache.get_bytes(key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/pdf", headers=headers)
+    found = await run_in_threadpool(pdf_cache.open_disk, key)
+    if found is not None:
+        fh, size = found
+        return StreamingResponse(
+            iter_file(fh),
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": 'attachment; filename="serenity-web-projection.pdf"'
-            },
+            headers={**headers, "Content-Length": str(size)},
+        )
+
+    try:
+        # Licence vérifiée par require_pro (si SERENITY_LICENSE_SECRET est défini)
+        # Rendu délégué au pool de processus : la boucle async ne bloque jamais sur WeasyPrint
+        pdf_bytes = await pdf_pool.render(data)
+    except PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Export PDF momentanément saturé, réessaie dans quelques secondes.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except PoolUnavailable as e:
+        # Délai dépassé ou pool recyclé : indisponibilité temporaire, pas une erreur du payload
+        raise HTTPException(
+            status_code=503,
+            detail=f"Echec génération PDF: {e}",
+            headers={"Retry-After": str(e.retry_after)},
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Echec génération PDF: {e}")
+
+    await run_in_threadpool(pdf_cache.put, key, pdf_bytes)
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+
+@router.get("/export-pdf/cache")
+def export_pdf_cache_stats() -> Dict[str, Any]:
+    """Statistiques du cache de PDF (hits mémoire/disque, évictions)."""
+    return pdf_cache.stats()
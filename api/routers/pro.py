@@ -1 +1,69 @@
-# /export-pdf, /snapshot
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from services.billing import InvalidLicense, License, verifier
+from services.storage import storage
+
+router = APIRouter()
+
+
+def _license_key(x_license_key: Optional[str], authorization: Optional[str]) -> Optional[str]:
+    if x_license_key:
+        return x_license_key
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+
+def require_license(
+    x_license_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+) -> License:
+    """Licence Pro valide obligatoire (vérifiée hors ligne, cf. services.billing)."""
+    if not verifier.enabled:
+        raise HTTPException(status_code=503, detail="Licences Pro non configurées sur ce serveur")
+    key = _license_key(x_license_key, authorization)
+    try:
+        return verifier.verify(key)
+    except InvalidLicense as e:
+        raise HTTPException(status_code=401 if not key else 403, detail=str(e))
+
+
+def require_pro(
+    x_license_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+) -> Optional[License]:
+    """Garde des routes Pro : appliquée seulement si SERENITY_LICENSE_SECRET est défini (Beta ouverte sinon)."""
+    if not verifier.enabled:
+        return None
+    return require_license(x_license_key, authorization)
+
+
+class SnapshotPayload(BaseModel):
+    budget: Dict[str, Any] = Field(..., description="Dernier budget saisi (même forme que /calc)")
+    projection: Optional[Dict[str, Any]] = Field(None, description="Résultat /calc associé, optionnel")
+
+
+@router.get("/license")
+def license_status(lic: License = Depends(require_license)) -> Dict[str, Any]:
+    """Vérifie la clé fournie et renvoie son contenu."""
+    return {"license_id": lic.license_id, "plan": lic.plan, "expires_at": lic.expires_at}
+
+
+@router.post("/snapshot")
+async def save_snapshot(payload: SnapshotPayload, lic: License = Depends(require_license)) -> Dict[str, Any]:
+    """Sauvegarde Snapshot (Pro) : enregistre le dernier budget, et sa projection si fournie."""
+    saved = await run_in_threadpool(storage.save_snapshot, lic.license_id, "budget", payload.budget)
+    if payload.projection is not None:
+        await run_in_threadpool(storage.save_snapshot, lic.license_id, "projection", payload.projection)
+    return {"id": saved["id"], "hash": saved["hash"], "created_at": saved["created_at"]}
+
+
+@router.get("/snapshot")
+async def load_snapshot(lic: License = Depends(require_license)) -> Dict[str, Any]:
+    """Recharge le dernier budget sauvegardé."""
+    snap = await run_in_threadpool(storage.latest_snapshot, lic.license_id, "budget")
+    if snap is None:
+        raise HTTPException(status_code=404, detail="Aucun snapshot enregistré")
+    return snap
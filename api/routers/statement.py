@@ -0,0 +1,33 @@
+from typing import Any, Dict, Literal, Optional
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+from services.statement import AMOUNT_TOLERANCE, InvalidStatement, import_statement
+
+router = APIRouter()
+
+
+@router.post("/import/statement")
+async def import_bank_statement(
+    file: UploadFile = File(..., description="Relevé bancaire CSV ou OFX"),
+    fmt: Optional[Literal["csv", "ofx"]] = Query(None, alias="format", description="csv | ofx (détecté sinon)"),
+    currency: str = Query("$", max_length=8),
+    horizon_days: int = Query(90, ge=30, le=365),
+    tolerance: float = Query(AMOUNT_TOLERANCE, ge=0, le=1, description="Écart relatif de montant toléré dans une série"),
+) -> Dict[str, Any]:
+    """
+    Import d'un relevé bancaire : transactions lues en flux, regroupées en lignes
+    récurrentes (hebdo, bimensuel, mensuel, trimestriel, annuel).
+
+    Retourne `request` (à envoyer tel quel à /calc), `recurring` (détail des
+    séries détectées), `everyday_spending` (dépenses non récurrentes, moyenne
+    mensuelle) et `stats`.
+    """
+    try:
+        # Analyse CPU hors de la boucle async ; le fichier reste sur disque (SpooledTemporaryFile)
+        return await run_in_threadpool(
+            import_statement, file.file, fmt, currency, horizon_days, tolerance
+        )
+    except InvalidStatement as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
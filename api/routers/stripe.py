@@ -1 +1,33 @@
-# /stripe/webhook
+import json
+from fastapi import APIRouter, Header, HTTPException, Request
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from services.billing import (
+    STRIPE_WEBHOOK_SECRET,
+    InvalidWebhook,
+    handle_stripe_event,
+    revocations,
+    verify_stripe_signature,
+)
+
+router = APIRouter()
+
+
+@router.post("/stripe/webhook")
+async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Header(None)):
+    """
+    Événements Stripe : remboursement, litige ou résiliation révoquent la licence
+    indiquée dans `metadata.license_id`. Un même événement rejoué est sans effet.
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook Stripe non configuré")
+    body = await request.body()
+    try:
+        verify_stripe_signature(body, stripe_signature, STRIPE_WEBHOOK_SECRET)
+        event = json.loads(body)
+    except InvalidWebhook as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Corps JSON invalide")
+    # Révocation = écriture + fsync du fichier : hors de la boucle async
+    return {"status": await run_in_threadpool(handle_stripe_event, event, revocations)}
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services import recurrence
+from services.entries import BudgetEntry, Cat, Kind, Rec
+
+# --------- Agrégation fusionnée : KPI, répartitions et deltas journaliers en une passe --------- #
+
+# Mensualisation par récurrence : montant * multiplicateur / diviseur, et libellé de répartition.
+# Ponctuel : ignoré des KPI mensuels mais compté en montant brut dans la répartition.
+WEEKS_PER_MONTH = 4.333
+REC_TABLE: Dict[Rec, Tuple[float, float, Optional[str]]] = {
+    Rec.WEEKLY: (WEEKS_PER_MONTH, 1.0, "Hebdo"),
+    Rec.BIWEEKLY: (WEEKS_PER_MONTH, 2.0, "Hebdo"),
+    Rec.EVERY_N_DAYS: (WEEKS_PER_MONTH * 7.0, 1.0, "Hebdo"),  # diviseur = every_days
+    Rec.MONTHLY: (1.0, 1.0, "Mensuel"),
+    Rec.LAST_BUSINESS_DAY: (1.0, 1.0, "Mensuel"),
+    Rec.QUARTERLY: (1.0, 3.0, "Trimestriel"),
+    Rec.YEARLY: (1.0, 12.0, "Annuel"),
+    Rec.ONEOFF: (0.0, 1.0, "Ponctuel"),
+    Rec.OTHER: (0.0, 1.0, None),
+}
+
+RECURRING_LABELS = ("Mensuel", "Hebdo", "Ponctuel", "Trimestriel", "Annuel")
+KPI_KEYS = ("inc", "fix", "vari", "cred")
+
+
+# Facteur mensuel des KPI : montant * facteur (1/3, 1/12 précalculés), comme le calcul
+# historique ; la répartition par récurrence divise (montant / 3) : l'arrondi au
+# centime des deux chemins diffère parfois, chacun garde sa formule d'origine.
+KPI_FACTORS: Dict[Rec, float] = {rec: mul / div for rec, (mul, div, _) in REC_TABLE.items()}
+
+
+def monthly_amount(e: BudgetEntry, amount: float) -> float:
+    """Montant mensualisé de la répartition par récurrence."""
+    mul, div, _ = REC_TABLE[e.rec]
+    if e.rec is Rec.EVERY_N_DAYS:
+        div = float(max(1, e.every_days or 1))
+    return amount * mul / div
+
+
+def kpi_amount(e: BudgetEntry, amount: float) -> float:
+    """Montant mensualisé des KPI (et donc des répartitions par catégorie et des conseils)."""
+    if e.rec is Rec.EVERY_N_DAYS:
+        return amount * (REC_TABLE[Rec.EVERY_N_DAYS][0] / max(1, e.every_days or 1))
+    return amount * KPI_FACTORS[e.rec]
+
+
+def kpi_key(e: BudgetEntry) -> str:
+    if e.kind is Kind.INCOME:
+        return "inc"
+    if e.cat is Cat.FIXED:
+        return "fix"
+    if e.cat is Cat.CREDIT:
+        return "cred"
+    return "vari"
+
+
+class BudgetAggregates:
+    """
+    Sommes KPI, répartition par récurrence et deltas journaliers d'un ensemble de lignes.
+
+    Mis à jour ligne par ligne (`add` / `remove`) : ajouter ou retirer une ligne
+    ne rescanne pas les autres. Sans horizon, seuls les agrégats mensuels sont tenus.
+    """
+
+    __slots__ = ("start", "horizon_days", "kpi", "rec", "deltas", "count", "_terms")
+
+    def __init__(self, horizon_days: Optional[int] = None, start: Optional[date] = None):
+        self.start = start
+        self.horizon_days = horizon_days
+        self.kpi: Dict[str, float] = dict.fromkeys(KPI_KEYS, 0.0)
+        self.rec: Dict[str, float] = dict.fromkeys(RECURRING_LABELS, 0.0)
+        self.deltas: Optional[List[float]] = [0.0] * (horizon_days + 1) if horizon_days is not None else None
+        self.count = 0
+        # Nombre de termes non nuls par somme : une somme vidée par `remove` repart d'un zéro exact
+        self._terms: Dict[str, int] = dict.fromkeys(KPI_KEYS + RECURRING_LABELS, 0)
+
+    def _accumulate(self, sums: Dict[str, float], key: str, value: float, weight: float) -> None:
+        if value == 0.0:
+            return
+        n = self._terms[key] + (1 if weight > 0 else -1)
+        self._terms[key] = n
+        sums[key] = sums[key] + value if n else 0.0
+
+    def add(self, e: BudgetEntry, weight: float = 1.0) -> List[int]:
+        """Intègre la ligne (weight=-1 pour la retirer) ; renvoie les jours touchés."""
+        amt = e.amount * weight
+        self._accumulate(self.kpi, kpi_key(e), kpi_amount(e, amt), weight)
+        label = REC_TABLE[e.rec][2]
+        if label is not None:
+            self._accumulate(self.rec, label, amt if e.rec is Rec.ONEOFF else monthly_amount(e, amt), weight)
+        self.count += 1 if weight > 0 else -1
+
+        if self.deltas is None:
+            return []
+        offsets = recurrence.occurrence_offsets(
+            e.rec, e.anchor(self.start), self.start, self.horizon_days, every_days=e.every_days, until=e.end
+        )
+        delta = e.delta * weight
+        deltas = self.deltas
+        for off in offsets:
+            deltas[off] += delta
+        return offsets
+
+    def remove(self, e: BudgetEntry) -> List[int]:
+        return self.add(e, -1.0)
+
+    def extend(self, entries: Iterable[BudgetEntry]) -> "BudgetAggregates":
+        for e in entries:
+            self.add(e)
+        return self
+
+    def replace_sums(self, other: "BudgetAggregates") -> None:
+        """Reprend les sommes mensuelles (KPI, récurrences) d'un autre agrégat, sans ses deltas."""
+        self.kpi = dict(other.kpi)
+        self.rec = dict(other.rec)
+        self._terms = dict(other._terms)
+        self.count = other.count
+
+    def copy(self) -> "BudgetAggregates":
+        other = BudgetAggregates.__new__(BudgetAggregates)
+        other.start = self.start
+        other.horizon_days = self.horizon_days
+        other.kpi = dict(self.kpi)
+        other.rec = dict(self.rec)
+        other.deltas = list(self.deltas) if self.deltas is not None else None
+        other.count = self.count
+        other._terms = dict(self._terms)
+        return other
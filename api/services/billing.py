@@ -1 +1,303 @@
-# Stripe helpers
+from __future__ import annotations
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from services.cache import LRUCache, canonical_json
+
+# --------- Licences Pro : clés signées vérifiables hors ligne --------- #
+#
+# Format : "SW1.<payload>.<signature>", base64url sans padding.
+#   payload   = JSON canonique {"lid", "sub", "plan", "iat", "exp"}
+#   signature = HMAC-SHA256(secret, "SW1.<payload>")
+#
+# La vérification ne fait ni requête base ni appel Stripe : HMAC, puis cache
+# des clés déjà vérifiées (TTL) ; seuls l'expiration et la liste de révocation
+# sont recontrôlées à chaque appel. La liste de révocation est un fichier JSON
+# lines rechargé dès que sa date de modification change, alimenté par le
+# webhook Stripe (routers/stripe.py).
+
+KEY_PREFIX = "SW1"
+
+
+class InvalidLicense(Exception):
+    """Clé absente, mal formée, mal signée, expirée ou révoquée."""
+
+
+@dataclass(frozen=True)
+class License:
+    license_id: str
+    customer: str
+    plan: str
+    issued_at: int
+    expires_at: Optional[int]
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.expires_at is not None and (now or time.time()) >= self.expires_at
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(secret: bytes, signed_part: str) -> str:
+    # utf-8 : une clé saisie à la main peut contenir n'importe quel caractère (ascii pour une clé émise)
+    return _b64encode(hmac.new(secret, signed_part.encode("utf-8"), hashlib.sha256).digest())
+
+
+def issue_license(
+    secret: str,
+    license_id: str,
+    customer: str,
+    plan: str = "pro",
+    expires_at: Optional[int] = None,
+    issued_at: Optional[int] = None,
+) -> str:
+    payload = {
+        "lid": license_id,
+        "sub": customer,
+        "plan": plan,
+        "iat": int(issued_at if issued_at is not None else time.time()),
+        "exp": expires_at,
+    }
+    signed_part = f"{KEY_PREFIX}.{_b64encode(canonical_json(payload))}"
+    return f"{signed_part}.{_sign(secret.encode('utf-8'), signed_part)}"
+
+
+def decode_license(secret: str, key: str) -> License:
+    """Vérifie la signature et décode la clé (sans contrôle d'expiration ni de révocation)."""
+    try:
+        prefix, payload_part, signature = key.strip().split(".")
+    except ValueError:
+        raise InvalidLicense("Clé de licence mal formée")
+    if prefix != KEY_PREFIX:
+        raise InvalidLicense("Version de clé inconnue")
+    expected = _sign(secret.encode("utf-8"), f"{prefix}.{payload_part}")
+    # Comparaison en octets : compare_digest refuse les str non ASCII (TypeError -> 500)
+    if not hmac.compare_digest(expected.encode("ascii"), signature.encode("utf-8")):
+        raise InvalidLicense("Signature de licence invalide")
+    try:
+        data = json.loads(_b64decode(payload_part))
+        return License(
+            license_id=str(data["lid"]),
+            customer=str(data["sub"]),
+            plan=str(data.get("plan") or "pro"),
+            issued_at=int(data.get("iat") or 0),
+            expires_at=int(data["exp"]) if data.get("exp") is not None else None,
+        )
+    except (ValueError, KeyError, TypeError):
+        raise InvalidLicense("Contenu de licence invalide")
+
+
+# --------- Liste de révocation (fichier rechargé à chaud) --------- #
+
+
+class RevocationList:
+    """
+    Une ligne JSON par révocation : {"license_id", "event_id", "reason", "at"}.
+    Le fichier est relu quand son mtime change (contrôle au plus toutes les
+    `check_interval` secondes) : une révocation ajoutée par un autre worker
+    ou à la main est prise en compte sans redémarrage.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._revoked: Set[str] = set()
+        self._events: Set[str] = set()
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            self._load(mtime)
+
+    def _load(self, mtime: Optional[int]) -> None:
+        revoked: Set[str] = set()
+        events: Set[str] = set()
+        if mtime is not None:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue  # ligne tronquée (écriture concurrente)
+                    if item.get("license_id"):
+                        revoked.add(str(item["license_id"]))
+                    if item.get("event_id"):
+                        events.add(str(item["event_id"]))
+        self._revoked, self._events, self._mtime = revoked, events, mtime
+        self.reloads += 1
+
+    def is_revoked(self, license_id: str) -> bool:
+        self._refresh()
+        return license_id in self._revoked
+
+    def seen_event(self, event_id: str) -> bool:
+        self._refresh()
+        return event_id in self._events
+
+    def revoke(self, license_id: str, event_id: Optional[str] = None, reason: str = "") -> bool:
+        """Ajoute une révocation ; False si la licence ou l'événement est déjà enregistré (idempotent)."""
+        with self._lock:
+            self._checked_at = 0.0
+            self._load_if_changed()
+            if license_id in self._revoked or (event_id and event_id in self._events):
+                return False
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            line = json.dumps(
+                {"license_id": license_id, "event_id": event_id, "reason": reason, "at": int(time.time())},
+                separators=(",", ":"),
+            )
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._revoked.add(license_id)
+            if event_id:
+                self._events.add(event_id)
+            self._mtime = self.path.stat().st_mtime_ns
+            return True
+
+    def _load_if_changed(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self._load(mtime)
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._revoked)
+
+
+# --------- Vérification avec cache --------- #
+
+
+class LicenseVerifier:
+    """Clés valides gardées `ttl` secondes : un appel en cache ne coûte qu'un lookup."""
+
+    def __init__(self, secret: Optional[str], revocations: RevocationList, max_items: int = 10_000, ttl: float = 600.0):
+        self.secret = secret
+        self.revocations = revocations
+        self.cache = LRUCache(max_items=max_items, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def verify(self, key: Optional[str]) -> License:
+        if not key:
+            raise InvalidLicense("Clé de licence manquante")
+        lic: Optional[License] = self.cache.get(key)
+        if lic is None:
+            lic = decode_license(self.secret, key)
+            self.cache.set(key, lic)
+        if lic.expired():
+            raise InvalidLicense("Licence expirée")
+        if self.revocations.is_revoked(lic.license_id):
+            raise InvalidLicense("Licence révoquée")
+        return lic
+
+    def issue(self, license_id: str, customer: str, plan: str = "pro", expires_at: Optional[int] = None) -> str:
+        return issue_license(self.secret, license_id, customer, plan, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "revoked": len(self.revocations),
+            "revocation_reloads": self.revocations.reloads,
+            "cache": self.cache.stats(),
+        }
+
+
+# --------- Webhook Stripe : signature et événements de révocation --------- #
+
+STRIPE_TOLERANCE = 300  # secondes
+# Événements qui retirent l'accès Pro ; la licence est lue dans metadata.license_id
+REVOKING_EVENTS = {
+    "charge.refunded": "remboursement",
+    "charge.dispute.created": "litige",
+    "customer.subscription.deleted": "abonnement résilié",
+}
+
+
+class InvalidWebhook(Exception):
+    pass
+
+
+def stripe_signature(payload: bytes, secret: str, timestamp: int) -> str:
+    """En-tête Stripe-Signature pour `payload` (utile pour rejouer des événements de test)."""
+    mac = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("ascii") + payload, hashlib.sha256)
+    return f"t={timestamp},v1={mac.hexdigest()}"
+
+
+def verify_stripe_signature(payload: bytes, header: Optional[str], secret: str, now: Optional[float] = None) -> None:
+    if not header:
+        raise InvalidWebhook("En-tête Stripe-Signature manquant")
+    parts: Dict[str, list] = {}
+    for item in header.split(","):
+        k, _, v = item.strip().partition("=")
+        parts.setdefault(k, []).append(v)
+    try:
+        timestamp = int(parts["t"][0])
+    except (KeyError, ValueError):
+        raise InvalidWebhook("Horodatage de signature invalide")
+    if abs((now or time.time()) - timestamp) > STRIPE_TOLERANCE:
+        raise InvalidWebhook("Signature expirée")
+    expected = stripe_signature(payload, secret, timestamp).split("v1=", 1)[1]
+    if not any(hmac.compare_digest(expected, sig) for sig in parts.get("v1", [])):
+        raise InvalidWebhook("Signature invalide")
+
+
+def handle_stripe_event(event: Dict[str, Any], revocations: RevocationList) -> str:
+    """Applique un événement Stripe ; renvoie "revoked", "duplicate" ou "ignored"."""
+    event_id = str(event.get("id") or "")
+    reason = REVOKING_EVENTS.get(event.get("type") or "")
+    if reason is None:
+        return "ignored"
+    obj = (event.get("data") or {}).get("object") or {}
+    license_id = (obj.get("metadata") or {}).get("license_id")
+    if not license_id:
+        return "ignored"
+    if event_id and revocations.seen_event(event_id):
+        return "duplicate"
+    return "revoked" if revocations.revoke(str(license_id), event_id or None, reason) else "duplicate"
+
+
+DEFAULT_REVOCATION_PATH = Path(__file__).resolve().parents[1] / "data" / "revoked_licenses.jsonl"
+
+revocations = RevocationList(Path(os.getenv("SERENITY_LICENSE_REVOCATIONS", DEFAULT_REVOCATION_PATH)))
+
+verifier = LicenseVerifier(
+    secret=os.getenv("SERENITY_LICENSE_SECRET"),
+    revocations=revocations,
+    max_items=int(os.getenv("SERENITY_LICENSE_CACHE_ITEMS", "10000")),
+    ttl=float(os.getenv("SERENITY_LICENSE_CACHE_TTL", "600")),
+)
+
+STRIPE_WEBHOOK_SECRET = os.getenv("SERENITY_STRIPE_WEBHOOK_SECRET")
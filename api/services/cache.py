@@ -0,0 +1,206 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from services.calc import clamp_horizon, compute_projection, today0
+from services.downsample import downsample_projection
+from services.encoding import encode_json, encode_projection
+from services.entries import BudgetEntry
+from services.metrics import span
+
+
+# --------- Cache LRU + TTL borné en mémoire --------- #
+
+
+class LRUCache:
+    """
+    Cache LRU avec expiration (TTL) et borne mémoire.
+
+    - max_items : nombre maximum d'entrées
+    - max_bytes : poids total maximum (poids fourni à `set`, ex: taille du JSON)
+    - ttl       : durée de vie en secondes (0 = pas d'expiration)
+    """
+
+    def __init__(self, max_items: int = 512, max_bytes: int = 0, ttl: float = 0.0):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, _, value = item
+            if expires and expires < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: int = 0) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, size, value)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_items or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._drop(key)
+            return item[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "bytes": self._bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# --------- Cache des projections /calc --------- #
+
+
+def canonical_json(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Vrai si l'en-tête If-None-Match couvre `etag` (comparaison faible)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in candidates
+
+
+def projection_key(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Dict[str, Any] | None,
+) -> str:
+    """Empreinte canonique des entrées de compute_projection (la date du jour en fait partie)."""
+    payload = {
+        "base": float(base),
+        "currency": currency,
+        "horizon_days": clamp_horizon(horizon_days),
+        "entries": [e.fingerprint() for e in entries],
+        "scenario": scenario or {},
+        "today": today0().isoformat(),
+    }
+    return hashlib.sha256(canonical_json(payload)).hexdigest()
+
+
+projection_cache = LRUCache(
+    max_items=int(os.getenv("SERENITY_CALC_CACHE_ITEMS", "512")),
+    max_bytes=int(os.getenv("SERENITY_CALC_CACHE_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("SERENITY_CALC_CACHE_TTL", "300")),
+)
+
+
+def variant_key(key: str, layout: str = "points", fmt: str = "json", max_points: Optional[int] = None) -> str:
+    """Clé de cache d'une représentation (disposition, format, réduction) d'une projection."""
+    if (layout, fmt) != ("points", "json"):
+        key = f"{key}:{layout}:{fmt}"
+    if max_points:
+        key = f"{key}:s{max_points}"
+    return key
+
+
+def render_projection(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Dict[str, Any] | None = None,
+    layout: str = "points",
+    fmt: str = "json",
+    max_points: Optional[int] = None,
+) -> bytes:
+    """Calcul et sérialisation d'une projection, sans cache."""
+    data = compute_projection(
+        base=base,
+        currency=currency,
+        horizon_days=horizon_days,
+        entries=entries,
+        scenario=scenario,
+    )
+    if max_points:
+        with span("calc.downsample"):
+            data = downsample_projection(data, max_points)
+    with span("calc.encode"):
+        return encode_projection(data, layout, fmt)
+
+
+def cached_projection(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Dict[str, Any] | None = None,
+    key: Optional[str] = None,
+    layout: str = "points",
+    fmt: str = "json",
+    max_points: Optional[int] = None,
+) -> bytes:
+    """
+    Projection sérialisée (JSON par défaut, cf. services.encoding), servie depuis le cache si possible.
+    `max_points` réduit la courbe pour l'affichage (cf. services.downsample).
+    """
+    if key is None:
+        key = projection_key(base, currency, horizon_days, entries, scenario)
+    key = variant_key(key, layout, fmt, max_points)
+    body = projection_cache.get(key)
+    if body is None:
+        body = render_projection(base, currency, horizon_days, entries, scenario, layout, fmt, max_points)
+        projection_cache.set(key, body, size=len(body))
+    return body
@@ -1,6 +1,13 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datetime import date, timedelta
+from itertools import accumulate
+
+from services import recurrence
+from services.aggregate import RECURRING_LABELS, BudgetAggregates
+from services.entries import BudgetEntry, Cat, Kind, Rec, normalize_entries
+from services.metrics import span
 
 
 def today0() -> date:
@@ -13,74 +20,48 @@ def add_days(d: date, n: int) -> date:
 
 # --------- Projection des événements et courbe journalière --------- #
 
+# Moteurs disponibles pour project_daily :
+# - "buckets" : deltas cumulés par jour dans un tableau, puis somme cumulative
+# - "events"  : implémentation historique (un dict par événement, tri, parcours)
+ENGINES = ("buckets", "events")
+DEFAULT_ENGINE = os.getenv("SERENITY_CALC_ENGINE", "buckets")
+
+
+def occurrence_offsets(e: BudgetEntry, horizon_days: int, start: date) -> List[int]:
+    """Décalages (en jours depuis `start`) de chaque occurrence de la ligne dans l'horizon."""
+    return recurrence.occurrence_offsets(
+        e.rec, e.anchor(start), start, horizon_days, every_days=e.every_days, until=e.end
+    )
+
 
-def generate_events(entries: List[Dict[str, Any]], horizon_days: int, start: date) -> List[Dict[str, Any]]:
+def generate_events(entries: List[BudgetEntry], horizon_days: int, start: date) -> List[Dict[str, Any]]:
     evts: List[Dict[str, Any]] = []
     end = add_days(start, horizon_days)
 
     for e in entries:
-        try:
-            amt = float(e.get("amount") or 0.0)
-        except (TypeError, ValueError):
-            amt = 0.0
-        if amt == 0:
-            continue
-
-        typ = e.get("type") or "expense"
-        sign = 1.0 if typ == "income" else -1.0
-        rec = e.get("rec") or "monthly"
-
-        start_str = e.get("start")
-        if start_str:
-            try:
-                y, m, d = map(int, start_str.split("-"))
-                d0 = date(y, m, d)
-            except Exception:
-                d0 = start
-        else:
-            d0 = start
-
-        if d0 < start:
-            d0 = start
-
-        def push(dt: date) -> None:
-            if dt <= end:
-                evts.append({"date": dt, "delta": sign * amt})
-
-        if rec == "oneoff":
-            push(d0)
-        else:
-            cur = d0
-            while cur <= end:
-                push(cur)
-                if rec == "weekly":
-                    cur = cur + timedelta(days=7)
-                elif rec == "monthly":
-                    # approximatif mais suffisant pour la projection
-                    month = cur.month + 1
-                    year = cur.year + (month - 1) // 12
-                    month = ((month - 1) % 12) + 1
-                    cur = date(year, month, cur.day if cur.day <= 28 else 28)
-                elif rec == "quarterly":
-                    month = cur.month + 3
-                    year = cur.year + (month - 1) // 12
-                    month = ((month - 1) % 12) + 1
-                    cur = date(year, month, cur.day if cur.day <= 28 else 28)
-                elif rec == "yearly":
-                    cur = date(cur.year + 1, cur.month, cur.day if cur.day <= 28 else 28)
-                else:
-                    # fallback -> monthly
-                    month = cur.month + 1
-                    year = cur.year + (month - 1) // 12
-                    month = ((month - 1) % 12) + 1
-                    cur = date(year, month, cur.day if cur.day <= 28 else 28)
+        delta = e.delta
+        for dt in recurrence.iter_occurrences(e.rec, e.anchor(start), end, every_days=e.every_days, until=e.end):
+            evts.append({"date": dt, "delta": delta})
 
     evts.sort(key=lambda x: x["date"])
     return evts
 
 
-def project_daily(base: float, entries: List[Dict[str, Any]], horizon_days: int) -> List[Dict[str, Any]]:
-    start = today0()
+def day_deltas(entries: List[BudgetEntry], horizon_days: int, start: date) -> List[float]:
+    """Somme des mouvements par jour : deltas[d] = total des événements du jour start + d."""
+    return BudgetAggregates(horizon_days, start).extend(entries).deltas
+
+
+def curve_from_deltas(base: float, deltas: List[float], start: date) -> List[Dict[str, Any]]:
+    balances = accumulate(deltas, initial=float(base))
+    next(balances)
+    return [
+        {"date": add_days(start, d).isoformat(), "balance": round(bal, 2)}
+        for d, bal in enumerate(balances)
+    ]
+
+
+def _project_daily_events(base: float, entries: List[BudgetEntry], horizon_days: int, start: date) -> List[Dict[str, Any]]:
     evts = generate_events(entries, horizon_days, start)
     out: List[Dict[str, Any]] = []
     bal = float(base)
@@ -94,88 +75,68 @@ def project_daily(base: float, entries: List[Dict[str, Any]], horizon_days: int)
     return out
 
 
+def _project_daily_buckets(base: float, entries: List[BudgetEntry], horizon_days: int, start: date) -> List[Dict[str, Any]]:
+    return curve_from_deltas(base, day_deltas(entries, horizon_days, start), start)
+
+
+def project_daily(
+    base: float,
+    entries: List[Any],
+    horizon_days: int,
+    engine: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    start = today0()
+    entries = normalize_entries(entries)
+    engine = engine or DEFAULT_ENGINE
+    if engine == "events":
+        return _project_daily_events(base, entries, horizon_days, start)
+    if engine == "buckets":
+        return _project_daily_buckets(base, entries, horizon_days, start)
+    raise ValueError(f"Moteur de projection inconnu: {engine}")
+
+
 # --------- KPI mensuels + scénarios --------- #
 
 
-def apply_scenario(entries: List[Dict[str, Any]], scenario: Dict[str, Any]) -> List[Dict[str, Any]]:
-    var_mul = float(scenario.get("var_mul", 1.0) or 1.0)
-    extra_income = float(scenario.get("extra_income", 0.0) or 0.0)
-    extra_credit = float(scenario.get("extra_credit", 0.0) or 0.0)
+def apply_scenario(entries: List[BudgetEntry], scenario: Dict[str, Any]) -> List[BudgetEntry]:
+    var_mul, extra_income, extra_credit = scenario_params(scenario)
 
-    out = [dict(e) for e in entries]
+    # Seules les lignes ajustées sont recréées, les autres sont partagées
+    out = list(entries)
 
     # -10% variables
     if var_mul != 1.0:
-        for e in out:
-            if e.get("type") == "expense" and e.get("cat") == "variable":
-                try:
-                    amt = float(e.get("amount") or 0.0)
-                except (TypeError, ValueError):
-                    amt = 0.0
-                if amt != 0.0:
-                    e["amount"] = round(amt * var_mul, 2)
+        out = [e.with_amount(round(e.amount * var_mul, 2)) if e.scaled_by_scenario else e for e in out]
 
     # + X revenu mensuel
     if extra_income > 0:
-        out.append(
-            {
-                "type": "income",
-                "amount": extra_income,
-                "rec": "monthly",
-                "cat": "fixed",
-                "start": today0().isoformat(),
-            }
-        )
+        out.append(scenario_line(Kind.INCOME, Cat.FIXED, extra_income))
 
     # + X crédit mensuel
     if extra_credit > 0:
-        out.append(
-            {
-                "type": "expense",
-                "amount": extra_credit,
-                "rec": "monthly",
-                "cat": "credit",
-                "start": today0().isoformat(),
-            }
-        )
+        out.append(scenario_line(Kind.EXPENSE, Cat.CREDIT, extra_credit))
 
     return out
 
 
-def monthly_kpis(entries: List[Dict[str, Any]]) -> Dict[str, float]:
-    inc = fix = vari = cred = 0.0
-    for e in entries:
-        try:
-            amt = float(e.get("amount") or 0.0)
-        except (TypeError, ValueError):
-            amt = 0.0
-        if amt == 0:
-            continue
-
-        rec = e.get("rec") or "monthly"
-        factor: float
-        if rec == "weekly":
-            factor = 4.333
-        elif rec == "monthly":
-            factor = 1.0
-        elif rec == "quarterly":
-            factor = 1.0 / 3.0
-        elif rec == "yearly":
-            factor = 1.0 / 12.0
-        else:
-            factor = 0.0  # oneoff -> ignoré pour KPI mensuels
-
-        m_amt = amt * factor
-        if e.get("type") == "income":
-            inc += m_amt
-        else:
-            cat = e.get("cat") or "variable"
-            if cat == "fixed":
-                fix += m_amt
-            elif cat == "credit":
-                cred += m_amt
-            else:
-                vari += m_amt
+def scenario_line(kind: Kind, cat: Cat, amount: float) -> BudgetEntry:
+    return BudgetEntry(kind=kind, amount=amount, rec=Rec.MONTHLY, cat=cat, start=today0())
+
+
+def scenario_params(scenario: Dict[str, Any]) -> Tuple[float, float, float]:
+    var_mul = float(scenario.get("var_mul", 1.0) or 1.0)
+    extra_income = float(scenario.get("extra_income", 0.0) or 0.0)
+    extra_credit = float(scenario.get("extra_credit", 0.0) or 0.0)
+    return var_mul, extra_income, extra_credit
+
+
+def kpi_sums(entries: List[BudgetEntry]) -> Dict[str, float]:
+    """Sommes mensualisées brutes (revenus, fixe, variable, crédit)."""
+    return BudgetAggregates().extend(entries).kpi
+
+
+def kpis_from_sums(sums: Dict[str, float]) -> Dict[str, float]:
+    inc, fix, vari, cred = sums["inc"], sums["fix"], sums["vari"], sums["cred"]
 
     total_exp = fix + vari + cred
     debt_ratio = (cred / inc) if inc > 0 else 0.0  # crédit/revenus
@@ -194,6 +155,10 @@ def monthly_kpis(entries: List[Dict[str, Any]]) -> Dict[str, float]:
     }
 
 
+def monthly_kpis(entries: List[Any]) -> Dict[str, float]:
+    return kpis_from_sums(kpi_sums(normalize_entries(entries)))
+
+
 # --------- Score & breakdown (mêmes règles que le front) --------- #
 
 
@@ -251,40 +216,16 @@ def breakdown_by_category_from_kpis(k: Dict[str, float]) -> List[Dict[str, Any]]
     ]
 
 
-def breakdown_by_recurring(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    sums = {"Mensuel": 0.0, "Hebdo": 0.0, "Ponctuel": 0.0, "Trimestriel": 0.0, "Annuel": 0.0}
-    for e in entries:
-        try:
-            amt = float(e.get("amount") or 0.0)
-        except (TypeError, ValueError):
-            amt = 0.0
-        if amt == 0.0:
-            continue
-
-        rec = e.get("rec") or "monthly"
-        if rec == "weekly":
-            m_amt = amt * 4.333
-            sums["Hebdo"] += m_amt
-        elif rec == "monthly":
-            m_amt = amt
-            sums["Mensuel"] += m_amt
-        elif rec == "quarterly":
-            m_amt = amt / 3.0
-            sums["Trimestriel"] += m_amt
-        elif rec == "yearly":
-            m_amt = amt / 12.0
-            sums["Annuel"] += m_amt
-        elif rec == "oneoff":
-            m_amt = amt
-            sums["Ponctuel"] += m_amt
+def recurring_sums(entries: List[BudgetEntry]) -> Dict[str, float]:
+    return BudgetAggregates().extend(entries).rec
 
-    return [
-        {"label": "Mensuel", "amount": round(sums["Mensuel"], 2)},
-        {"label": "Hebdo", "amount": round(sums["Hebdo"], 2)},
-        {"label": "Ponctuel", "amount": round(sums["Ponctuel"], 2)},
-        {"label": "Trimestriel", "amount": round(sums["Trimestriel"], 2)},
-        {"label": "Annuel", "amount": round(sums["Annuel"], 2)},
-    ]
+
+def breakdown_from_recurring_sums(sums: Dict[str, float]) -> List[Dict[str, Any]]:
+    return [{"label": label, "amount": round(sums[label], 2)} for label in RECURRING_LABELS]
+
+
+def breakdown_by_recurring(entries: List[Any]) -> List[Dict[str, Any]]:
+    return breakdown_from_recurring_sums(recurring_sums(normalize_entries(entries)))
 
 
 def build_tips(score_pack: Dict[str, Any], k: Dict[str, float], cur: str) -> List[str]:
@@ -313,49 +254,50 @@ def build_tips(score_pack: Dict[str, Any], k: Dict[str, float], cur: str) -> Lis
     return tips
 
 
-# --------- Fonction principale : moteur /calc --------- #
-
+# --------- Budget préparé : récurrences développées une fois, N scénarios --------- #
 
-def compute_projection(
-    base: float,
-    currency: str,
-    horizon_days: int,
-    entries: List[Dict[str, Any]],
-    scenario: Dict[str, Any] | None = None,
-) -> Dict[str, Any]:
-    if scenario is None:
-        scenario = {}
 
-    horizon_days = max(30, min(int(horizon_days or 90), 365))
+def clamp_horizon(horizon_days: int) -> int:
+    return max(30, min(int(horizon_days or 90), 365))
 
-    # Applique scénario
-    entries_scn = apply_scenario(entries, scenario)
 
-    # Courbe journalière
-    curve = project_daily(base, entries_scn, horizon_days)
+MILESTONE_DAYS = {"m1": 30, "m6": 180, "m12": 365}
 
-    # KPI mensuels
-    kpi = monthly_kpis(entries_scn)
 
-    # Score
-    score_pack = compute_score_from_kpis(kpi)
+def milestones_from_balances(balances: Sequence[float]) -> Dict[str, float]:
+    last = len(balances) - 1
+    return {key: round(balances[min(d, last)], 2) for key, d in MILESTONE_DAYS.items()}
 
-    # Milestones
-    def idx(d: int) -> int:
-        return min(d, len(curve) - 1)
 
-    milestones = {
-        "m1": round(curve[idx(30)]["balance"], 2),
-        "m6": round(curve[idx(180)]["balance"], 2),
-        "m12": round(curve[idx(365)]["balance"], 2),
+def summary_fields(kpi: Dict[str, float], by_rec: List[Dict[str, Any]], currency: str) -> Dict[str, Any]:
+    """KPI exposés, score, répartitions et conseils (tout sauf la courbe)."""
+    score_pack = compute_score_from_kpis(kpi)
+    return {
+        "kpi": {
+            **kpi,
+            "debt_pct": kpi["debt_pct"],
+            "reste_a_vivre": kpi["reste"],
+            "save_pct": kpi["save_pct"],
+        },
+        "score": score_pack,
+        "breakdown": {
+            "by_category": breakdown_by_category_from_kpis(kpi),
+            "by_recurring": by_rec,
+        },
+        "tips": build_tips(score_pack, kpi, currency),
     }
 
-    # Breakdown
-    by_cat = breakdown_by_category_from_kpis(kpi)
-    by_rec = breakdown_by_recurring(entries_scn)
-
-    tips = build_tips(score_pack, kpi, currency)
 
+def _assemble_result(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    scenario: Dict[str, Any],
+    curve: List[Dict[str, Any]],
+    kpi: Dict[str, float],
+    by_rec: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    summary = summary_fields(kpi, by_rec, currency)
     return {
         "meta": {
             "currency": currency,
@@ -365,18 +307,149 @@ def compute_projection(
             "base": base,
             "scenario": scenario,
         },
-        "kpi": {
-            **kpi,
-            "debt_pct": kpi["debt_pct"],
-            "reste_a_vivre": kpi["reste"],
-            "save_pct": kpi["save_pct"],
-        },
-        "score": score_pack,
-        "milestones": milestones,
+        "kpi": summary["kpi"],
+        "score": summary["score"],
+        "milestones": milestones_from_balances([p["balance"] for p in curve]),
         "curve": curve,
-        "breakdown": {
-            "by_category": by_cat,
-            "by_recurring": by_rec,
-        },
-        "tips": tips,
+        "breakdown": summary["breakdown"],
+        "tips": summary["tips"],
     }
+
+
+class PreparedBudget:
+    """
+    Budget dont les récurrences sont développées une seule fois.
+
+    Les lignes insensibles au scénario sont figées dans un tableau de deltas
+    journaliers ; seules les dépenses variables (var_mul) et les lignes ajoutées
+    (extra_income / extra_credit) y sont rejouées par scénario. Les sommes
+    mensuelles (KPI, récurrences) sont refaites dans l'ordre des lignes.
+    """
+
+    def __init__(self, base: float, currency: str, horizon_days: int, entries: List[Any]):
+        self.base = base
+        self.currency = currency
+        self.horizon_days = clamp_horizon(horizon_days)
+        self.start = today0()
+
+        # Une seule passe : agrégats des lignes fixes, offsets des dépenses variables
+        self.entries = normalize_entries(entries)
+        self.fixed = BudgetAggregates(self.horizon_days, self.start)
+        # (ligne, offsets) des dépenses variables, rejouées avec var_mul
+        self.scaled: List[Tuple[BudgetEntry, List[int]]] = []
+        for e in self.entries:
+            if e.scaled_by_scenario:
+                self.scaled.append((e, occurrence_offsets(e, self.horizon_days, self.start)))
+            else:
+                self.fixed.add(e)
+        self._monthly_offsets: Optional[List[int]] = None
+
+    def monthly_offsets(self) -> List[int]:
+        # Lignes ajoutées par scénario : mensuelles à partir d'aujourd'hui
+        if self._monthly_offsets is None:
+            self._monthly_offsets = recurrence.occurrence_offsets(
+                Rec.MONTHLY, self.start, self.start, self.horizon_days
+            )
+        return self._monthly_offsets
+
+    def overlay(self, scenario: Dict[str, Any]) -> BudgetAggregates:
+        """Agrégats (deltas journaliers, KPI, récurrences) du budget sous un scénario."""
+        var_mul, extra_income, extra_credit = scenario_params(scenario)
+
+        agg = self.fixed.copy()
+        deltas = agg.deltas
+        # Sommes mensuelles refaites dans l'ordre des lignes (quelques additions par ligne) :
+        # mêmes arrondis au centime que le calcul historique sur les lignes scénarisées
+        sums = BudgetAggregates()
+
+        for e in self.entries:
+            if var_mul != 1.0 and e.scaled_by_scenario:
+                e = e.with_amount(round(e.amount * var_mul, 2))
+            sums.add(e)
+
+        # Deltas journaliers : seules les dépenses variables sont rejouées (offsets déjà connus)
+        for e, offsets in self.scaled:
+            amt = round(e.amount * var_mul, 2) if var_mul != 1.0 else e.amount
+            for off in offsets:
+                deltas[off] -= amt
+
+        if extra_income > 0:
+            for off in self.monthly_offsets():
+                deltas[off] += extra_income
+            sums.add(scenario_line(Kind.INCOME, Cat.FIXED, extra_income))
+        if extra_credit > 0:
+            for off in self.monthly_offsets():
+                deltas[off] -= extra_credit
+            sums.add(scenario_line(Kind.EXPENSE, Cat.CREDIT, extra_credit))
+
+        agg.replace_sums(sums)
+        return agg
+
+    def evaluate(self, scenario: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        if scenario is None:
+            scenario = {}
+        with span("calc.overlay"):
+            agg = self.overlay(scenario)
+        with span("calc.curve"):
+            curve = curve_from_deltas(self.base, agg.deltas, self.start)
+        with span("calc.summary"):
+            return _assemble_result(
+                self.base,
+                self.currency,
+                self.horizon_days,
+                scenario,
+                curve,
+                kpis_from_sums(agg.kpi),
+                breakdown_from_recurring_sums(agg.rec),
+            )
+
+
+# --------- Fonction principale : moteur /calc --------- #
+
+
+def compute_projection(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[Any],
+    scenario: Dict[str, Any] | None = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """`entries` : BudgetEntry déjà normalisées, ou lignes brutes (dicts / modèles Entry)."""
+    if scenario is None:
+        scenario = {}
+
+    engine = engine or DEFAULT_ENGINE
+    if engine == "buckets":
+        with span("calc.prepare"):
+            prepared = PreparedBudget(base, currency, horizon_days, entries)
+        return prepared.evaluate(scenario)
+
+    horizon_days = clamp_horizon(horizon_days)
+
+    # Applique scénario
+    with span("calc.scenario"):
+        entries_scn = apply_scenario(normalize_entries(entries), scenario)
+
+    # Courbe journalière
+    with span("calc.project"):
+        curve = project_daily(base, entries_scn, horizon_days, engine=engine)
+
+    # KPI mensuels
+    with span("calc.summary"):
+        kpi = monthly_kpis(entries_scn)
+        return _assemble_result(
+            base, currency, horizon_days, scenario, curve, kpi, breakdown_by_recurring(entries_scn)
+        )
+
+
+def compute_projection_batch(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[Any],
+    scenarios: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """N scénarios sur le même budget : les récurrences ne sont développées qu'une fois."""
+    prepared = PreparedBudget(base, currency, horizon_days, entries)
+    return [prepared.evaluate(scn) for scn in scenarios]
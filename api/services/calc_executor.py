@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.cache import projection_cache, render_projection
+from services.entries import BudgetEntry
+from services.metrics import add_request_spans, collect_spans, observe_span
+
+# --------- Calcul /calc hors de la boucle async, requêtes identiques fusionnées --------- #
+#
+# - Exécuteur configurable (SERENITY_CALC_EXECUTOR) :
+#     threads   : pool de threads dédié (pas celui de FastAPI, partagé avec les routes sync)
+#     processes : processus "spawn", pour les gros budgets sans contention du GIL
+# - Single-flight : des requêtes identiques arrivées pendant un calcul (double clic,
+#   nouvelles tentatives) attendent le même résultat au lieu de relancer le calcul.
+#   Le calcul partagé est protégé (shield) : un client qui abandonne n'annule pas les autres.
+# - Nombre de calculs distincts en cours borné : au-delà, CalcSaturated (503 + Retry-After).
+# - Même pool pour /calc/risk (call) : au plus `workers` simulations Monte Carlo
+#   (tableaux numpy de plusieurs Mo) tournent en même temps.
+
+EXECUTOR_KINDS = ("threads", "processes")
+
+
+class CalcSaturated(Exception):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(f"Calcul saturé, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _project(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Dict[str, Any],
+    layout: str,
+    fmt: str,
+    max_points: Optional[int],
+) -> Tuple[bytes, List[Tuple[str, float]]]:
+    # Spans renvoyés avec le résultat : le Server-Timing est rempli côté boucle async
+    with collect_spans() as spans:
+        body = render_projection(base, currency, horizon_days, entries, scenario, layout, fmt, max_points)
+    return body, spans
+
+
+def _risk(kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Tuple[str, float]]]:
+    # numpy chargé au premier appel, dans le worker
+    from services.risk import compute_risk
+
+    with collect_spans() as spans:
+        out = compute_risk(**kwargs)
+    return out, spans
+
+
+def _noop() -> None:
+    return None
+
+
+class CalcExecutor:
+    """
+    - kind        : "threads" ou "processes"
+    - workers     : threads / processes de calcul
+    - max_pending : calculs distincts acceptés en même temps (en cours + en attente)
+    """
+
+    def __init__(self, kind: str = "threads", workers: int = 4, max_pending: int = 64):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Exécuteur de calcul inconnu: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[Executor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.computed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    # ---- cycle de vie ---- #
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "processes":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="calc")
+        return self._executor
+
+    async def start(self) -> None:
+        """Démarre les workers (processus : imports faits avant la première requête)."""
+        executor = self._ensure_executor()
+        if self.kind == "processes":
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- calcul ---- #
+
+    async def _compute(
+        self, fn: Callable[..., Tuple[Any, List[Tuple[str, float]]]], args: Tuple[Any, ...]
+    ) -> Tuple[Any, List[Tuple[str, float]]]:
+        executor = self._ensure_executor()
+        t0 = time.perf_counter()
+        try:
+            result, spans = await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+        except BrokenProcessPool:
+            # Processus mort (OOM...) : pool neuf pour les requêtes suivantes
+            if executor is self._executor:
+                self.shutdown()
+            raise
+        if self.kind == "processes":
+            # Mesurés dans un autre processus : histogrammes alimentés ici
+            for name, seconds in spans:
+                observe_span(name, seconds, request=False)
+        observe_span("calc.executor", time.perf_counter() - t0, request=False)
+        self.computed += 1
+        return result, spans
+
+    async def run(self, key: str, *args: Any) -> bytes:
+        """Résultat de `_project(*args)` ; un seul calcul par `key` à la fois."""
+        return await self.call(key, _project, *args)
+
+    async def risk(self, key: str, **kwargs: Any) -> Dict[str, Any]:
+        """services.risk.compute_risk(**kwargs) sur le pool ; un seul calcul par `key` à la fois."""
+        return await self.call(f"risk:{key}", _risk, kwargs)
+
+    async def call(self, key: str, fn: Callable[..., Tuple[Any, List[Tuple[str, float]]]], *args: Any) -> Any:
+        """`fn(*args)` -> (résultat, spans) sur le pool, single-flight par `key`, borné par max_pending."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            if len(self._inflight) >= self.max_pending:
+                self.rejected += 1
+                raise CalcSaturated()
+            fut = asyncio.ensure_future(self._compute(fn, args))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._inflight.pop(key, None) if self._inflight.get(key) is f else None)
+        result, spans = await asyncio.shield(fut)
+        add_request_spans(spans)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "inflight": len(self._inflight),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
+
+
+async def cached_projection_async(
+    key: str,
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Dict[str, Any],
+    layout: str = "points",
+    fmt: str = "json",
+    max_points: Optional[int] = None,
+) -> bytes:
+    """Comme services.cache.cached_projection, calcul délégué à `calc_executor`. `key` : clé de variante."""
+    body = projection_cache.get(key)
+    if body is None:
+        body = await calc_executor.run(key, base, currency, horizon_days, entries, scenario, layout, fmt, max_points)
+        projection_cache.set(key, body, size=len(body))
+    return body
+
+
+calc_executor = CalcExecutor(
+    kind=os.getenv("SERENITY_CALC_EXECUTOR", "threads"),
+    workers=int(os.getenv("SERENITY_CALC_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_pending=int(os.getenv("SERENITY_CALC_PENDING", "64")),
+)
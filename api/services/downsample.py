@@ -0,0 +1,93 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence
+
+# --------- Réduction de courbe pour l'affichage (LTTB) --------- #
+#
+# Largest-Triangle-Three-Buckets : le premier et le dernier point sont gardés,
+# les autres sont répartis en `max_points - 2` seaux ; dans chaque seau on garde
+# le point qui forme le plus grand triangle avec le point retenu précédemment et
+# la moyenne du seau suivant. La forme visuelle est conservée pour un coût O(n).
+#
+# Règles propres à un solde de compte, prioritaires sur l'aire :
+#   - le minimum global et le premier passage sous zéro sont toujours gardés
+#     (une place est réservée quand les deux sont distincts, un seau peut alors en
+#     garder deux ; au moins 4 points pour cela, sinon seul le minimum est garanti) ;
+#   - un autre seau qui passe sous zéro garde son point le plus bas (découvert
+#     visible), même si un point positif formait un plus grand triangle.
+
+
+def _first_negative(values: Sequence[float]) -> Optional[int]:
+    for i, y in enumerate(values):
+        if y < 0:
+            return i
+    return None
+
+
+def lttb_indices(values: Sequence[float], max_points: int) -> List[int]:
+    """Indices (croissants) des points retenus ; tous si la série est déjà assez courte."""
+    n = len(values)
+    if max_points >= n or max_points < 3:
+        return list(range(n))
+
+    global_min = min(range(n), key=values.__getitem__)
+    forced = {i for i in (global_min, _first_negative(values)) if i is not None and 0 < i < n - 1}
+    if len(forced) > 1 and max_points < 4:
+        forced = {global_min}
+    inner, buckets = n - 2, max_points - 2 - max(0, len(forced) - 1)
+    out = [0]
+    a = 0
+    for i in range(buckets):
+        # Bornes entières : le dernier seau finit exactement en n - 1
+        lo = i * inner // buckets + 1
+        hi = (i + 1) * inner // buckets + 1
+
+        kept = sorted(j for j in forced if lo <= j < hi)
+        if kept:
+            out.extend(kept)
+            a = kept[-1]
+            continue
+
+        # Moyenne du seau suivant (ou dernier point)
+        nxt_lo = hi
+        nxt_hi = min((i + 2) * inner // buckets + 1, n)
+        if nxt_lo >= nxt_hi:
+            avg_x, avg_y = float(n - 1), values[n - 1]
+        else:
+            avg_x = (nxt_lo + nxt_hi - 1) / 2.0
+            avg_y = sum(values[nxt_lo:nxt_hi]) / (nxt_hi - nxt_lo)
+
+        ax, ay = a, values[a]
+        chosen, best = lo, -1.0
+        low, low_value = lo, values[lo]
+        for j in range(lo, hi):
+            y = values[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - j) * (avg_y - ay))
+            if area > best:
+                chosen, best = j, area
+            if y < low_value:
+                low, low_value = j, y
+        if low_value < 0 <= values[chosen]:
+            chosen = low
+        out.append(chosen)
+        a = chosen
+    out.append(n - 1)
+    return out
+
+
+def downsample_curve(curve: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """Sous-ensemble des points {date, balance} de `curve`, au plus `max_points`."""
+    if len(curve) <= max_points:
+        return curve
+    indices = lttb_indices([p["balance"] for p in curve], max_points)
+    return [curve[i] for i in indices]
+
+
+def downsample_projection(result: Dict[str, Any], max_points: int) -> Dict[str, Any]:
+    """Copie superficielle du résultat /calc avec une courbe réduite (dates conservées par point)."""
+    curve = result.get("curve") or []
+    if len(curve) <= max_points:
+        return result
+    out = dict(result)
+    out["curve"] = downsample_curve(curve, max_points)
+    out["curve_sampling"] = {"method": "lttb", "points": len(out["curve"]), "source_points": len(curve)}
+    return out
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import json
+import sys
+from array import array
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+try:  # encodeur JSON rapide, facultatif
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+
+try:  # sortie binaire msgpack, facultative
+    import msgpack
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    msgpack = None
+
+
+# --------- Encodages de la réponse /calc (courbe compacte, JSON rapide, binaire) --------- #
+#
+# Disposition de la courbe (`curve=`) :
+#   - points   : [{"date": ..., "balance": ...}, ...] (historique, par défaut)
+#   - columnar : {"start": date, "step_days": 1, "balances": [...]}
+#   - deltas   : {"start": date, "step_days": 1, "first": solde J0, "deltas": [J1-J0, ...]}
+#                (arrondis au centime ; reconstruire en cumulant puis arrondissant à 2 décimales)
+#   Courbe réduite (`max_points`, cf. services.downsample) : les points ne sont plus
+#   espacés d'un jour ; columnar et deltas portent alors "days" (décalage de chaque
+#   point depuis start) à la place de "step_days".
+#
+# Format (`format=` ou en-tête Accept) :
+#   - json    : application/json (orjson si disponible)
+#   - msgpack : application/msgpack, même structure que le JSON (paquet `msgpack`,
+#               listé dans requirements.txt ; absent -> 406 qui le signale)
+#   - f32     : application/octet-stream, la courbe seule en float32 little-endian
+#               (soldes, ou deltas avec curve=deltas) ; début et disposition en en-têtes.
+#               Précision float32 : ~7 chiffres significatifs, le centime n'est plus
+#               garanti au-delà de ~80 000.
+
+CURVE_LAYOUTS = ("points", "columnar", "deltas")
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "f32": "application/octet-stream",
+}
+_ACCEPT_FORMATS = {
+    "application/json": "json",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/octet-stream": "f32",
+}
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def encode_json(obj: Any) -> bytes:
+    # Même sortie que JSONResponse (Starlette), plus rapide via orjson
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def available_formats() -> List[str]:
+    return [f for f in MEDIA_TYPES if f != "msgpack" or msgpack is not None]
+
+
+def negotiate_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """Format demandé : paramètre explicite, sinon premier type connu de l'en-tête Accept, sinon json."""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in MEDIA_TYPES:
+            raise UnsupportedFormat(f"Format inconnu: {fmt}")
+    else:
+        fmt = "json"
+        for part in (accept or "").split(","):
+            media = part.split(";")[0].strip().lower()
+            if media in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[media]
+                break
+    if fmt == "msgpack" and msgpack is None:
+        raise UnsupportedFormat(
+            "Format msgpack indisponible : dépendance facultative `msgpack` absente sur ce serveur "
+            f"(formats disponibles : {', '.join(available_formats())})"
+        )
+    return fmt
+
+
+# ---- dispositions de courbe ---- #
+
+
+def curve_balances(curve: List[Dict[str, Any]]) -> List[float]:
+    return [p["balance"] for p in curve]
+
+
+def curve_days(curve: List[Dict[str, Any]]) -> List[int]:
+    """Décalage en jours de chaque point depuis le premier (courbe réduite)."""
+    if not curve:
+        return []
+    start = date.fromisoformat(curve[0]["date"]).toordinal()
+    return [date.fromisoformat(p["date"]).toordinal() - start for p in curve]
+
+
+def _spacing(curve: List[Dict[str, Any]], sampled: bool) -> Dict[str, Any]:
+    return {"days": curve_days(curve)} if sampled else {"step_days": 1}
+
+
+def columnar_curve(curve: List[Dict[str, Any]], sampled: bool = False) -> Dict[str, Any]:
+    return {"start": curve[0]["date"] if curve else None, **_spacing(curve, sampled), "balances": curve_balances(curve)}
+
+
+def balance_deltas(balances: List[float]) -> List[float]:
+    # 0 plutôt que 0.0 : la plupart des jours sont sans mouvement
+    return [round(b - a, 2) or 0 for a, b in zip(balances, balances[1:])]
+
+
+def delta_curve(curve: List[Dict[str, Any]], sampled: bool = False) -> Dict[str, Any]:
+    balances = curve_balances(curve)
+    return {
+        "start": curve[0]["date"] if curve else None,
+        **_spacing(curve, sampled),
+        "first": balances[0] if balances else None,
+        "deltas": balance_deltas(balances),
+    }
+
+
+def reshape_curve(result: Dict[str, Any], layout: str) -> Dict[str, Any]:
+    """Copie superficielle du résultat avec la courbe dans la disposition demandée."""
+    if layout == "points":
+        return result
+    if layout not in CURVE_LAYOUTS:
+        raise UnsupportedFormat(f"Disposition de courbe inconnue: {layout}")
+    out = dict(result)
+    sampled = "curve_sampling" in result
+    if layout == "columnar":
+        out["curve"] = columnar_curve(result["curve"], sampled)
+    else:
+        out["curve"] = delta_curve(result["curve"], sampled)
+    return out
+
+
+def curve_buffer(result: Dict[str, Any], layout: str) -> bytes:
+    """Courbe (soldes, ou premier solde + deltas) en float32 little-endian."""
+    balances = curve_balances(result["curve"])
+    values = balances[:1] + balance_deltas(balances) if layout == "deltas" else balances
+    buf = array("f", values)
+    if sys.byteorder != "little":
+        buf.byteswap()
+    return buf.tobytes()
+
+
+def curve_headers(start: str, length: int, layout: str) -> Dict[str, str]:
+    """En-têtes décrivant un tampon float32 (le corps ne contient que les valeurs)."""
+    return {
+        "X-Curve-Start": start,
+        "X-Curve-Layout": "deltas" if layout == "deltas" else "columnar",
+        "X-Curve-Length": str(length),
+    }
+
+
+def encode_projection(result: Dict[str, Any], layout: str = "points", fmt: str = "json") -> bytes:
+    if fmt == "f32":
+        return curve_buffer(result, layout)
+    data = reshape_curve(result, layout)
+    if fmt == "msgpack":
+        return msgpack.packb(data, use_bin_type=True)
+    return encode_json(data)
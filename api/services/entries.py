@@ -0,0 +1,138 @@
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from datetime import date
+from enum import Enum
+from typing import Any, Iterable, List, Optional, Tuple
+
+from services import recurrence
+
+# --------- Représentation typée et compacte des lignes de budget --------- #
+#
+# Les lignes reçues (modèles Pydantic ou dicts) sont normalisées une seule fois
+# par requête : montant converti en float, dates parsées, type/récurrence/
+# catégorie ramenés à des codes d'énumération. Tout services.calc travaille
+# ensuite sur ces objets sans re-parser ni comparer de chaînes libres.
+
+
+class Kind(str, Enum):
+    INCOME = "income"
+    EXPENSE = "expense"
+    OTHER = "other"  # type inconnu : compté comme dépense, jamais touché par un scénario
+
+
+class Rec(str, Enum):
+    # Les valeurs sont les types de services.recurrence
+    ONEOFF = recurrence.ONEOFF
+    WEEKLY = recurrence.WEEKLY
+    BIWEEKLY = recurrence.BIWEEKLY
+    EVERY_N_DAYS = recurrence.EVERY_N_DAYS
+    MONTHLY = recurrence.MONTHLY
+    QUARTERLY = recurrence.QUARTERLY
+    YEARLY = recurrence.YEARLY
+    LAST_BUSINESS_DAY = recurrence.LAST_BUSINESS_DAY
+    OTHER = "other"  # récurrence inconnue : projetée en mensuel, ignorée des KPI
+
+
+class Cat(str, Enum):
+    FIXED = "fixed"
+    VARIABLE = "variable"
+    CREDIT = "credit"
+    OTHER = "other"  # catégorie absente/inconnue : comptée en variable, non ajustée par var_mul
+
+
+_KINDS = {k.value: k for k in Kind}
+_RECS = {r.value: r for r in Rec}
+_CATS = {c.value: c for c in Cat}
+
+
+@dataclass(slots=True)
+class BudgetEntry:
+    kind: Kind
+    amount: float
+    rec: Rec = Rec.MONTHLY
+    cat: Cat = Cat.FIXED
+    start: Optional[date] = None
+    end: Optional[date] = None
+    every_days: Optional[int] = None
+
+    @property
+    def delta(self) -> float:
+        """Mouvement signé appliqué au solde à chaque occurrence."""
+        return self.amount if self.kind is Kind.INCOME else -self.amount
+
+    @property
+    def scaled_by_scenario(self) -> bool:
+        """Dépense variable explicite : seule ligne ajustée par var_mul."""
+        return self.kind is Kind.EXPENSE and self.cat is Cat.VARIABLE
+
+    def anchor(self, today: date) -> date:
+        """Première occurrence projetée : une date passée (ou absente) ramène à aujourd'hui."""
+        d0 = self.start
+        return d0 if d0 is not None and d0 >= today else today
+
+    def with_amount(self, amount: float) -> "BudgetEntry":
+        return replace(self, amount=amount)
+
+    def fingerprint(self) -> Tuple[Any, ...]:
+        """Forme canonique (sérialisable) pour les clés de cache."""
+        return (
+            self.kind.value,
+            self.amount,
+            self.rec.value,
+            self.cat.value,
+            self.start.isoformat() if self.start else None,
+            self.end.isoformat() if self.end else None,
+            self.every_days,
+        )
+
+
+def parse_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        y, m, d = map(int, str(value).split("-"))
+        return date(y, m, d)
+    except Exception:
+        return None
+
+
+def _amount(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_entry(raw: Any) -> BudgetEntry:
+    """Convertit un modèle Pydantic `Entry` ou un dict en BudgetEntry."""
+    get = raw.get if isinstance(raw, dict) else (lambda name: getattr(raw, name, None))
+    every = get("every_days")
+    try:
+        every_days = int(every) if every else None
+    except (TypeError, ValueError):
+        every_days = None
+    return BudgetEntry(
+        _KINDS.get(get("type"), Kind.OTHER),
+        _amount(get("amount")),
+        _RECS.get(get("rec") or "monthly", Rec.OTHER),
+        _CATS.get(get("cat") or "other", Cat.OTHER),
+        parse_date(get("start")),
+        parse_date(get("end")),
+        every_days,
+    )
+
+
+def normalize_entries(raw_entries: Iterable[Any]) -> List[BudgetEntry]:
+    """Normalise une liste de lignes (déjà normalisées ou non) ; les montants nuls sont écartés."""
+    out: List[BudgetEntry] = []
+    for raw in raw_entries:
+        e = raw if isinstance(raw, BudgetEntry) else normalize_entry(raw)
+        if e.amount != 0.0:
+            out.append(e)
+    return out
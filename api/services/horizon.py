@@ -0,0 +1,206 @@
+from __future__ import annotations
+import os
+from bisect import bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.calc import (
+    MILESTONE_DAYS,
+    apply_scenario,
+    breakdown_from_recurring_sums,
+    kpis_from_sums,
+    occurrence_offsets,
+    summary_fields,
+    today0,
+)
+from services.aggregate import BudgetAggregates
+from services.entries import BudgetEntry, normalize_entries
+from services.metrics import span
+
+# --------- Projection pluriannuelle par paliers (jour, semaine, mois) --------- #
+#
+# Sur 5 à 30 ans, une courbe journalière (jusqu'à ~11 000 points) n'a pas de sens
+# à l'écran et coûte à produire. La projection est découpée en paliers :
+#   - jour    : de J0 à `daily_days` (points {date, balance}, comme /calc)
+#   - semaine : jusqu'à `weekly_days`, seaux de 7 jours
+#   - mois    : ensuite, seaux alignés sur le calendrier (1er du mois)
+# Chaque seau porte le solde minimum, maximum et de clôture sur ses jours.
+#
+# Aucun tableau journalier n'est construit : les occurrences sont agrégées en
+# mouvements creux {décalage: delta}, triés une fois, puis parcourus seau par seau.
+# Les jours sans mouvement ne coûtent rien ; le coût suit le nombre de seaux et
+# d'occurrences, pas la longueur de l'horizon.
+
+MAX_YEARS = int(os.getenv("SERENITY_HORIZON_MAX_YEARS", "30"))
+DEFAULT_DAILY_DAYS = 90
+DEFAULT_WEEKLY_DAYS = 730
+RESOLUTIONS = ("day", "week", "month")
+
+
+def add_years(d: date, years: int) -> date:
+    try:
+        return d.replace(year=d.year + years)
+    except ValueError:  # 29 février
+        return d.replace(year=d.year + years, day=28)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + 1, 1, 1) if d.month == 12 else date(d.year, d.month + 1, 1)
+
+
+def bucket_bounds(start: date, horizon_days: int, daily_days: int, weekly_days: int) -> List[Tuple[int, int, str]]:
+    """Seaux (début inclus, fin exclue, résolution), en décalages depuis `start`, couvrant [0, horizon_days]."""
+    end = horizon_days + 1
+    daily = min(daily_days, end)
+    weekly = min(max(weekly_days, daily), end)
+    bounds: List[Tuple[int, int, str]] = [(d, d + 1, "day") for d in range(daily)]
+    bounds.extend((lo, min(lo + 7, weekly), "week") for lo in range(daily, weekly, 7))
+    lo = weekly
+    while lo < end:
+        hi = min((_next_month(start + timedelta(days=lo)) - start).days, end)
+        bounds.append((lo, hi, "month"))
+        lo = hi
+    return bounds
+
+
+def sparse_deltas(entries: List[BudgetEntry], horizon_days: int, start: date) -> Tuple[List[int], List[float]]:
+    """Jours porteurs de mouvements (triés) et somme des mouvements de chacun."""
+    # Lignes au même calendrier (ex: toutes les mensuelles sans date) développées une seule fois
+    schedules: Dict[Tuple[Any, ...], Tuple[BudgetEntry, float]] = {}
+    for e in entries:
+        key = (e.rec, e.anchor(start), e.every_days, e.end)
+        first, total = schedules.get(key, (e, 0.0))
+        schedules[key] = (first, total + e.delta)
+
+    moves: Dict[int, float] = {}
+    get = moves.get
+    for e, delta in schedules.values():
+        for off in occurrence_offsets(e, horizon_days, start):
+            moves[off] = get(off, 0.0) + delta
+    offsets = sorted(moves)
+    return offsets, [moves[off] for off in offsets]
+
+
+class SparseBalance:
+    """Solde à n'importe quel jour par recherche dichotomique sur les mouvements cumulés."""
+
+    def __init__(self, base: float, offsets: List[int], deltas: List[float]):
+        self.base = float(base)
+        self.offsets = offsets
+        self.balances = list(accumulate(deltas, initial=self.base))  # balances[k] = après k jours mouvementés
+
+    def at(self, offset: int) -> float:
+        return self.balances[bisect_right(self.offsets, offset)]
+
+    def minimum(self) -> float:
+        """Plus bas solde de fin de journée sur l'horizon."""
+        if self.offsets and self.offsets[0] == 0:
+            return min(self.balances[1:])  # le solde initial seul n'est jamais affiché
+        return min(self.balances)
+
+
+def tiered_curve(
+    base: float,
+    offsets: List[int],
+    deltas: List[float],
+    start: date,
+    bounds: List[Tuple[int, int, str]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Points journaliers du premier palier, puis seaux {min, max, close} des paliers suivants."""
+    curve: List[Dict[str, Any]] = []
+    buckets: List[Dict[str, Any]] = []
+    bal = float(base)
+    k, n = 0, len(offsets)
+    for lo, hi, resolution in bounds:
+        # Solde du premier jour du seau : report, sauf mouvement ce jour-là
+        low = high = None
+        if k >= n or offsets[k] != lo:
+            low = high = bal
+        while k < n and offsets[k] < hi:
+            bal += deltas[k]
+            k += 1
+            if low is None:
+                low = high = bal
+            elif bal < low:
+                low = bal
+            elif bal > high:
+                high = bal
+        first = start + timedelta(days=lo)
+        if resolution == "day":
+            curve.append({"date": first.isoformat(), "balance": round(bal, 2)})
+        else:
+            buckets.append({
+                "start": first.isoformat(),
+                "end": (start + timedelta(days=hi - 1)).isoformat(),
+                "resolution": resolution,
+                "min": round(low, 2),
+                "max": round(high, 2),
+                "close": round(bal, 2),
+            })
+    return curve, buckets
+
+
+def long_milestones(balance: SparseBalance, start: date, horizon_days: int, years: int) -> Dict[str, float]:
+    """Jalons m1/m6/m12 (comme /calc) puis soldes à chaque anniversaire : y1..yN."""
+    out = {key: round(balance.at(min(d, horizon_days)), 2) for key, d in MILESTONE_DAYS.items()}
+    for y in range(1, years + 1):
+        out[f"y{y}"] = round(balance.at(min((add_years(start, y) - start).days, horizon_days)), 2)
+    return out
+
+
+def compute_long_projection(
+    base: float,
+    currency: str,
+    horizon_years: int,
+    entries: List[Any],
+    scenario: Dict[str, Any] | None = None,
+    daily_days: int = DEFAULT_DAILY_DAYS,
+    weekly_days: int = DEFAULT_WEEKLY_DAYS,
+) -> Dict[str, Any]:
+    """Projection sur `horizon_years` ans : KPI, score et conseils comme /calc, courbe par paliers."""
+    if scenario is None:
+        scenario = {}
+    years = max(1, min(int(horizon_years), MAX_YEARS))
+    start = today0()
+    horizon_days = (add_years(start, years) - start).days
+
+    with span("horizon.prepare"):
+        entries_scn = apply_scenario(normalize_entries(entries), scenario)
+        offsets, deltas = sparse_deltas(entries_scn, horizon_days, start)
+    with span("horizon.curve"):
+        bounds = bucket_bounds(start, horizon_days, daily_days, weekly_days)
+        curve, buckets = tiered_curve(base, offsets, deltas, start, bounds)
+    with span("calc.summary"):
+        balance = SparseBalance(base, offsets, deltas)
+        agg = BudgetAggregates().extend(entries_scn)
+        summary = summary_fields(kpis_from_sums(agg.kpi), breakdown_from_recurring_sums(agg.rec), currency)
+
+    tiers = []
+    for resolution in RESOLUTIONS:
+        spans = [(lo, hi) for lo, hi, r in bounds if r == resolution]
+        if spans:
+            tiers.append({
+                "resolution": resolution,
+                "start": (start + timedelta(days=spans[0][0])).isoformat(),
+                "end": (start + timedelta(days=spans[-1][1] - 1)).isoformat(),
+                "count": len(spans),
+            })
+
+    return {
+        "meta": {
+            "currency": currency,
+            "horizon_days": horizon_days,
+            "horizon_years": years,
+            "tiers": tiers,
+        },
+        "inputs": {"base": base, "scenario": scenario},
+        "kpi": summary["kpi"],
+        "score": summary["score"],
+        "milestones": long_milestones(balance, start, horizon_days, years),
+        "min_balance": round(balance.minimum(), 2),
+        "curve": curve,
+        "buckets": buckets,
+        "breakdown": summary["breakdown"],
+        "tips": summary["tips"],
+    }
@@ -0,0 +1,77 @@
+from __future__ import annotations
+import os
+from typing import Tuple
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+# --------- Limites de taille des requêtes de calcul --------- #
+#
+# Un client ne doit pas monopoliser les workers avec un budget démesuré :
+#   - nombre de lignes borné par les modèles (Field(max_length=MAX_ENTRIES)) -> 422
+#   - taille du corps bornée avant parsing JSON par BodyLimitMiddleware -> 413
+#     (Content-Length annoncé, puis octets réellement reçus pour les envois chunked)
+
+MAX_ENTRIES = int(os.getenv("SERENITY_CALC_MAX_ENTRIES", "5000"))
+MAX_BODY_BYTES = int(os.getenv("SERENITY_CALC_MAX_BYTES", str(2 * 1024 * 1024)))
+# Relevés bancaires importés (routers/statement.py) : plusieurs dizaines de milliers de lignes
+MAX_IMPORT_BYTES = int(os.getenv("SERENITY_IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+
+
+class _BodyTooLarge(HTTPException):
+    # HTTPException : FastAPI la laisse passer telle quelle pendant la lecture du corps
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Requête trop volumineuse (max {max_bytes} octets)")
+
+
+class BodyLimitMiddleware:
+    """Refuse (413) les corps de requête de plus de `max_bytes` sur les chemins `prefixes`."""
+
+    def __init__(self, app, max_bytes: int = MAX_BODY_BYTES, prefixes: Tuple[str, ...] = ("/api/calc",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.prefixes = prefixes
+
+    def _reject(self):
+        error = _BodyTooLarge(self.max_bytes)
+        return JSONResponse({"detail": error.detail}, status_code=error.status_code)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers") or ():
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_bytes:
+                    await self._reject()(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _BodyTooLarge(self.max_bytes)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except _BodyTooLarge:
+            if not started:
+                await self._reject()(scope, receive, send)
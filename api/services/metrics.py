@@ -0,0 +1,326 @@
+from __future__ import annotations
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# --------- Mesures en processus : histogrammes, spans, profilage par échantillonnage --------- #
+#
+# - Histogrammes à seaux fixes (format Prometheus), un verrou par histogramme.
+# - `span("calc.overlay")` chronomètre une étape : histogramme serenity_span_seconds,
+#   et, si la requête l'a demandé, ajout à son en-tête Server-Timing.
+# - Le middleware HTTP mesure chaque requête par route (gabarit, pas l'URL brute).
+# - Le profileur échantillonne les piles de tous les threads toutes les N ms,
+#   seulement quand il est activé : coût nul sinon.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier seau : +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Registry:
+    """Familles de métriques : nom -> {étiquettes -> Histogram | compteur}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def histogram(self, name: str, help_text: str = "", **labels: str) -> Histogram:
+        key = tuple(sorted(labels.items()))
+        family = self._histograms.get(name)
+        hist = family.get(key) if family is not None else None
+        if hist is None:
+            with self._lock:
+                family = self._histograms.setdefault(name, {})
+                hist = family.setdefault(key, Histogram())
+                if help_text:
+                    self._help.setdefault(name, help_text)
+        return hist
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[key] = family.get(key, 0.0) + value
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def render(self) -> str:
+        """Exposition texte Prometheus (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+        for name, family in sorted(counters.items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(family.items()):
+                lines.append(f"{name}{_labels(key)} {_num(value)}")
+        for name, family in sorted(histograms.items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(family.items()):
+                counts, total, count = hist.snapshot()
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _num(bound)
+                    lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(key)} {_num(total)}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: Tuple[Tuple[str, str], ...]) -> str:
+    if not key:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return "{" + inner + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+registry = Registry()
+
+
+# ---- spans ---- #
+
+SPAN_METRIC = "serenity_span_seconds"
+# Durées des spans de la requête courante (Server-Timing), si demandé
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("serenity_request_spans", default=None)
+
+
+_span_histograms: Dict[str, Histogram] = {}
+
+
+def observe_span(name: str, seconds: float, request: bool = True) -> None:
+    """Histogramme du span ; et Server-Timing de la requête courante si `request`."""
+    hist = _span_histograms.get(name)
+    if hist is None:
+        hist = _span_histograms[name] = registry.histogram(SPAN_METRIC, "Durée des étapes instrumentées", span=name)
+    hist.observe(seconds)
+    if request:
+        add_request_spans(((name, seconds),))
+
+
+def add_request_spans(spans: Iterable[Tuple[str, float]]) -> None:
+    """Ajoute des spans déjà comptés (ex: mesurés dans un autre thread) au Server-Timing courant."""
+    current = _request_spans.get()
+    if current is not None:
+        current.extend(spans)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(name, time.perf_counter() - t0)
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Tuple[str, float]]]:
+    """Capture les spans du bloc (ex: dans un processus de rendu, pour les renvoyer au parent)."""
+    spans: List[Tuple[str, float]] = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+# ---- middleware HTTP (ASGI pur, sans BaseHTTPMiddleware) ---- #
+
+TIMING_HEADER = "x-serenity-timing"
+
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête HTTP : serenity_http_request_seconds{method, route, status}.
+    Avec l'en-tête `X-Serenity-Timing: 1`, la réponse porte un Server-Timing
+    détaillant les spans de la requête.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: Optional[List[Tuple[str, float]]] = None
+        for name, value in scope.get("headers") or ():
+            if name == TIMING_HEADER.encode("latin-1") and value == b"1":
+                spans = []
+                break
+        token = _request_spans.set(spans)
+        status = {"code": 500}
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if spans is not None:
+                    timing = ", ".join(f"{n};dur={d * 1000:.2f}" for n, d in spans)
+                    total = f"total;dur={(time.perf_counter() - t0) * 1000:.2f}"
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"server-timing", (f"{timing}, {total}" if timing else total).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _request_spans.reset(token)
+            route = scope.get("route")
+            # Gabarit de route (/api/calc/session/{session_id}) : cardinalité bornée
+            path = getattr(route, "path", None) or "unmatched"
+            registry.histogram(
+                "serenity_http_request_seconds",
+                "Durée des requêtes HTTP",
+                method=scope.get("method", ""),
+                route=path,
+                status=str(status["code"]),
+            ).observe(elapsed)
+
+
+# ---- profileur par échantillonnage ---- #
+
+# Période minimale : en dessous, le thread d'échantillonnage (qui tient le GIL)
+# ralentit sensiblement tout le worker
+PROFILE_MIN_INTERVAL = 0.005
+
+
+class SamplingProfiler:
+    """
+    Thread qui relève les piles de tous les threads toutes les `interval` secondes
+    et compte les piles repliées ("module:fonction;module:fonction ..."), format
+    directement exploitable par flamegraph.pl / speedscope.
+
+    Portée : le processus entier (toutes les requêtes du worker, pas une requête
+    en particulier ; un seul worker par appel avec plusieurs workers uvicorn).
+    Démarré avec `duration`, il s'arrête de lui-même à l'échéance.
+    """
+
+    def __init__(self, interval: float = 0.01, max_stacks: int = 20_000, max_depth: int = 64):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None, duration: Optional[float] = None) -> None:
+        """Démarre (ou prolonge) l'échantillonnage ; `duration` en secondes, None = jusqu'à stop()."""
+        if interval:
+            self.interval = max(PROFILE_MIN_INTERVAL, interval)
+        self._deadline = time.monotonic() + duration if duration else None
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def _loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            frames = sys._current_frames()
+            folded = []
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                parts = []
+                while frame is not None and len(parts) < self.max_depth:
+                    code = frame.f_code
+                    parts.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                    frame = frame.f_back
+                folded.append(";".join(reversed(parts)))
+            del frames
+            with self._lock:
+                self.samples += 1
+                for stack in folded:
+                    if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[stack] += 1
+
+    def folded(self, limit: int = 500) -> str:
+        with self._lock:
+            top = self.stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "scope": "process",
+            "interval_ms": round(self.interval * 1000.0, 2),
+            "remaining_s": round(max(0.0, self._deadline - time.monotonic()), 1)
+            if self.running and self._deadline is not None
+            else None,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+        }
+
+
+profiler = SamplingProfiler(interval=float(os.getenv("SERENITY_PROFILE_INTERVAL_MS", "10")) / 1000.0)
+# Durée max d'un échantillonnage lancé via /api/metrics/profiler
+PROFILE_MAX_SECONDS = float(os.getenv("SERENITY_PROFILE_MAX_SECONDS", "300"))
+if os.getenv("SERENITY_PROFILE", "").lower() in ("1", "true", "on"):
+    # Choix de déploiement explicite : échantillonnage continu du processus
+    profiler.start()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+import asyncio
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+# --------- Notifications Telegram en arrière-plan (visites /ping) --------- #
+#
+# /ping ne fait qu'incrémenter un compteur. Une tâche de fond regroupe les
+# visites en un message récapitulatif par intervalle, le dépose dans une file
+# bornée, et un envoyeur unique le transmet via un client HTTP partagé
+# (connexions réutilisées), avec reprises et délai exponentiel.
+
+
+class TelegramDispatcher:
+    """
+    - token, chat_id : identifiants du bot ; sans eux, rien n'est envoyé
+    - base_url       : racine de l'API (surchargeable pour un serveur de test)
+    - interval       : période (s) de regroupement des visites
+    - max_queue      : messages en attente d'envoi ; au-delà ils sont abandonnés
+    - max_retries    : reprises après une erreur réseau, 429 ou 5xx
+    - backoff        : délai initial (s) entre reprises, doublé à chaque essai
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        chat_id: Optional[str],
+        base_url: str = "https://api.telegram.org",
+        interval: float = 60.0,
+        max_queue: int = 100,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        timeout: float = 10.0,
+    ):
+        self.token = token
+        self.chat_id = chat_id
+        self.base_url = base_url.rstrip("/")
+        self.interval = interval
+        self.max_queue = max(1, max_queue)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._visits = 0
+        self._first_visit: Optional[datetime] = None
+        self._last_visit: Optional[datetime] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    # ---- cycle de vie ---- #
+
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=1),
+        )
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._digest_loop(), name="telegram-digest"),
+            asyncio.create_task(self._send_loop(), name="telegram-send"),
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Envoie le récapitulatif en cours (au mieux, dans `drain_timeout`), puis ferme le client."""
+        if not self.running:
+            return
+        digest_task, send_task = self._tasks
+        digest_task.cancel()
+        self._flush_visits()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        send_task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        await self._client.aclose()
+        self._client = None
+
+    # ---- côté requête : ne bloque jamais ---- #
+
+    def record_visit(self) -> None:
+        now = datetime.now()
+        if not self._visits:
+            self._first_visit = now
+        self._visits += 1
+        self._last_visit = now
+
+    def enqueue(self, text: str) -> bool:
+        """Dépose un message ; False s'il est abandonné (file pleine ou dispatcher arrêté)."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    # ---- tâches de fond ---- #
+
+    def _flush_visits(self) -> None:
+        if not self._visits:
+            return
+        count, self._visits = self._visits, 0
+        last = self._last_visit.strftime("%Y-%m-%d %H:%M:%S")
+        if count == 1:
+            text = f"📈 Nouvelle visite sur Serenity Web — {last}"
+        else:
+            first = self._first_visit.strftime("%Y-%m-%d %H:%M:%S")
+            text = f"📈 {count} visites sur Serenity Web — {first} → {self._last_visit:%H:%M:%S}"
+        self.enqueue(text)
+
+    async def _digest_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._flush_visits()
+
+    async def _send_loop(self) -> None:
+        while True:
+            text = await self._queue.get()
+            try:
+                if await self._send(text):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, text: str) -> bool:
+        url = f"{self.base_url}/bot{self.token}/sendMessage"
+        for attempt in range(self.max_retries + 1):
+            retry_after: Optional[float] = None
+            try:
+                resp = await self._client.post(url, json={"chat_id": self.chat_id, "text": text})
+                if resp.status_code < 400:
+                    return True
+                if resp.status_code != 429 and resp.status_code < 500:
+                    # Erreur définitive (token, chat_id, message invalide)
+                    return False
+                if resp.status_code == 429:
+                    retry_after = _telegram_retry_after(resp)
+            except httpx.HTTPError:
+                # Réseau, délai dépassé, protocole : on retente
+                pass
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            await asyncio.sleep(retry_after if retry_after is not None else delay)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending_visits": self._visits,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+        }
+
+
+def _telegram_retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.json()["parameters"]["retry_after"])
+    except Exception:
+        value = resp.headers.get("Retry-After")
+        return float(value) if value and value.isdigit() else None
+
+
+dispatcher = TelegramDispatcher(
+    token=os.getenv("TELEGRAM_TOKEN"),
+    chat_id=os.getenv("TELEGRAM_CHAT_ID"),
+    base_url=os.getenv("SERENITY_TELEGRAM_API", "https://api.telegram.org"),
+    interval=float(os.getenv("SERENITY_NOTIFY_INTERVAL", "60")),
+    max_queue=int(os.getenv("SERENITY_NOTIFY_QUEUE", "100")),
+    max_retries=int(os.getenv("SERENITY_NOTIFY_RETRIES", "4")),
+)
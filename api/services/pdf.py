@@ -1,16 +1,40 @@
-from typing import Dict, Any, List
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Dict, Any, List, Optional
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
 from pathlib import Path
 import datetime as dt
+from services import metrics
+from services.downsample import lttb_indices
 
 TEMPLATES_DIR = Path(__file__).resolve().parents[1] / "templates" / "pdf"
+TEMPLATE_NAMES = ("page1.html", "page2.html")
 
+# Templates figés au démarrage : pas de vérification de mtime à chaque rendu
 _env = Environment(
     loader=FileSystemLoader(str(TEMPLATES_DIR)),
     autoescape=select_autoescape(["html", "xml"]),
+    auto_reload=False,
 )
 
+# --------- Préchauffage : styles, polices et templates chargés une fois par processus --------- #
+
+_font_config: Optional[FontConfiguration] = None
+_stylesheet: Optional[CSS] = None
+_templates: Dict[str, Template] = {}
+
+
+def warmup() -> None:
+    """Parse base.css, enregistre les polices Inter et compile les templates (idempotent)."""
+    global _font_config, _stylesheet
+    if _stylesheet is not None:
+        return
+    _font_config = FontConfiguration()
+    # Les @font-face de base.css sont enregistrés dans la configuration partagée
+    _stylesheet = CSS(filename=str(TEMPLATES_DIR / "base.css"), font_config=_font_config)
+    for name in TEMPLATE_NAMES:
+        _templates[name] = _env.get_template(name)
+
 def _fmt_money(v: float, cur: str) -> str:
     try:
         sign = "-" if v < 0 else ""
@@ -18,18 +42,20 @@ def _fmt_money(v: float, cur: str) -> str:
     except Exception:
         return f"{cur}0.00"
 
-def _sparkline_svg(points: List[Dict[str, Any]], width=520, height=80, pad=6) -> str:
+def _sparkline_svg(points: List[Dict[str, Any]], width=520, height=80, pad=6, px_per_point=3) -> str:
     if not points:
         return f'<svg width="{width}" height="{height}"></svg>'
-    xs = list(range(len(points)))
     ys = [float(p.get("balance", 0.0)) for p in points]
     y_min, y_max = min(ys), max(ys)
     span = (y_max - y_min) or 1.0
+    # Au-delà d'un sommet tous les `px_per_point` pixels, les points ne se voient plus :
+    # réduction LTTB (minimum et découverts conservés), abscisses d'origine gardées
+    kept = lttb_indices(ys, max(3, int((width - 2*pad) // px_per_point)))
 
-    def sx(i): return pad + (i / max(len(xs)-1, 1)) * (width - 2*pad)
+    def sx(i): return pad + (i / max(len(ys)-1, 1)) * (width - 2*pad)
     def sy(v): return height - pad - ((v - y_min) / span) * (height - 2*pad)
 
-    points_attr = " ".join(f"{sx(i):.1f},{sy(ys[i]):.1f}" for i in range(len(xs)))
+    points_attr = " ".join(f"{sx(i):.1f},{sy(ys[i]):.1f}" for i in kept)
     zero_y = sy(0) if (y_min <= 0 <= y_max) else None
     axis = f'<line x1="0" y1="{zero_y:.1f}" x2="{width}" y2="{zero_y:.1f}" stroke="#e5e7eb"/>' if zero_y is not None else ""
     return f'''
@@ -68,20 +94,21 @@ def _merge_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
 
 def render_pdf(data: Dict[str, Any]) -> bytes:
     """Rend le PDF 2 pages à partir du payload JSON."""
-    ctx = _merge_defaults(data)
-    # Helpers calculés
-    cur = ctx["meta"]["currency"]
-    ctx["fmt"] = lambda v: _fmt_money(v, cur)
-    ctx["sparkline_svg"] = _sparkline_svg(ctx.get("curve", []))
-
-    # Charge templates
-    page1 = _env.get_template("page1.html").render(**ctx)
-    page2 = _env.get_template("page2.html").render(**ctx)
-
-    # Styles globaux
-    css = CSS(filename=str(TEMPLATES_DIR / "base.css"))
-
-    # Génération PDF
-    html = HTML(string=page1 + '<p style="page-break-before: always"></p>' + page2, base_url=str(TEMPLATES_DIR))
-    pdf_bytes = html.write_pdf(stylesheets=[css])
+    with metrics.span("pdf.context"):
+        ctx = _merge_defaults(data)
+        # Helpers calculés
+        cur = ctx["meta"]["currency"]
+        ctx["fmt"] = lambda v: _fmt_money(v, cur)
+        ctx["sparkline_svg"] = _sparkline_svg(ctx.get("curve", []))
+
+    # Templates et styles déjà compilés (voir warmup)
+    warmup()
+    with metrics.span("pdf.template"):
+        page1 = _templates["page1.html"].render(**ctx)
+        page2 = _templates["page2.html"].render(**ctx)
+
+    # Génération PDF (parsing HTML, mise en page et dessin WeasyPrint)
+    with metrics.span("pdf.write"):
+        html = HTML(string=page1 + '<p style="page-break-before: always"></p>' + page2, base_url=str(TEMPLATES_DIR))
+        pdf_bytes = html.write_pdf(stylesheets=[_stylesheet], font_config=_font_config)
     return pdf_bytes
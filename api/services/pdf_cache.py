@@ -0,0 +1,175 @@
+from __future__ import annotations
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from services.cache import LRUCache, canonical_json
+
+
+# --------- Cache des PDF rendus (mémoire + disque, bornés en taille) --------- #
+
+# Champs régénérés à chaque export par le front : exclus de la clé.
+# Un PDF servi depuis le cache garde l'horodatage de son premier rendu.
+VOLATILE_META_FIELDS = ("generated_at",)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def pdf_cache_key(payload: Dict[str, Any]) -> str:
+    """Empreinte canonique du payload d'export, sans les champs volatils."""
+    data = copy.deepcopy(payload)
+    meta = data.get("meta") or {}
+    for field in VOLATILE_META_FIELDS:
+        meta.pop(field, None)
+    return hashlib.sha256(canonical_json(data)).hexdigest()
+
+
+class DiskStore:
+    """
+    Fichiers `<clé>.pdf` dans un dossier, évincés du plus ancien au plus récent au-delà de max_bytes.
+
+    Le dossier peut être partagé par plusieurs workers : il fait foi, l'index en
+    mémoire n'en est qu'une copie. Un fichier inconnu de l'index (écrit par un autre
+    worker) est adopté à la lecture, et chaque écriture relit le dossier avant
+    d'évincer : max_bytes borne le dossier entier, pas chaque worker. L'ordre
+    d'éviction suit le mtime, rafraîchi à chaque lecture (LRU commun aux workers).
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._rescan()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _rescan(self) -> None:
+        """Index reconstruit depuis le dossier, du moins au plus récemment utilisé (verrou tenu)."""
+        found = []
+        for p in self.directory.glob("*.pdf"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue  # évincé entre-temps par un autre worker
+            found.append((st.st_mtime_ns, p.stem, st.st_size))
+        found.sort()
+        self._index = OrderedDict((key, size) for _, key, size in found)
+        self._bytes = sum(size for _, _, size in found)
+
+    def open(self, key: str) -> Optional[Tuple[BinaryIO, int]]:
+        """Fichier ouvert + taille ; le descripteur reste valide même si l'entrée est évincée entre-temps."""
+        try:
+            fh = open(self._path(key), "rb")
+        except FileNotFoundError:
+            # Absent, ou évincé par un autre worker partageant le dossier
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+            return None
+        size = os.fstat(fh.fileno()).st_size
+        try:
+            os.utime(fh.fileno())
+        except OSError:
+            pass
+        with self._lock:
+            # Entrée éventuellement écrite par un autre worker : adoptée
+            self._bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+        return fh, size
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._rescan()
+            while self._index and self._bytes > self.max_bytes:
+                oldest, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    self._path(oldest).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class PdfCache:
+    """Niveau mémoire (LRU) devant un niveau disque ; les deux sont bornés en octets."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskStore]):
+        self.memory = memory
+        self.disk = disk
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        return self.memory.get(key)
+
+    def open_disk(self, key: str) -> Optional[Tuple[BinaryIO, int]]:
+        if self.disk is None:
+            self.misses += 1
+            return None
+        found = self.disk.open(key)
+        if found is None:
+            self.misses += 1
+        else:
+            self.disk_hits += 1
+        return found
+
+    def put(self, key: str, data: bytes) -> None:
+        self.memory.set(key, data, size=len(data))
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+def iter_file(fh: BinaryIO) -> Iterator[bytes]:
+    with fh:
+        while True:
+            chunk = fh.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _build_cache() -> PdfCache:
+    memory = LRUCache(
+        max_items=int(os.getenv("SERENITY_PDF_CACHE_ITEMS", "256")),
+        max_bytes=int(os.getenv("SERENITY_PDF_CACHE_BYTES", str(32 * 1024 * 1024))),
+        ttl=float(os.getenv("SERENITY_PDF_CACHE_TTL", "3600")),
+    )
+    disk_bytes = int(os.getenv("SERENITY_PDF_DISK_CACHE_BYTES", str(256 * 1024 * 1024)))
+    disk = None
+    if disk_bytes > 0:
+        directory = Path(os.getenv("SERENITY_PDF_CACHE_DIR", Path(tempfile.gettempdir()) / "serenity-pdf-cache"))
+        disk = DiskStore(directory, disk_bytes)
+    return PdfCache(memory, disk)
+
+
+pdf_cache = _build_cache()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metrics import collect_spans, observe_span
+
+
+# --------- Pool de processus dédié au rendu PDF (WeasyPrint) --------- #
+
+
+class PoolUnavailable(Exception):
+    """Rendu impossible pour l'instant (pas une erreur du payload) : réessayer après `retry_after` s."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PoolSaturated(PoolUnavailable):
+    """File d'attente pleine : le client doit réessayer plus tard."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rendu PDF saturé, réessayer dans {retry_after}s", retry_after)
+
+
+class RenderTimeout(PoolUnavailable):
+    """Le rendu a dépassé le délai maximum par tâche (le pool est recyclé)."""
+
+
+class PoolRestarted(PoolUnavailable):
+    """Pool recyclé pendant le rendu (délai dépassé par une autre tâche, processus mort)."""
+
+
+def _init_worker() -> None:
+    # Import et préchauffage de la pile PDF une seule fois par processus
+    from services.pdf import warmup
+
+    warmup()
+
+
+def _render(data: Dict[str, Any]) -> Tuple[bytes, List[Tuple[str, float]]]:
+    from services.pdf import render_pdf
+
+    # Spans mesurés dans le processus de rendu, renvoyés au parent avec le PDF
+    with collect_spans() as spans:
+        pdf_bytes = render_pdf(data)
+    return pdf_bytes, spans
+
+
+def _noop() -> None:
+    return None
+
+
+class PdfRenderPool:
+    """
+    Processus de rendu chauds, file bornée, délai par tâche et recyclage.
+
+    - workers      : nombre de processus de rendu
+    - max_queue    : tâches en attente acceptées en plus de celles en cours
+    - timeout      : délai max (s) d'un rendu ; au-delà le pool est recyclé
+    - max_jobs     : nombre de rendus avant remplacement d'un processus (RSS)
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 8, timeout: float = 20.0, max_jobs: int = 50):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight = 0
+        # Une tâche soumise par processus : l'attente se fait ici, hors délai de rendu
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Durée moyenne (EWMA) d'un rendu, pour estimer Retry-After
+        self._avg_seconds = 1.0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    # ---- cycle de vie ---- #
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                max_tasks_per_child=self.max_jobs or None,
+            )
+        return self._executor
+
+    async def start(self) -> None:
+        """Démarre les processus et attend qu'ils aient chargé la pile PDF."""
+        executor = self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(self.workers)))
+
+    def shutdown(self, kill: bool = False, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Arrête le pool courant (ou `executor` s'il est encore le pool courant)."""
+        if executor is not None and executor is not self._executor:
+            return
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        if kill:
+            # Un rendu bloqué ne s'interrompt pas : on termine les processus
+            for proc in list((getattr(executor, "_processes", None) or {}).values()):
+                proc.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- rendu ---- #
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def retry_after(self) -> int:
+        waves = (self._inflight + 1) / self.workers
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    async def render(self, data: Dict[str, Any]) -> bytes:
+        if self._inflight >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturated(self.retry_after())
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        self._inflight += 1
+        try:
+            t_wait = time.perf_counter()
+            async with self._slots:
+                t0 = time.perf_counter()
+                observe_span("pdf.queue_wait", t0 - t_wait)
+                executor = self._ensure_executor()
+                fut = asyncio.get_running_loop().run_in_executor(executor, _render, data)
+                try:
+                    pdf_bytes, spans = await asyncio.wait_for(fut, timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    # Les autres rendus en cours sur ce pool échouent aussi (BrokenProcessPool)
+                    self.timeouts += 1
+                    self.shutdown(kill=True, executor=executor)
+                    raise RenderTimeout(f"Rendu PDF > {self.timeout:.0f}s", self.retry_after())
+                except BrokenProcessPool:
+                    # Processus mort (OOM, crash natif) ou pool tué par le délai d'une autre
+                    # tâche : on repart sur un pool neuf, le client peut simplement réessayer
+                    self.shutdown(kill=True, executor=executor)
+                    self.restarts += 1
+                    raise PoolRestarted("Rendu PDF interrompu (pool redémarré), réessayer", self.retry_after())
+                elapsed = time.perf_counter() - t0
+        finally:
+            self._inflight -= 1
+
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        for name, seconds in spans:
+            observe_span(name, seconds)
+        observe_span("pdf.render", elapsed)
+        self.completed += 1
+        return pdf_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            # Démarré au premier export, ou au démarrage si SERENITY_PDF_PREWARM (services/roles.py)
+            "started": self._executor is not None,
+            "max_queue": self.max_queue,
+            "inflight": self._inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "avg_seconds": round(self._avg_seconds, 3),
+        }
+
+
+pdf_pool = PdfRenderPool(
+    workers=int(os.getenv("SERENITY_PDF_WORKERS", "2")),
+    max_queue=int(os.getenv("SERENITY_PDF_QUEUE", "8")),
+    timeout=float(os.getenv("SERENITY_PDF_TIMEOUT", "20")),
+    max_jobs=int(os.getenv("SERENITY_PDF_MAX_JOBS", "50")),
+)
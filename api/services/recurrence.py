@@ -0,0 +1,166 @@
+from __future__ import annotations
+import calendar
+from datetime import date, timedelta
+from typing import Iterator, List, Optional
+
+# --------- Récurrences : occurrences calculées directement sur une fenêtre --------- #
+#
+# Une récurrence est définie par une date d'ancrage (premier paiement), un type
+# et, optionnellement, une date de fin. `occurrences` renvoie les dates comprises
+# dans [window_start, window_end] sans parcourir les périodes antérieures :
+# le coût ne dépend que du nombre d'occurrences dans la fenêtre.
+#
+# Fin de mois : le jour d'ancrage est conservé et borné au dernier jour du mois
+# (31 jan -> 28/29 fév -> 31 mars), sans dérive d'une période à l'autre.
+
+ONEOFF = "oneoff"
+WEEKLY = "weekly"
+BIWEEKLY = "biweekly"
+EVERY_N_DAYS = "every_n_days"
+MONTHLY = "monthly"
+QUARTERLY = "quarterly"
+YEARLY = "yearly"
+LAST_BUSINESS_DAY = "last_business_day"
+
+KINDS = (ONEOFF, WEEKLY, BIWEEKLY, EVERY_N_DAYS, MONTHLY, QUARTERLY, YEARLY, LAST_BUSINESS_DAY)
+
+# Période en jours des récurrences à pas fixe
+DAY_STEPS = {WEEKLY: 7, BIWEEKLY: 14}
+# Période en mois des récurrences calendaires
+MONTH_STEPS = {MONTHLY: 1, QUARTERLY: 3, YEARLY: 12, LAST_BUSINESS_DAY: 1}
+
+
+def normalize_kind(rec: Optional[str]) -> str:
+    """Type de récurrence connu ; tout le reste retombe sur mensuel."""
+    rec = rec or MONTHLY
+    return rec if rec in KINDS else MONTHLY
+
+
+def day_step(rec: str, every_days: Optional[int] = None) -> Optional[int]:
+    if rec == EVERY_N_DAYS:
+        return max(1, int(every_days or 1))
+    return DAY_STEPS.get(rec)
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + (d.month - 1)
+
+
+_MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _month_date(month_index: int, day: int) -> date:
+    year, month0 = divmod(month_index, 12)
+    if day > 28:
+        last = 29 if month0 == 1 and calendar.isleap(year) else _MONTH_DAYS[month0]
+        day = min(day, last)
+    return date(year, month0 + 1, day)
+
+
+def _last_business_day(month_index: int) -> date:
+    d = _month_date(month_index, 31)
+    wd = d.weekday()
+    return d - timedelta(days=wd - 4) if wd > 4 else d
+
+
+def nth_occurrence(rec: str, anchor: date, k: int, every_days: Optional[int] = None) -> date:
+    """k-ième occurrence (k >= 0) d'une récurrence ancrée en `anchor`."""
+    step = day_step(rec, every_days)
+    if step is not None:
+        return anchor + timedelta(days=k * step)
+    if rec == LAST_BUSINESS_DAY:
+        m0 = _month_index(anchor)
+        if _last_business_day(m0) < anchor:
+            m0 += 1
+        return _last_business_day(m0 + k)
+    return _month_date(_month_index(anchor) + k * MONTH_STEPS[rec], anchor.day)
+
+
+def occurrences(
+    rec: Optional[str],
+    anchor: date,
+    window_start: date,
+    window_end: date,
+    every_days: Optional[int] = None,
+    until: Optional[date] = None,
+) -> List[date]:
+    """Occurrences dans [window_start, window_end] (et <= until), en forme close."""
+    rec = normalize_kind(rec)
+    if until is not None and until < window_end:
+        window_end = until
+    lo = max(anchor, window_start)
+    if lo > window_end:
+        return []
+
+    if rec == ONEOFF:
+        return [anchor] if anchor >= window_start else []
+
+    step = day_step(rec, every_days)
+    if step is not None:
+        k0 = -((anchor - lo).days // step)  # ceil((lo - anchor) / step)
+        k1 = (window_end - anchor).days // step
+        return [anchor + timedelta(days=k * step) for k in range(k0, k1 + 1)]
+
+    if rec == LAST_BUSINESS_DAY:
+        first = _month_index(lo)
+        if _last_business_day(first) < lo:
+            first += 1
+        return [d for d in map(_last_business_day, range(first, _month_index(window_end) + 1)) if d <= window_end]
+
+    # Récurrences calendaires : bornes k0..k1 estimées par le nombre de mois, puis ajustées
+    months = MONTH_STEPS[rec]
+    k0 = max(0, (_month_index(lo) - _month_index(anchor)) // months - 1)
+    while nth_occurrence(rec, anchor, k0, every_days) < lo:
+        k0 += 1
+    k1 = (_month_index(window_end) - _month_index(anchor)) // months
+    while k1 >= k0 and nth_occurrence(rec, anchor, k1, every_days) > window_end:
+        k1 -= 1
+    m0, day = _month_index(anchor), anchor.day
+    return [_month_date(m0 + k * months, day) for k in range(k0, k1 + 1)]
+
+
+def iter_occurrences(
+    rec: Optional[str],
+    anchor: date,
+    window_end: date,
+    every_days: Optional[int] = None,
+    until: Optional[date] = None,
+) -> Iterator[date]:
+    """Itérateur de référence : parcourt toutes les périodes depuis l'ancrage."""
+    rec = normalize_kind(rec)
+    if until is not None and until < window_end:
+        window_end = until
+    if rec == ONEOFF:
+        if anchor <= window_end:
+            yield anchor
+        return
+    k = 0
+    d = nth_occurrence(rec, anchor, 0, every_days)
+    while d <= window_end:
+        yield d
+        k += 1
+        d = nth_occurrence(rec, anchor, k, every_days)
+
+
+def occurrence_offsets(
+    rec: Optional[str],
+    anchor: date,
+    start: date,
+    horizon_days: int,
+    every_days: Optional[int] = None,
+    until: Optional[date] = None,
+) -> List[int]:
+    """Décalages en jours depuis `start` des occurrences dans [start, start + horizon_days]."""
+    end = start + timedelta(days=horizon_days)
+    rec = normalize_kind(rec)
+    step = day_step(rec, every_days)
+    if step is not None:
+        # Cas le plus fréquent : pas besoin de construire les dates
+        if until is not None and until < end:
+            end = until
+        lo = max(anchor, start)
+        if lo > end:
+            return []
+        first = (anchor - start).days - ((anchor - lo).days // step) * step
+        return list(range(first, (end - start).days + 1, step))
+    return [(d - start).days for d in occurrences(rec, anchor, start, end, every_days, until)]
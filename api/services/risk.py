@@ -0,0 +1,180 @@
+from __future__ import annotations
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.calc import (
+    MILESTONE_DAYS,
+    apply_scenario,
+    clamp_horizon,
+    kpi_sums,
+    kpis_from_sums,
+    occurrence_offsets,
+    today0,
+)
+from services.entries import BudgetEntry, Kind
+
+# --------- Projection Monte Carlo (/calc/risk) --------- #
+#
+# Toutes les simulations sont calculées ensemble sur un tableau
+# (simulations x jours) de deltas, puis un cumsum par ligne donne les soldes :
+#   - lignes certaines (fixes, crédits, revenus sans décalage) : un vecteur commun
+#   - dépenses variables : multiplicateur log-normal (moyenne 1) par occurrence
+#   - revenus : chaque versement décalé de ±jitter jours (tiré uniformément)
+#   - chocs ponctuels : nombre ~ Poisson, jour uniforme, montant ~ exponentielle
+#
+# Le générateur est initialisé par `seed` (dérivé des entrées si absent) :
+# mêmes entrées -> mêmes résultats. Le nombre de simulations est borné par un
+# budget de cellules (simulations x jours) qui tient la latence et la mémoire
+# sous contrôle : 1M cellules = 8 Mo par tableau float64 ; deltas/soldes, minimum
+# courant, tirages et percentiles en font plusieurs, soit ~20 Mo au pic par
+# calcul. Les calculs simultanés sont bornés par le pool de services.calc_executor.
+
+DEFAULT_SIMULATIONS = int(os.getenv("SERENITY_RISK_SIMULATIONS", "2000"))
+MAX_CELLS = int(os.getenv("SERENITY_RISK_MAX_CELLS", str(1_000_000)))
+PERCENTILES = (5, 50, 95)
+
+
+def simulation_budget(requested: Optional[int], horizon_days: int) -> int:
+    """Nombre de simulations effectivement lancées (au moins 100, au plus MAX_CELLS / jours)."""
+    cap = max(100, MAX_CELLS // (horizon_days + 1))
+    return max(1, min(int(requested or DEFAULT_SIMULATIONS), cap))
+
+
+def simulate_balances(
+    base: float,
+    entries: List[BudgetEntry],
+    horizon_days: int,
+    start: date,
+    simulations: int,
+    rng: np.random.Generator,
+    var_sigma: float = 0.15,
+    income_jitter_days: int = 3,
+    shock_rate: float = 0.3,
+    shock_amount: float = 0.0,
+) -> np.ndarray:
+    """Soldes simulés, tableau (simulations, horizon_days + 1)."""
+    days = horizon_days + 1
+    common = np.zeros(days)
+    perturbed = []
+
+    for e in entries:
+        offsets = occurrence_offsets(e, horizon_days, start)
+        if not offsets:
+            continue
+        if (e.scaled_by_scenario and var_sigma > 0) or (e.kind is Kind.INCOME and income_jitter_days > 0):
+            perturbed.append((e, np.asarray(offsets, dtype=np.int64)))
+        else:
+            common[offsets] += e.delta
+
+    deltas = np.tile(common, (simulations, 1))
+    rows = np.arange(simulations)[:, None]
+
+    for e, offs in perturbed:
+        if e.kind is Kind.INCOME:
+            shift = rng.integers(-income_jitter_days, income_jitter_days + 1, size=(simulations, offs.size))
+            target = np.maximum(offs[None, :] + shift, 0)
+            keep = target < days  # versement repoussé au-delà de l'horizon : perdu
+            np.add.at(deltas, (np.broadcast_to(rows, target.shape)[keep], target[keep]), e.delta)
+        else:
+            # Log-normale de moyenne 1 : mu = -sigma^2 / 2
+            mul = rng.lognormal(-0.5 * var_sigma * var_sigma, var_sigma, size=(simulations, offs.size))
+            deltas[:, offs] += e.delta * mul
+
+    if shock_rate > 0 and shock_amount > 0:
+        counts = rng.poisson(shock_rate * days / 30.0, size=simulations)
+        total = int(counts.sum())
+        if total:
+            who = np.repeat(np.arange(simulations), counts)
+            when = rng.integers(0, days, size=total)
+            np.add.at(deltas, (who, when), -rng.exponential(shock_amount, size=total))
+
+    deltas[:, 0] += base
+    return np.cumsum(deltas, axis=1, out=deltas)
+
+
+def summarize(balances: np.ndarray, start: date) -> Dict[str, Any]:
+    days = balances.shape[1]
+    bands = np.percentile(balances, PERCENTILES, axis=0)
+    running_min = np.minimum.accumulate(balances, axis=1)
+    # P(solde < 0 au moins une fois jusqu'au jour d)
+    overdraft_by_day = (running_min < 0).mean(axis=0)
+    mins = running_min[:, -1]
+    return {
+        "bands": {
+            "start": start.isoformat(),
+            "step_days": 1,
+            **{f"p{p}": np.round(band, 2).tolist() for p, band in zip(PERCENTILES, bands)},
+        },
+        "overdraft_probability": round(float(overdraft_by_day[-1]), 4),
+        "overdraft_by_day": np.round(overdraft_by_day, 4).tolist(),
+        "overdraft_milestones": {
+            k: round(float(overdraft_by_day[d]), 4) for k, d in MILESTONE_DAYS.items() if d < days
+        },
+        "expected_min_balance": round(float(mins.mean()), 2),
+        "min_balance_p5": round(float(np.percentile(mins, 5)), 2),
+    }
+
+
+def compute_risk(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[BudgetEntry],
+    scenario: Optional[Dict[str, Any]] = None,
+    simulations: Optional[int] = None,
+    seed: int = 0,
+    var_sigma: float = 0.15,
+    income_jitter_days: int = 3,
+    shock_rate: float = 0.3,
+    shock_amount: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Projection Monte Carlo : bandes p5/p50/p95, probabilité de découvert,
+    solde minimum attendu. `shock_amount` absent = 10% des dépenses mensuelles.
+    """
+    t0 = time.perf_counter()
+    horizon_days = clamp_horizon(horizon_days)
+    start = today0()
+    scenario = scenario or {}
+    entries = apply_scenario(entries, scenario)
+    if shock_amount is None:
+        shock_amount = 0.1 * kpis_from_sums(kpi_sums(entries))["total_exp"]
+    n = simulation_budget(simulations, horizon_days)
+
+    rng = np.random.default_rng(seed)
+    balances = simulate_balances(
+        float(base),
+        entries,
+        horizon_days,
+        start,
+        n,
+        rng,
+        var_sigma=var_sigma,
+        income_jitter_days=income_jitter_days,
+        shock_rate=shock_rate,
+        shock_amount=shock_amount,
+    )
+    out = summarize(balances, start)
+    return {
+        "meta": {
+            "currency": currency,
+            "horizon_days": horizon_days,
+            "simulations": n,
+            "capped": simulations is not None and n < simulations,
+            "seed": seed,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        },
+        "inputs": {
+            "base": base,
+            "scenario": scenario,
+            "var_sigma": var_sigma,
+            "income_jitter_days": income_jitter_days,
+            "shock_rate": shock_rate,
+            "shock_amount": round(shock_amount, 2),
+        },
+        **out,
+    }
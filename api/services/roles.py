@@ -0,0 +1,33 @@
+from __future__ import annotations
+import os
+from typing import Dict, FrozenSet
+
+# --------- Rôle du processus API (SERENITY_ROLE) --------- #
+#
+# Un même code, des workers spécialisés derrière le répartiteur :
+#   - all  : tout (défaut, déploiement unique)
+#   - calc : /api/calc, imports, Pro, front statique… jamais la pile PDF
+#            (routers.pdf_export, pool WeasyPrint) : démarrage et RSS réduits
+#   - pdf  : /api/export-pdf seul (+ ping et métriques)
+# Les routers d'un rôle non servi ne sont pas importés (cf. main.py).
+#
+# Pool PDF (SERENITY_PDF_PREWARM) : démarré au premier export par défaut ;
+# préchauffé au démarrage (processus + WeasyPrint chargés) pour le rôle pdf,
+# ou si SERENITY_PDF_PREWARM=1.
+
+ROLES: Dict[str, FrozenSet[str]] = {
+    "all": frozenset(("calc", "pdf")),
+    "calc": frozenset(("calc",)),
+    "pdf": frozenset(("pdf",)),
+}
+
+ROLE = os.getenv("SERENITY_ROLE", "all")
+if ROLE not in ROLES:
+    raise ValueError(f"SERENITY_ROLE inconnu: {ROLE} (attendu : {', '.join(ROLES)})")
+
+PDF_PREWARM = os.getenv("SERENITY_PDF_PREWARM", "1" if ROLE == "pdf" else "0") == "1"
+
+
+def serves(feature: str) -> bool:
+    """Le rôle courant sert-il `feature` ("calc" ou "pdf") ?"""
+    return feature in ROLES[ROLE]
@@ -0,0 +1,256 @@
+from __future__ import annotations
+import os
+import secrets
+import threading
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.aggregate import BudgetAggregates
+from services.cache import LRUCache
+from services.calc import (
+    add_days,
+    breakdown_from_recurring_sums,
+    clamp_horizon,
+    kpis_from_sums,
+    milestones_from_balances,
+    scenario_line,
+    scenario_params,
+    summary_fields,
+    today0,
+)
+from services.entries import BudgetEntry, Cat, Kind, normalize_entry
+
+# --------- Sessions de calcul incrémental (/calc/session) --------- #
+#
+# Une session garde les lignes (par identifiant), leurs agrégats et le tableau
+# de deltas journaliers. Un patch (ajout / modification / suppression de ligne,
+# solde initial, scénario) ne met à jour que les jours et sommes concernés ;
+# la réponse ne contient que les points de courbe qui ont changé.
+
+MAX_ENTRIES_PER_SESSION = int(os.getenv("SERENITY_SESSION_MAX_ENTRIES", "5000"))
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class InvalidPatch(ValueError):
+    pass
+
+
+class CalcSession:
+    def __init__(self, base: float, currency: str, horizon_days: int, entries: List[Any], scenario: Dict[str, Any]):
+        self.lock = threading.Lock()
+        self.currency = currency
+        self.horizon_days = clamp_horizon(horizon_days)
+        self._build(float(base), entries, scenario)
+
+    # ---- construction complète (ouverture, ou changement de jour) ---- #
+
+    def _build(self, base: float, entries: List[Any], scenario: Dict[str, Any]) -> None:
+        self.base = base
+        self.scenario = dict(scenario)
+        self.start = today0()
+        self.agg = BudgetAggregates(self.horizon_days, self.start)
+        self.entries: Dict[str, BudgetEntry] = {}
+        # Ligne effectivement projetée (après var_mul)
+        self.effective: Dict[str, BudgetEntry] = {}
+        self.extras: List[BudgetEntry] = []
+        self._next_id = 0
+        for raw in entries:
+            self._add(normalize_entry(raw) if not isinstance(raw, BudgetEntry) else raw)
+        self._set_extras()
+        self.raw = list(accumulate(self.agg.deltas, initial=self.base))[1:]
+        self.balances = [round(b, 2) for b in self.raw]
+
+    def rebuild(self) -> None:
+        self._restore(self.base, self.entries, self.scenario, self._next_id)
+
+    def _restore(self, base: float, entries: Dict[str, BudgetEntry], scenario: Dict[str, Any], next_id: int) -> None:
+        # Reconstruit en conservant les identifiants existants
+        self._build(base, [], scenario)
+        for entry_id, e in entries.items():
+            self._add(e, entry_id)
+        self._next_id = next_id
+        self.raw = list(accumulate(self.agg.deltas, initial=self.base))[1:]
+        self.balances = [round(b, 2) for b in self.raw]
+
+    # ---- mutations élémentaires : renvoient le premier jour touché ---- #
+
+    def _effective(self, e: BudgetEntry) -> BudgetEntry:
+        var_mul = scenario_params(self.scenario)[0]
+        if var_mul != 1.0 and e.scaled_by_scenario:
+            return e.with_amount(round(e.amount * var_mul, 2))
+        return e
+
+    def _add(self, e: BudgetEntry, entry_id: Optional[str] = None) -> Tuple[str, int]:
+        if entry_id is None:
+            if len(self.entries) >= MAX_ENTRIES_PER_SESSION:
+                raise InvalidPatch(f"Trop de lignes (max {MAX_ENTRIES_PER_SESSION})")
+            entry_id = str(self._next_id)
+            self._next_id += 1
+        eff = self._effective(e)
+        self.entries[entry_id] = e
+        self.effective[entry_id] = eff
+        offsets = self.agg.add(eff)
+        return entry_id, min(offsets, default=self.horizon_days + 1)
+
+    def _remove(self, entry_id: str) -> int:
+        if entry_id not in self.entries:
+            raise InvalidPatch(f"Ligne inconnue: {entry_id}")
+        del self.entries[entry_id]
+        offsets = self.agg.remove(self.effective.pop(entry_id))
+        return min(offsets, default=self.horizon_days + 1)
+
+    def _set_extras(self) -> int:
+        first = self.horizon_days + 1
+        for line in self.extras:
+            first = min(first, min(self.agg.remove(line), default=first))
+        _, extra_income, extra_credit = scenario_params(self.scenario)
+        self.extras = []
+        if extra_income > 0:
+            self.extras.append(scenario_line(Kind.INCOME, Cat.FIXED, extra_income))
+        if extra_credit > 0:
+            self.extras.append(scenario_line(Kind.EXPENSE, Cat.CREDIT, extra_credit))
+        for line in self.extras:
+            first = min(first, min(self.agg.add(line), default=first))
+        return first
+
+    def _set_scenario(self, scenario: Dict[str, Any]) -> int:
+        old_mul = scenario_params(self.scenario)[0]
+        self.scenario = dict(scenario)
+        first = self._set_extras()
+        if scenario_params(self.scenario)[0] != old_mul:
+            # Seules les dépenses variables dépendent de var_mul
+            for entry_id, e in list(self.entries.items()):
+                if e.scaled_by_scenario:
+                    first = min(first, self._remove(entry_id))
+                    first = min(first, self._add(e, entry_id)[1])
+        return first
+
+    # ---- patch ---- #
+
+    def apply(self, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Applique les opérations (tout ou rien) et renvoie le diff de courbe + synthèse."""
+        saved = (self.base, dict(self.entries), self.scenario, self._next_id)
+        new_ids: List[str] = []
+        first = self.horizon_days + 1
+        try:
+            for op in ops:
+                first = min(first, self._apply_op(op, new_ids))
+        except (InvalidPatch, TypeError, ValueError):
+            base, entries, scenario, next_id = saved
+            self._restore(base, entries, scenario, next_id)
+            raise
+
+        if today0() != self.start:
+            # Changement de jour : les décalages ne sont plus valides, on reconstruit
+            self.rebuild()
+            out = self.snapshot(full=True)
+            out["entry_ids"] = new_ids
+            return out
+
+        changed: List[List[Any]] = []
+        if first <= self.horizon_days:
+            prev = self.raw[first - 1] if first > 0 else self.base
+            suffix = accumulate(self.agg.deltas[first:], initial=prev)
+            next(suffix)
+            for d, bal in enumerate(suffix, start=first):
+                self.raw[d] = bal
+                rounded = round(bal, 2)
+                if rounded != self.balances[d]:
+                    self.balances[d] = rounded
+                    changed.append([d, rounded])
+
+        out = self.snapshot(full=False)
+        out["entry_ids"] = new_ids
+        out["curve_diff"] = {"start": self.start.isoformat(), "points": changed}
+        return out
+
+    def _entry_arg(self, op: Dict[str, Any]) -> BudgetEntry:
+        entry = op.get("entry")
+        if not isinstance(entry, dict):
+            raise InvalidPatch(f"Ligne manquante pour l'opération {op.get('op')}")
+        return normalize_entry(entry)
+
+    def _id_arg(self, op: Dict[str, Any]) -> str:
+        entry_id = op.get("id")
+        if entry_id is None or str(entry_id) not in self.entries:
+            raise InvalidPatch(f"Ligne inconnue: {entry_id}")
+        return str(entry_id)
+
+    def _apply_op(self, op: Dict[str, Any], new_ids: List[str]) -> int:
+        # Arguments validés avant toute modification (le patch entier est alors rejeté)
+        kind = op.get("op")
+        if kind == "add":
+            entry_id, first = self._add(self._entry_arg(op))
+            new_ids.append(entry_id)
+            return first
+        if kind == "update":
+            entry_id, entry = self._id_arg(op), self._entry_arg(op)
+            first = self._remove(entry_id)
+            return min(first, self._add(entry, entry_id)[1])
+        if kind == "remove":
+            return self._remove(self._id_arg(op))
+        if kind == "base":
+            value = op.get("value")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise InvalidPatch("Nouveau solde manquant ou non numérique (op base)")
+            self.base = float(value)
+            return 0
+        if kind == "scenario":
+            return self._set_scenario(op.get("scenario") or {})
+        raise InvalidPatch(f"Opération inconnue: {kind}")
+
+    # ---- lecture ---- #
+
+    def snapshot(self, full: bool = True) -> Dict[str, Any]:
+        summary = summary_fields(
+            kpis_from_sums(self.agg.kpi), breakdown_from_recurring_sums(self.agg.rec), self.currency
+        )
+        out: Dict[str, Any] = {
+            "meta": {"currency": self.currency, "horizon_days": self.horizon_days},
+            "inputs": {"base": self.base, "scenario": self.scenario},
+            "kpi": summary["kpi"],
+            "score": summary["score"],
+            "milestones": milestones_from_balances(self.balances),
+        }
+        if full:
+            out["curve"] = [
+                {"date": add_days(self.start, d).isoformat(), "balance": bal} for d, bal in enumerate(self.balances)
+            ]
+        out["breakdown"] = summary["breakdown"]
+        out["tips"] = summary["tips"]
+        return out
+
+
+# --------- Registre borné, éviction LRU + inactivité --------- #
+
+sessions = LRUCache(
+    max_items=int(os.getenv("SERENITY_SESSION_MAX", "1000")),
+    ttl=float(os.getenv("SERENITY_SESSION_IDLE", "900")),
+)
+
+
+def open_session(
+    base: float, currency: str, horizon_days: int, entries: List[Any], scenario: Dict[str, Any]
+) -> Tuple[str, CalcSession]:
+    session = CalcSession(base, currency, horizon_days, entries, scenario)
+    session_id = secrets.token_urlsafe(12)
+    sessions.set(session_id, session)
+    return session_id, session
+
+
+def patch_session(session_id: str, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    session: Optional[CalcSession] = sessions.get(session_id)
+    if session is None:
+        raise SessionNotFound(session_id)
+    with session.lock:
+        out = session.apply(ops)
+    # Ré-insertion : repousse l'échéance d'inactivité
+    sessions.set(session_id, session)
+    return out
+
+
+def close_session(session_id: str) -> bool:
+    return sessions.pop(session_id) is not None
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import math
+from datetime import date
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.calc import PreparedBudget, kpis_from_sums
+from services.metrics import span
+
+# --------- Solveur d'objectifs : "combien faut-il pour…" --------- #
+#
+# Un levier du scénario est résolu pour atteindre un objectif, les autres
+# leviers restant ceux de la requête :
+#   - extra_income : plus petit revenu mensuel ajouté qui atteint l'objectif
+#   - extra_credit : plus grande mensualité de crédit ajoutée qui le respecte
+#   - var_mul      : plus grand multiplicateur des dépenses variables qui le respecte
+#
+# Objectifs :
+#   - balance_at     : solde >= amount à la date donnée
+#   - never_negative : solde >= amount (0 par défaut) chaque jour de l'horizon
+#   - savings_rate   : taux d'épargne >= rate (20 % par défaut, comme build_tips)
+#
+# Le budget est préparé une fois (PreparedBudget) ; chaque évaluation n'est qu'une
+# surcouche de scénario. extra_income / extra_credit sont affines : une ligne
+# mensuelle ajoutée déplace le solde du jour d de montant * (versements jusqu'à d),
+# d'où une forme close à partir d'une seule évaluation. var_mul (arrondi ligne
+# par ligne) est résolu par dichotomie, l'objectif étant monotone.
+
+LEVERS = ("extra_income", "extra_credit", "var_mul")
+TARGETS = ("balance_at", "never_negative", "savings_rate")
+VAR_MUL_MAX = 2.0
+VAR_MUL_TOLERANCE = 0.001
+# scenario_params lit var_mul=0 comme 1 : la recherche s'arrête au pas de tolérance
+VAR_MUL_MIN = VAR_MUL_TOLERANCE
+# Bruit des sommes flottantes : un objectif atteint "au centime près" compte comme atteint
+EPSILON = 1e-6
+
+
+class SolveError(ValueError):
+    pass
+
+
+class _Evaluator:
+    """Surcouches de scénario comptées : soldes journaliers et KPI."""
+
+    def __init__(self, prepared: PreparedBudget, scenario: Dict[str, Any]):
+        self.prepared = prepared
+        self.scenario = dict(scenario)
+        self.calls = 0
+
+    def __call__(self, lever: str, value: float) -> Tuple[List[float], Dict[str, float]]:
+        self.calls += 1
+        agg = self.prepared.overlay({**self.scenario, lever: value})
+        balances = list(accumulate(agg.deltas, initial=float(self.prepared.base)))[1:]
+        return balances, kpis_from_sums(agg.kpi)
+
+
+def _margin(target: str, balances: List[float], kpi: Dict[str, float], day: int, amount: float, rate: float) -> float:
+    """Écart à l'objectif : >= 0 quand il est atteint."""
+    if target == "balance_at":
+        return balances[day] - amount
+    if target == "never_negative":
+        return min(balances) - amount
+    return kpi["save_pct"] / 100.0 - rate
+
+
+def _closed_form(
+    lever: str,
+    target: str,
+    balances: List[float],
+    kpi: Dict[str, float],
+    counts: List[int],
+    day: int,
+    amount: float,
+    rate: float,
+) -> Optional[float]:
+    """Valeur limite du levier (affine) ; None si aucune valeur >= 0 ne convient."""
+    if target == "savings_rate":
+        inc, exp = kpi["inc"], kpi["total_exp"]
+        if lever == "extra_income":
+            return max(0.0, exp / (1.0 - rate) - inc) if rate < 1.0 else None
+        bound = inc * (1.0 - rate) - exp
+        return bound if inc > 0 and bound >= 0 else None
+
+    days = [day] if target == "balance_at" else range(len(balances))
+    if lever == "extra_income":
+        # Plus petit x tel que balances[d] + x * counts[d] >= amount pour chaque jour
+        need = 0.0
+        for d in days:
+            gap = amount - balances[d] - EPSILON
+            if gap > 0:
+                if counts[d] == 0:
+                    return None
+                need = max(need, gap / counts[d])
+        return need
+    # extra_credit : plus grand y tel que balances[d] - y * counts[d] >= amount pour chaque jour
+    room = math.inf
+    for d in days:
+        slack = balances[d] - amount + EPSILON
+        if slack < 0:
+            return None
+        if counts[d]:
+            room = min(room, slack / counts[d])
+    return room
+
+
+def solve(
+    base: float,
+    currency: str,
+    horizon_days: int,
+    entries: List[Any],
+    scenario: Dict[str, Any],
+    lever: str,
+    target: str,
+    amount: float = 0.0,
+    on: Optional[date] = None,
+    rate: float = 0.20,
+) -> Dict[str, Any]:
+    if lever not in LEVERS:
+        raise SolveError(f"Levier inconnu: {lever}")
+    if target not in TARGETS:
+        raise SolveError(f"Objectif inconnu: {target}")
+
+    with span("solve.prepare"):
+        prepared = PreparedBudget(base, currency, horizon_days, entries)
+    day = prepared.horizon_days
+    if on is not None:
+        day = (on - prepared.start).days
+        if not 0 <= day <= prepared.horizon_days:
+            raise SolveError("La date cible doit être comprise dans l'horizon")
+
+    evaluate = _Evaluator(prepared, scenario)
+    met = lambda balances, kpi: _margin(target, balances, kpi, day, amount, rate) >= -EPSILON  # noqa: E731
+
+    with span("solve.search"):
+        if lever == "var_mul":
+            value, status = _bisect_var_mul(evaluate, met)
+            method = "bisection"
+        else:
+            balances, kpi = evaluate(lever, 0.0)
+            counts = _monthly_counts(prepared)
+            bound = _closed_form(lever, target, balances, kpi, counts, day, amount, rate)
+            value, status = _round_money(evaluate, met, lever, bound, already=met(balances, kpi))
+            method = "closed_form"
+
+    out: Dict[str, Any] = {
+        "lever": lever,
+        "target": target,
+        "status": status,
+        "value": value,
+        "method": method,
+        "evaluations": evaluate.calls,
+    }
+    if value is not None and not math.isinf(value):
+        balances, kpi = evaluate(lever, value)
+        out["evaluations"] = evaluate.calls
+        out["scenario"] = {**scenario, lever: value}
+        out["outcome"] = {
+            "date": date.fromordinal(prepared.start.toordinal() + day).isoformat(),
+            "balance_at": round(balances[day], 2),
+            "min_balance": round(min(balances), 2),
+            "save_pct": round(kpi["save_pct"], 2),
+            "currency": currency,
+        }
+    return out
+
+
+def _monthly_counts(prepared: PreparedBudget) -> List[int]:
+    """counts[d] = nombre de versements d'une ligne mensuelle de scénario jusqu'au jour d inclus."""
+    counts = [0] * (prepared.horizon_days + 1)
+    for off in prepared.monthly_offsets():
+        counts[off] += 1
+    return list(accumulate(counts))
+
+
+def _round_money(
+    evaluate: _Evaluator,
+    met: Callable[[List[float], Dict[str, float]], bool],
+    lever: str,
+    bound: Optional[float],
+    already: bool,
+) -> Tuple[Optional[float], str]:
+    """Arrondit au centime dans le sens sûr, puis vérifie (un centime de correction au plus)."""
+    if bound is None:
+        return None, "infeasible"
+    if math.isinf(bound):
+        return None, "unbounded"
+    if lever == "extra_income":
+        if already or bound <= 0:
+            return 0.0, "already_met"
+        value = math.ceil(round(bound * 100, 6)) / 100
+        step = 0.01
+    else:
+        value = math.floor(round(bound * 100, 6)) / 100
+        step = -0.01
+    if not met(*evaluate(lever, value)):
+        value = round(value + step, 2)
+        if value < 0 or not met(*evaluate(lever, value)):
+            return None, "infeasible"
+    return value, "ok"
+
+
+def _bisect_var_mul(
+    evaluate: _Evaluator,
+    met: Callable[[List[float], Dict[str, float]], bool],
+) -> Tuple[Optional[float], str]:
+    """Plus grand var_mul dans [VAR_MUL_MIN, VAR_MUL_MAX] qui atteint l'objectif (monotone décroissant)."""
+    if met(*evaluate("var_mul", VAR_MUL_MAX)):
+        return VAR_MUL_MAX, "bound"
+    if not met(*evaluate("var_mul", VAR_MUL_MIN)):
+        return None, "infeasible"
+    lo, hi = VAR_MUL_MIN, VAR_MUL_MAX
+    while hi - lo > VAR_MUL_TOLERANCE:
+        mid = (lo + hi) / 2
+        if met(*evaluate("var_mul", mid)):
+            lo = mid
+        else:
+            hi = mid
+    value = math.floor(lo / VAR_MUL_TOLERANCE) * VAR_MUL_TOLERANCE
+    return round(value, 3), "ok"
@@ -0,0 +1,503 @@
+from __future__ import annotations
+import codecs
+import csv
+import io
+import math
+import re
+import time
+import unicodedata
+from datetime import date
+from functools import lru_cache
+from statistics import median
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from services import recurrence
+
+# --------- Import de relevés bancaires (CSV / OFX) et détection des récurrences --------- #
+#
+# Lecture en flux : le fichier n'est jamais chargé en entier, seules les
+# transactions (jour, montant) sont gardées, déjà rangées par libellé normalisé.
+#
+# Détection, sans comparaison deux à deux :
+#   1. index haché (libellé normalisé, sens) -> transactions ;
+#   2. dans chaque groupe, montants triés puis découpés en paquets de montants
+#      proches (tolérance relative) en un seul balayage ;
+#   3. dans chaque paquet, dates triées : l'écart médian donne la période
+#      (hebdo, bimensuel, mensuel, trimestriel, annuel), retenue si la plupart
+#      des écarts la respectent et si la série est encore active en fin de relevé.
+# Le reste des dépenses devient une dépense variable mensuelle moyenne ; les
+# revenus ponctuels sont ignorés (projection prudente).
+
+FORMATS = ("csv", "ofx")
+SNIFF_BYTES = 64 * 1024
+AMOUNT_TOLERANCE = 0.20
+
+# rec, période en jours, tolérance en jours, occurrences minimum
+PERIODS = (
+    (recurrence.WEEKLY, 7.0, 1.5, 4),
+    (recurrence.BIWEEKLY, 14.0, 2.0, 3),
+    (recurrence.MONTHLY, 30.44, 4.0, 3),
+    (recurrence.QUARTERLY, 91.3, 8.0, 2),
+    (recurrence.YEARLY, 365.25, 12.0, 2),
+)
+# Part minimale des écarts conformes à la période
+REGULARITY = 0.66
+# Montants plus dispersés que ça (écart relatif) : dépense variable plutôt que fixe
+VARIABLE_SPREAD = 0.10
+
+CREDIT_WORDS = ("pret", "credit", "echeance", "emprunt", "loan", "mortgage", "leasing")
+# Mots de service des libellés bancaires, sans valeur pour regrouper
+STOPWORDS = frozenset((
+    "prlv", "prelevement", "sepa", "cb", "carte", "vir", "virement", "paiement", "achat", "retrait",
+    "dab", "inst", "sct", "recu", "emis", "de", "du", "des", "la", "le", "les", "en", "au", "par",
+    "pour", "ref", "fr", "facture", "ech", "card", "payment", "transfer", "to", "from", "the",
+))
+
+
+class InvalidStatement(ValueError):
+    pass
+
+
+# ---- valeurs ---- #
+
+
+@lru_cache(maxsize=16384)
+def parse_date(text: str) -> Optional[int]:
+    """Ordinal du jour : YYYY-MM-DD, DD/MM/YYYY, DD-MM-YY, DD.MM.YYYY, YYYYMMDD[hhmmss] (OFX)."""
+    t = text.strip()
+    try:
+        if len(t) >= 8 and t[:8].isdigit():
+            return date(int(t[:4]), int(t[4:6]), int(t[6:8])).toordinal()
+        parts = re.split(r"[/\-.]", t[:10])
+        if len(parts) != 3:
+            return None
+        if len(parts[0]) == 4:
+            y, m, d = parts
+        else:
+            d, m, y = parts
+        year = int(y)
+        if year < 100:
+            year += 2000
+        return date(year, int(m), int(d)).toordinal()
+    except ValueError:
+        return None
+
+
+_AMOUNT_JUNK = str.maketrans("", "", " \xa0 '€$£+")
+
+
+@lru_cache(maxsize=65536)
+def parse_amount(text: str) -> Optional[float]:
+    """Montant signé : "-1 234,56", "1,234.56", "(12.30)", "12,30 €"..."""
+    s = text.strip().translate(_AMOUNT_JUNK)
+    if not s:
+        return None
+    negative = s.startswith("(") and s.endswith(")")
+    if negative:
+        s = s[1:-1]
+    comma, dot = s.rfind(","), s.rfind(".")
+    if comma >= 0 and dot >= 0:
+        s = s.replace(".", "").replace(",", ".") if comma > dot else s.replace(",", "")
+    elif comma >= 0:
+        # Virgule décimale, sauf séparateur de milliers évident ("1,234")
+        s = s.replace(",", "") if len(s) - comma == 4 and s.count(",") == 1 and s[0] != "0" else s.replace(",", ".")
+    try:
+        value = float(s)
+    except ValueError:
+        return None
+    if not math.isfinite(value):
+        # float() accepte "nan", "inf", "infinity" : ligne rejetée plutôt qu'un montant inexploitable
+        return None
+    return -value if negative else value
+
+
+def _ascii(text: str) -> str:
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+
+
+_WORDS = re.compile(r"[a-z]{2,}")
+
+
+@lru_cache(maxsize=65536)
+def label_key(label: str) -> str:
+    """Libellé réduit à ses premiers mots utiles : numéros, dates et références retirés."""
+    words = [w for w in _WORDS.findall(_ascii(label)) if w not in STOPWORDS]
+    return " ".join(words[:4])
+
+
+# ---- lecture en flux ---- #
+
+Transaction = Tuple[int, float, str]  # (ordinal, montant signé, libellé)
+
+
+def _detect_encoding(head: bytes) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # Coupure au milieu d'un caractère en fin d'échantillon : reste de l'UTF-8
+        return "utf-8" if e.start >= len(head) - 3 else "cp1252"
+
+
+def _normalize_header(cell: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", _ascii(cell)))
+
+
+def _find_columns(row: List[str]) -> Optional[Dict[str, int]]:
+    cols: Dict[str, int] = {}
+    for i, cell in enumerate(row):
+        h = _normalize_header(cell)
+        if not h:
+            continue
+        if "date" not in cols and (h.startswith("date") or h.endswith("date")) and "valeur" not in h and "value" not in h:
+            cols["date"] = i
+        elif "label" not in cols and any(w in h for w in ("libelle", "label", "description", "memo", "wording", "intitule", "detail", "payee", "name")):
+            cols["label"] = i
+        elif "amount" not in cols and (h.startswith("montant") or h.startswith("amount") or h == "value"):
+            cols["amount"] = i
+        elif "debit" not in cols and h.startswith("debit"):
+            cols["debit"] = i
+        elif "credit" not in cols and h.startswith("credit"):
+            cols["credit"] = i
+        elif "balance" not in cols and (h.startswith("solde") or h.startswith("balance")):
+            cols["balance"] = i
+    if "date" in cols and ("amount" in cols or "debit" in cols or "credit" in cols):
+        return cols
+    return None
+
+
+class StatementReader:
+    """Transactions d'un relevé, lues en flux ; compteurs et solde final éventuel."""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.balance: Optional[float] = None
+        self._balance_first: Optional[Tuple[int, float]] = None
+        self._balance_last: Optional[Tuple[int, float]] = None
+        self._first_day: Optional[int] = None
+        self._last_day: Optional[int] = None
+
+    def _track_balance(self, day: int, value: Optional[float]) -> None:
+        if value is None:
+            return
+        if self._balance_first is None or day > self._balance_first[0]:
+            self._balance_first = (day, value)
+        if self._balance_last is None or day >= self._balance_last[0]:
+            self._balance_last = (day, value)
+
+    def read_csv(self, stream: IO[bytes]) -> Iterator[Transaction]:
+        head = stream.read(SNIFF_BYTES)
+        encoding = _detect_encoding(head)
+        sample = head.decode(encoding, errors="replace")
+        try:
+            dialect = csv.Sniffer().sniff(sample[:8192], delimiters=";,\t|")
+            delimiter = dialect.delimiter
+        except csv.Error:
+            delimiter = ";" if sample.count(";") > sample.count(",") else ","
+
+        # Échantillon déjà lu + reste du fichier, décodés au fil de l'eau
+        text = io.TextIOWrapper(
+            io.BufferedReader(_Prefixed(head, stream)), encoding=encoding, errors="replace", newline=""
+        )
+        try:
+            reader = csv.reader(text, delimiter=delimiter)
+            cols = None
+            for row in reader:
+                self.rows += 1
+                if cols is None:
+                    cols = _find_columns(row)
+                    if cols is None and self.rows > 30:
+                        raise InvalidStatement("Colonnes date / montant introuvables dans le CSV")
+                    continue
+                tx = self._csv_row(row, cols)
+                if tx is None:
+                    self.skipped += 1
+                else:
+                    yield tx
+            if cols is None:
+                raise InvalidStatement("Colonnes date / montant introuvables dans le CSV")
+        finally:
+            text.detach()
+        if self._balance_last is not None:
+            # Fichier du plus récent au plus ancien : le solde final est celui de la première ligne du dernier jour
+            self.balance = (self._balance_last if self._ascending else self._balance_first)[1]
+
+    def _csv_row(self, row: List[str], cols: Dict[str, int]) -> Optional[Transaction]:
+        try:
+            day = parse_date(row[cols["date"]])
+            if day is None:
+                return None
+            if "amount" in cols:
+                amount = parse_amount(row[cols["amount"]])
+            else:
+                debit = parse_amount(row[cols["debit"]]) if "debit" in cols and cols["debit"] < len(row) else None
+                credit = parse_amount(row[cols["credit"]]) if "credit" in cols and cols["credit"] < len(row) else None
+                amount = (credit or 0.0) - abs(debit or 0.0) if (debit or credit) else None
+            if not amount:
+                return None
+            label = row[cols["label"]] if "label" in cols else ""
+            if "balance" in cols and cols["balance"] < len(row):
+                self._track_balance(day, parse_amount(row[cols["balance"]]))
+        except IndexError:
+            return None
+        if self._first_day is None:
+            self._first_day = day
+        self._last_day = day
+        return day, amount, label
+
+    @property
+    def _ascending(self) -> bool:
+        return self._first_day is None or self._last_day is None or self._first_day <= self._last_day
+
+    def read_ofx(self, stream: IO[bytes], chunk_size: int = SNIFF_BYTES) -> Iterator[Transaction]:
+        """OFX 1.x (SGML, balises non fermées) ou 2.x (XML) : balises <TAG>valeur lues par morceaux."""
+        tag = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+        head = stream.read(chunk_size)
+        encoding = "cp1252" if b"CHARSET:1252" in head[:1024] else _detect_encoding(head)
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        buf = ""
+        current: Optional[Dict[str, str]] = None
+        in_ledger = False
+        chunk = head
+        while True:
+            buf += decoder.decode(chunk, final=not chunk)
+            # Ne traiter que jusqu'à la dernière balise complète
+            cut = max(buf.rfind("<"), 0) if chunk else len(buf)
+            for closing, name, value in tag.findall(buf[:cut]):
+                name = name.upper()
+                value = value.strip()
+                if name == "STMTTRN":
+                    if closing:
+                        tx = self._ofx_transaction(current or {})
+                        current = None
+                        if tx is None:
+                            self.skipped += 1
+                        else:
+                            yield tx
+                    else:
+                        current = {}
+                        self.rows += 1
+                elif name == "LEDGERBAL":
+                    in_ledger = not closing
+                elif closing:
+                    continue
+                elif current is not None and name in ("DTPOSTED", "TRNAMT", "NAME", "MEMO"):
+                    current[name] = value
+                elif in_ledger and name == "BALAMT":
+                    self.balance = parse_amount(value)
+            buf = buf[cut:]
+            if not chunk:
+                break
+            chunk = stream.read(chunk_size)
+        if self.rows == 0:
+            raise InvalidStatement("Aucune transaction <STMTTRN> dans le fichier OFX")
+
+    def _ofx_transaction(self, fields: Dict[str, str]) -> Optional[Transaction]:
+        day = parse_date(fields.get("DTPOSTED", ""))
+        amount = parse_amount(fields.get("TRNAMT", ""))
+        if day is None or not amount:
+            return None
+        return day, amount, fields.get("NAME") or fields.get("MEMO") or ""
+
+
+class _Prefixed(io.RawIOBase):
+    """Flux binaire : octets déjà lus (échantillon) puis suite du flux d'origine."""
+
+    def __init__(self, prefix: bytes, stream: IO[bytes]):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def detect_format(head: bytes) -> str:
+    probe = head[:4096].upper()
+    return "ofx" if b"OFXHEADER" in probe or b"<OFX>" in probe else "csv"
+
+
+# ---- détection des récurrences ---- #
+
+
+def _period(days: List[int]) -> Optional[Tuple[str, float]]:
+    if len(days) < 2:
+        return None
+    gaps = [b - a for a, b in zip(days, days[1:]) if b > a]
+    if not gaps:
+        return None
+    typical = median(gaps)
+    for rec, period, tolerance, min_count in PERIODS:
+        if abs(typical - period) <= tolerance:
+            if len(days) < min_count:
+                return None
+            regular = sum(1 for g in gaps if abs(g - period) <= tolerance)
+            return (rec, period) if regular >= REGULARITY * len(gaps) else None
+    return None
+
+
+def _amount_clusters(items: List[Tuple[int, float]], tolerance: float) -> Iterator[List[Tuple[int, float]]]:
+    """
+    Paquets de montants proches : tri par montant puis un seul balayage. Un paquet
+    est coupé quand deux montants consécutifs s'écartent de plus de `tolerance`
+    (relatif) : une dépense qui varie d'une fois sur l'autre reste une seule série.
+    """
+    items = sorted(items, key=lambda it: it[1])
+    cluster = [items[0]]
+    prev = items[0][1]
+    for it in items[1:]:
+        if it[1] - prev > max(1.0, prev * tolerance):
+            yield cluster
+            cluster = []
+        cluster.append(it)
+        prev = it[1]
+    yield cluster
+
+
+def _next_occurrence(rec: str, last: date, today: date) -> date:
+    k = 1
+    d = recurrence.nth_occurrence(rec, last, k)
+    while d < today:
+        k += 1
+        d = recurrence.nth_occurrence(rec, last, k)
+    return d
+
+
+def _category(kind: str, key: str, amounts: List[float]) -> str:
+    if kind == "income":
+        return "fixed"
+    if any(w in key for w in CREDIT_WORDS):
+        return "credit"
+    spread = (max(amounts) - min(amounts)) / max(median(amounts), 0.01)
+    return "variable" if spread > VARIABLE_SPREAD else "fixed"
+
+
+def detect_recurring(
+    groups: Dict[Tuple[str, bool], List[Tuple[int, float]]],
+    labels: Dict[Tuple[str, bool], str],
+    first_day: int,
+    last_day: int,
+    today: date,
+    tolerance: float = AMOUNT_TOLERANCE,
+) -> Tuple[List[Dict[str, Any]], float]:
+    """Lignes récurrentes détectées, et total des dépenses restantes (non récurrentes)."""
+    found: List[Dict[str, Any]] = []
+    residual = 0.0
+    for (key, income), items in groups.items():
+        for cluster in _amount_clusters(items, tolerance):
+            days = sorted(d for d, _ in cluster)
+            amounts = [a for _, a in cluster]
+            detected = _period(days) if key else None
+            # Série arrêtée avant la fin du relevé : abonnement résilié, prêt soldé…
+            if detected is not None and days[-1] + 1.5 * detected[1] < last_day:
+                detected = None
+            if detected is None:
+                if not income:
+                    residual += sum(amounts)
+                continue
+            rec, _ = detected
+            kind = "income" if income else "expense"
+            last = date.fromordinal(days[-1])
+            found.append({
+                "label": labels[(key, income)],
+                "type": kind,
+                "amount": round(median(amounts), 2),
+                "rec": rec,
+                "cat": _category(kind, key, amounts),
+                "start": _next_occurrence(rec, last, today).isoformat(),
+                "occurrences": len(days),
+                "first": date.fromordinal(days[0]).isoformat(),
+                "last": last.isoformat(),
+                "amount_min": round(min(amounts), 2),
+                "amount_max": round(max(amounts), 2),
+            })
+    found.sort(key=lambda e: (e["type"] != "income", -e["amount"]))
+    return found, residual
+
+
+def import_statement(
+    stream: IO[bytes],
+    fmt: Optional[str] = None,
+    currency: str = "$",
+    horizon_days: int = 90,
+    tolerance: float = AMOUNT_TOLERANCE,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    Relevé CSV/OFX -> requête /calc prête à envoyer (`request`), lignes récurrentes
+    détectées (`recurring`, même ordre que request.entries hors dépenses courantes)
+    et statistiques d'import.
+    """
+    t0 = time.perf_counter()
+    today = today or date.today()
+    head = stream.read(SNIFF_BYTES)
+    fmt = fmt or detect_format(head)
+    if fmt not in FORMATS:
+        raise InvalidStatement(f"Format inconnu: {fmt}")
+    source = _Prefixed(head, stream)
+
+    reader = StatementReader()
+    transactions = reader.read_ofx(source) if fmt == "ofx" else reader.read_csv(io.BufferedReader(source))
+
+    # Index haché (libellé normalisé, sens) -> [(jour, |montant|)]
+    groups: Dict[Tuple[str, bool], List[Tuple[int, float]]] = {}
+    labels: Dict[Tuple[str, bool], str] = {}
+    first_day = last_day = None
+    count = 0
+    for day, amount, label in transactions:
+        count += 1
+        gkey = (label_key(label), amount > 0)
+        bucket = groups.get(gkey)
+        if bucket is None:
+            bucket = groups[gkey] = []
+            labels[gkey] = " ".join(label.split())[:80]
+        bucket.append((day, abs(amount)))
+        if first_day is None or day < first_day:
+            first_day = day
+        if last_day is None or day > last_day:
+            last_day = day
+    if not count:
+        raise InvalidStatement("Aucune transaction exploitable dans le fichier")
+
+    recurring, residual = detect_recurring(groups, labels, first_day, last_day, today, tolerance)
+    entries = [{k: e[k] for k in ("type", "amount", "rec", "cat", "start")} for e in recurring]
+    months = max(1.0, (last_day - first_day + 1) / 30.44)
+    everyday = round(residual / months, 2)
+    if everyday > 0:
+        entries.append({"type": "expense", "amount": everyday, "rec": "monthly", "cat": "variable", "start": None})
+
+    return {
+        "request": {
+            "base": round(reader.balance, 2) if reader.balance is not None else 0.0,
+            "currency": currency,
+            "horizon_days": horizon_days,
+            "entries": entries,
+        },
+        "recurring": recurring,
+        "everyday_spending": {"monthly": everyday, "months": round(months, 1)},
+        "stats": {
+            "format": fmt,
+            "rows": reader.rows,
+            "transactions": count,
+            "skipped": reader.skipped,
+            "groups": len(groups),
+            "start": date.fromordinal(first_day).isoformat(),
+            "end": date.fromordinal(last_day).isoformat(),
+            "balance_found": reader.balance is not None,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        },
+    }
@@ -0,0 +1,305 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+try:  # variantes brotli, facultatives (gzip sinon)
+    import brotli
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    brotli = None
+
+
+# --------- Front statique (Frontend/) servi par l'API --------- #
+#
+# Tout est préparé au démarrage (StaticBundle.load), rien n'est compressé par requête :
+#   - assets (js, css, images…) renommés avec l'empreinte de leur contenu :
+#       assets/js/app.js -> assets/js/app.3f2a1b9c0d.js
+#     servis avec Cache-Control: immutable (un nouveau contenu = une nouvelle URL) ;
+#     l'ancien nom reste servi, sans cache long, pour les liens externes
+#   - pages HTML : références locales (src=, href=) réécrites vers les noms hachés,
+#     servies en no-cache (revalidation par ETag -> 304) ; une référence absolue
+#     ("/js/app.js", ou déjà préfixée "/app/js/app.js") vise la racine du front
+#     et reçoit le préfixe de montage (SERENITY_FRONTEND_PREFIX)
+#   - variantes gzip / brotli précalculées, gardées si plus petites que l'original ;
+#     choisies selon Accept-Encoding (br > gzip > identity)
+#   - ETag fort par variante (empreinte SHA-256 du contenu servi)
+# Les fichiers au-delà de MAX_MEMORY_BYTES restent sur disque (variantes dans un
+# dossier temporaire) et passent par FileResponse (sendfile quand le serveur le propose).
+
+FRONTEND_PREFIX = os.getenv("SERENITY_FRONTEND_PREFIX", "/app")
+FRONTEND_DIR = Path(os.getenv("SERENITY_FRONTEND_DIR", str(Path(__file__).resolve().parents[2] / "Frontend")))
+MAX_MEMORY_BYTES = int(os.getenv("SERENITY_STATIC_MAX_MEMORY", str(1024 * 1024)))
+COMPRESS_MIN_BYTES = 512
+HASH_LENGTH = 10
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+PAGE_SUFFIXES = (".html", ".htm")
+
+_REFERENCE = re.compile(r"""(\b(?:src|href)\s*=\s*["'])([^"'#?]+)([^"']*["'])""", re.IGNORECASE)
+
+
+class Variant:
+    __slots__ = ("encoding", "etag", "size", "body", "path")
+
+    def __init__(self, encoding: str, data: bytes, path: Optional[Path] = None):
+        self.encoding = encoding
+        self.etag = f'"{hashlib.sha256(data).hexdigest()[:16]}{"-" + encoding if encoding != "identity" else ""}"'
+        self.size = len(data)
+        # En mémoire, ou fichier sur disque pour les gros assets
+        self.body: Optional[bytes] = data if path is None else None
+        self.path = path
+
+
+class Asset:
+    __slots__ = ("media_type", "cache_control", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, variants: Dict[str, Variant]):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.variants = variants
+
+    def pick(self, accept_encoding: str) -> Variant:
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.variants:
+                return self.variants[encoding]
+        return self.variants["identity"]
+
+
+def _accepted_encodings(header: str) -> Tuple[str, ...]:
+    """Codages acceptés (q > 0) d'un en-tête Accept-Encoding."""
+    out: List[str] = []
+    for part in header.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            out.append(name.strip())
+    if "*" in out:
+        out.extend(("br", "gzip"))
+    return tuple(out)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match : comparaison faible (RFC 9110), W/ ignoré
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def hashed_name(rel: str, data: bytes) -> str:
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _media_type(rel: str) -> str:
+    media_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+class StaticBundle:
+    """
+    Application ASGI servant un dossier statique préparé au démarrage.
+    - root : dossier du front (SERENITY_FRONTEND_DIR, Frontend/ du dépôt par défaut)
+    - index : page servie pour "/" et les dossiers
+    - prefix : point de montage (app.mount), ajouté aux références absolues réécrites
+    """
+
+    def __init__(
+        self,
+        root: Path = FRONTEND_DIR,
+        index: str = "index.html",
+        max_memory_bytes: int = MAX_MEMORY_BYTES,
+        prefix: str = FRONTEND_PREFIX,
+    ):
+        self.root = root
+        self.prefix = prefix.rstrip("/")
+        self.index = index
+        self.max_memory_bytes = max_memory_bytes
+        self._assets: Dict[str, Asset] = {}
+        self._manifest: Dict[str, str] = {}
+        self._spill: Optional[tempfile.TemporaryDirectory] = None
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.hits = 0
+        self.not_modified = 0
+
+    @property
+    def available(self) -> bool:
+        return self.root.is_dir()
+
+    # ---- préparation ---- #
+
+    def load(self) -> None:
+        """Empreintes, réécriture des pages et compression, une fois pour toutes."""
+        with self._lock:
+            if self.loaded:
+                return
+            assets: Dict[str, Asset] = {}
+            manifest: Dict[str, str] = {}
+            pages: List[Tuple[str, bytes]] = []
+            if self.available:
+                files = sorted(p for p in self.root.rglob("*") if p.is_file() and not p.name.startswith("."))
+                for path in files:
+                    rel = path.relative_to(self.root).as_posix()
+                    if rel.endswith(PAGE_SUFFIXES):
+                        pages.append((rel, path.read_bytes()))
+                        continue
+                    data = path.read_bytes()
+                    manifest[rel] = hashed_name(rel, data)
+                    asset = self._asset(rel, data, IMMUTABLE)
+                    assets[manifest[rel]] = asset
+                    # Même contenu (variantes partagées), sans cache long sous l'ancien nom
+                    assets[rel] = Asset(asset.media_type, REVALIDATE, asset.variants)
+                for rel, data in pages:
+                    assets[rel] = self._asset(rel, self._rewrite(rel, data, manifest), REVALIDATE)
+            self._assets, self._manifest = assets, manifest
+            self.loaded = True
+
+    def _rewrite(self, page: str, data: bytes, manifest: Dict[str, str]) -> bytes:
+        """Références locales d'une page vers les noms hachés (chemins relatifs conservés)."""
+        base = posixpath.dirname(page)
+
+        def replace(match: "re.Match[str]") -> str:
+            ref = match.group(2)
+            if "://" in ref or ref.startswith(("//", "data:", "mailto:", "tel:", "javascript:")):
+                return match.group(0)
+            absolute = ref.startswith("/")
+            if absolute:
+                path = ref
+                if self.prefix and path.startswith(self.prefix + "/"):
+                    path = path[len(self.prefix):]
+                target = posixpath.normpath(path.lstrip("/"))
+            else:
+                target = posixpath.normpath(posixpath.join(base, ref))
+            hashed = manifest.get(target)
+            if hashed is None:
+                return match.group(0)
+            new = f"{self.prefix}/{hashed}" if absolute else posixpath.relpath(hashed, base or ".")
+            return match.group(1) + new + match.group(3)
+
+        text = data.decode("utf-8", errors="surrogateescape")
+        return _REFERENCE.sub(replace, text).encode("utf-8", errors="surrogateescape")
+
+    def _asset(self, rel: str, data: bytes, cache_control: str) -> Asset:
+        media_type = _media_type(rel)
+        encoded = {"identity": data}
+        if len(data) >= COMPRESS_MIN_BYTES and media_type.startswith(COMPRESSIBLE):
+            encoded["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                encoded["br"] = brotli.compress(data, quality=11)
+            encoded = {k: v for k, v in encoded.items() if k == "identity" or len(v) < len(data)}
+        variants = {}
+        for encoding, body in encoded.items():
+            path = self._spill_file(rel, encoding, body) if len(body) > self.max_memory_bytes else None
+            variants[encoding] = Variant(encoding, body, path)
+        return Asset(media_type, cache_control, variants)
+
+    def _spill_file(self, rel: str, encoding: str, body: bytes) -> Path:
+        if self._spill is None:
+            self._spill = tempfile.TemporaryDirectory(prefix="serenity-static-")
+        path = Path(self._spill.name) / f"{hashlib.sha256(body).hexdigest()}.{encoding}"
+        if not path.exists():
+            path.write_bytes(body)
+        return path
+
+    def close(self) -> None:
+        spill, self._spill = self._spill, None
+        if spill is not None:
+            spill.cleanup()
+        self._assets, self._manifest = {}, {}
+        self.loaded = False
+
+    # ---- service ---- #
+
+    def manifest(self) -> Dict[str, str]:
+        """Nom source -> nom haché (assets hors pages)."""
+        return dict(self._manifest)
+
+    def _lookup(self, path: str) -> Optional[Asset]:
+        rel = path.lstrip("/")
+        if rel == "" or rel.endswith("/"):
+            rel += self.index
+        asset = self._assets.get(rel)
+        if asset is None and "." not in posixpath.basename(rel):
+            asset = self._assets.get(f"{rel}/{self.index}")
+        return asset
+
+    def response(self, path: str, method: str, accept_encoding: str, if_none_match: Optional[str]) -> Response:
+        if not self.loaded:
+            self.load()
+        if method not in ("GET", "HEAD"):
+            return PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        asset = self._lookup(path)
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        variant = asset.pick(accept_encoding)
+        headers = {"ETag": variant.etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if variant.encoding != "identity":
+            headers["Content-Encoding"] = variant.encoding
+        if if_none_match and _etag_matches(if_none_match, variant.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        self.hits += 1
+        if variant.path is not None:
+            return FileResponse(variant.path, media_type=asset.media_type, headers=headers, method=method)
+        body = b"" if method == "HEAD" else variant.body
+        headers["Content-Length"] = str(variant.size)
+        return Response(body, media_type=asset.media_type, headers=headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        headers = {}
+        for name, value in scope.get("headers") or ():
+            if name in (b"accept-encoding", b"if-none-match"):
+                headers[name] = value.decode("latin-1")
+        # Monté (app.mount) : chemin relatif au point de montage
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        response = self.response(
+            path, scope["method"], headers.get(b"accept-encoding", ""), headers.get(b"if-none-match")
+        )
+        await response(scope, receive, send)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "root": str(self.root),
+            "loaded": self.loaded,
+            "files": len(self._assets),
+            "hashed": len(self._manifest),
+            "memory_bytes": sum(
+                v.size for v in {id(v): v for a in self._assets.values() for v in a.variants.values()}.values()
+                if v.body is not None
+            ),
+            "brotli": brotli is not None,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+        }
+
+
+static_bundle = StaticBundle()
@@ -1 +1,283 @@
-# Sauvegarde snapshots
+from __future__ import annotations
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.cache import LRUCache, canonical_json
+
+# --------- Stockage SQLite : snapshots (Pro), feedback, événements de visite --------- #
+#
+# - Mode WAL : les lectures ne bloquent pas l'écriture et inversement.
+# - Une connexion par thread (threading.local), réutilisée ; les requêtes sont
+#   des constantes, donc préparées une fois par connexion (cache sqlite3).
+# - Snapshots : JSON canonique compressé (zlib), stocké une seule fois par
+#   empreinte SHA-256 ; un snapshot n'est qu'une référence (owner, kind, hash).
+# - Feedback et visites : file en mémoire vidée par un thread d'écriture,
+#   par lots dans une seule transaction (commit groupé).
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash       TEXT PRIMARY KEY,
+    data       BLOB NOT NULL,
+    size       INTEGER NOT NULL,
+    raw_size   INTEGER NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id         INTEGER PRIMARY KEY,
+    owner      TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    hash       TEXT NOT NULL REFERENCES blobs(hash),
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_owner ON snapshots(owner, kind, id DESC);
+
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL NOT NULL,
+    kind    TEXT NOT NULL,
+    visitor TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events(kind, ts);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL NOT NULL,
+    verdict TEXT NOT NULL,
+    score   INTEGER,
+    comment TEXT
+);
+"""
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # durable au checkpoint, sans fsync par commit
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",  # ~16 Mo de pages par connexion
+    "PRAGMA mmap_size=134217728",
+)
+
+SQL_INSERT_BLOB = "INSERT OR IGNORE INTO blobs(hash, data, size, raw_size, created_at) VALUES (?, ?, ?, ?, ?)"
+SQL_INSERT_SNAPSHOT = "INSERT INTO snapshots(owner, kind, hash, created_at) VALUES (?, ?, ?, ?)"
+SQL_LATEST_SNAPSHOT = (
+    "SELECT s.id, s.hash, s.created_at, b.data FROM snapshots s JOIN blobs b ON b.hash = s.hash "
+    "WHERE s.owner = ? AND s.kind = ? ORDER BY s.id DESC LIMIT 1"
+)
+SQL_GET_SNAPSHOT = (
+    "SELECT s.id, s.hash, s.created_at, b.data FROM snapshots s JOIN blobs b ON b.hash = s.hash WHERE s.id = ?"
+)
+SQL_INSERT_EVENT = "INSERT INTO events(ts, kind, visitor, payload) VALUES (?, ?, ?, ?)"
+SQL_INSERT_FEEDBACK = "INSERT INTO feedback(ts, verdict, score, comment) VALUES (?, ?, ?, ?)"
+SQL_COUNT_EVENTS = "SELECT COUNT(*), COUNT(DISTINCT visitor) FROM events WHERE kind = ? AND ts >= ?"
+
+
+def encode_blob(data: Any) -> Tuple[str, bytes, int]:
+    """Empreinte SHA-256 du JSON canonique, blob compressé, taille brute."""
+    raw = canonical_json(data)
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, 6), len(raw)
+
+
+def decode_blob(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+class Storage:
+    """
+    - path           : fichier SQLite (créé au besoin)
+    - batch_size     : écritures d'événements regroupées par transaction
+    - flush_interval : délai max (s) avant d'écrire un lot incomplet
+    - max_queue      : événements en attente ; au-delà ils sont abandonnés
+    """
+
+    def __init__(self, path: Path, batch_size: int = 500, flush_interval: float = 0.5, max_queue: int = 50_000):
+        self.path = Path(path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        # Les blobs sont immuables (adressés par contenu) : cache des snapshots décodés,
+        # partagés entre appelants, à traiter en lecture seule
+        self._decoded = LRUCache(max_items=1024, max_bytes=64 * 1024 * 1024)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    # ---- connexions ---- #
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, cached_statements=64)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Connexion du thread courant (ouverte une fois, puis réutilisée)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._ensure_schema()
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executescript(SCHEMA)
+                    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            finally:
+                conn.close()
+            self._initialized = True
+
+    # ---- snapshots ---- #
+
+    def save_snapshot(self, owner: str, kind: str, data: Any) -> Dict[str, Any]:
+        """Enregistre `data` ; le contenu n'est stocké qu'une fois par empreinte."""
+        digest, blob, raw_size = encode_blob(data)
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            conn.execute(SQL_INSERT_BLOB, (digest, blob, len(blob), raw_size, now))
+            cur = conn.execute(SQL_INSERT_SNAPSHOT, (owner, kind, digest, now))
+        return {"id": cur.lastrowid, "hash": digest, "created_at": now, "bytes": len(blob)}
+
+    def _row_to_snapshot(self, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        snapshot_id, digest, created_at, blob = row
+        data = self._decoded.get(digest)
+        if data is None:
+            data = decode_blob(blob)
+            self._decoded.set(digest, data, size=len(blob) * 4)
+        return {"id": snapshot_id, "hash": digest, "created_at": created_at, "data": data}
+
+    def latest_snapshot(self, owner: str, kind: str = "budget") -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(SQL_LATEST_SNAPSHOT, (owner, kind)).fetchone()
+        return self._row_to_snapshot(row)
+
+    def get_snapshot(self, snapshot_id: int) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(SQL_GET_SNAPSHOT, (snapshot_id,)).fetchone()
+        return self._row_to_snapshot(row)
+
+    # ---- événements : écriture groupée en arrière-plan ---- #
+
+    def _enqueue(self, sql: str, params: tuple) -> bool:
+        try:
+            self._queue.put_nowait((sql, params))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def log_event(self, kind: str, visitor: Optional[str] = None, payload: Optional[Dict[str, Any]] = None) -> bool:
+        """Ajoute un événement (visite…) à la file d'écriture ; ne bloque jamais."""
+        body = json.dumps(payload, separators=(",", ":")) if payload else None
+        return self._enqueue(SQL_INSERT_EVENT, (time.time(), kind, visitor, body))
+
+    def log_feedback(self, verdict: str, score: Optional[int] = None, comment: Optional[str] = None) -> bool:
+        return self._enqueue(SQL_INSERT_FEEDBACK, (time.time(), verdict, score, comment))
+
+    def start(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        self._writer = threading.Thread(target=self._write_loop, name="storage-writer", daemon=True)
+        self._writer.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Écrit les événements en attente puis arrête le thread d'écriture."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout)
+        self._writer = None
+
+    def _write_loop(self) -> None:
+        conn = self.connection()
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while items[-1] is not None and len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            if stop:
+                # Vidage final sans attendre
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            batch = [item for item in items if item is not None]
+            if batch:
+                self._write_batch(conn, batch)
+            for _ in items:
+                self._queue.task_done()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Tuple[str, tuple]]) -> None:
+        grouped: Dict[str, List[tuple]] = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+        try:
+            with conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+        except sqlite3.Error:
+            self.dropped += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Attend que la file soit vide (tests, arrêt)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # ---- lecture des journaux ---- #
+
+    def event_counts(self, kind: str, since: float) -> Dict[str, int]:
+        total, visitors = self.connection().execute(SQL_COUNT_EVENTS, (kind, since)).fetchone()
+        return {"events": total, "visitors": visitors}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "decoded_cache": self._decoded.stats(),
+        }
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / "data" / "serenity.db"
+
+storage = Storage(
+    path=Path(os.getenv("SERENITY_DB_PATH", DEFAULT_DB_PATH)),
+    batch_size=int(os.getenv("SERENITY_DB_BATCH", "500")),
+    flush_interval=float(os.getenv("SERENITY_DB_FLUSH_INTERVAL", "0.5")),
+)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Imports de l'application comme en production (depuis api/) : `from services ...`
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
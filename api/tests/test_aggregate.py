@@ -0,0 +1,41 @@
+import pytest
+
+from services.calc import compute_projection
+
+# Sorties figées du calcul historique (avant la table de facteurs partagée) : les KPI
+# mensualisent par montant * (1/12), la répartition par récurrence par montant / 12,
+# d'où Crédit 169.89 mais Annuel 169.90 pour la même ligne annuelle.
+ENTRIES = [
+    {"type": "income", "amount": 2450.0, "rec": "monthly", "cat": "fixed"},
+    {"type": "income", "amount": 35.5, "rec": "weekly", "cat": "variable"},
+    {"type": "expense", "amount": 596.9, "rec": "quarterly", "cat": "fixed"},
+    {"type": "expense", "amount": 509.63, "rec": "quarterly", "cat": "variable"},
+    {"type": "expense", "amount": 2038.74, "rec": "yearly", "cat": "credit"},
+    {"type": "expense", "amount": 42.0, "rec": "weekly", "cat": "variable"},
+    {"type": "expense", "amount": 890.0, "rec": "monthly", "cat": "fixed"},
+    {"type": "expense", "amount": 120.0, "rec": "oneoff", "cat": "variable"},
+]
+TIP = "Continue : maintiens ton cap et renforce progressivement l’épargne."
+
+PINNED = [
+    (
+        {},
+        {"Fixe": 1088.97, "Variable": 351.86, "Crédit": 169.89},
+        {"Mensuel": 3340.0, "Hebdo": 335.81, "Ponctuel": 120.0, "Trimestriel": 368.84, "Annuel": 169.9},
+    ),
+    (
+        {"var_mul": 0.9, "extra_credit": 55.5},
+        {"Fixe": 1088.97, "Variable": 316.68, "Crédit": 225.39},
+        {"Mensuel": 3395.5, "Hebdo": 317.61, "Ponctuel": 108.0, "Trimestriel": 351.86, "Annuel": 169.9},
+    ),
+]
+
+
+@pytest.mark.parametrize("engine", ["buckets", "events"])
+@pytest.mark.parametrize("scenario,by_category,by_recurring", PINNED)
+def test_breakdown_matches_historical_output(engine, scenario, by_category, by_recurring):
+    result = compute_projection(1000.0, "€", 90, ENTRIES, scenario, engine=engine)
+    breakdown = result["breakdown"]
+    assert {b["label"]: b["amount"] for b in breakdown["by_category"]} == by_category
+    assert {b["label"]: b["amount"] for b in breakdown["by_recurring"]} == by_recurring
+    assert result["tips"] == [TIP]
@@ -0,0 +1,29 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from routers import calc
+from routers.calc import Entry
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(calc.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_every_n_days_requires_a_period(client):
+    entry = {"type": "expense", "amount": 300.0, "rec": "every_n_days"}
+    for route in ("/api/calc", "/api/calc/batch"):
+        r = client.post(route, json={"base": 1000.0, "entries": [entry]})
+        assert r.status_code == 422
+        assert "every_days" in r.text
+    assert client.post("/api/calc", json={"entries": [{**entry, "every_days": 0}]}).status_code == 422
+
+
+def test_every_n_days_with_period_is_valid():
+    assert Entry(type="expense", amount=300.0, rec="every_n_days", every_days=30).every_days == 30
+    with pytest.raises(ValidationError):
+        Entry(type="expense", amount=300.0, rec="every_n_days")
@@ -0,0 +1,64 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from services import calc
+
+TODAY = date(2024, 1, 31)
+RECS = ["oneoff", "weekly", "biweekly", "every_n_days", "monthly", "quarterly", "yearly", "last_business_day", "other"]
+CATS = ["fixed", "variable", "credit", None]
+
+
+@pytest.fixture(autouse=True)
+def fixed_today(monkeypatch):
+    monkeypatch.setattr(calc, "today0", lambda: TODAY)
+
+
+def random_entry(rnd):
+    entry = {
+        "type": rnd.choice(["income", "expense", "expense", "expense"]),
+        "amount": round(rnd.uniform(1, 3000), 2),
+        "rec": rnd.choice(RECS),
+        "cat": rnd.choice(CATS),
+    }
+    if rnd.random() < 0.7:
+        # Début passé (ramené à aujourd'hui), fin de mois, ou au-delà de l'horizon
+        entry["start"] = (TODAY + timedelta(days=rnd.randint(-400, 400))).isoformat()
+    if rnd.random() < 0.3:
+        entry["end"] = (TODAY + timedelta(days=rnd.randint(0, 500))).isoformat()
+    if entry["rec"] == "every_n_days":
+        entry["every_days"] = rnd.randint(1, 45)
+    return entry
+
+
+def random_scenario(rnd):
+    return rnd.choice([
+        {},
+        {"var_mul": round(rnd.uniform(0.5, 1.5), 2)},
+        {"var_mul": 0.8, "extra_income": 150.0, "extra_credit": 90.5},
+    ])
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_buckets_and_events_engines_agree(seed):
+    rnd = random.Random(seed)
+    entries = [random_entry(rnd) for _ in range(rnd.randint(1, 60))]
+    horizon = rnd.choice([1, 30, 90, 180, 365, 730])
+    base = round(rnd.uniform(-2000, 10000), 2)
+
+    assert calc.project_daily(base, entries, horizon, engine="buckets") == calc.project_daily(
+        base, entries, horizon, engine="events"
+    )
+
+    scenario = random_scenario(rnd)
+    buckets = calc.compute_projection(base, "€", horizon, entries, dict(scenario), engine="buckets")
+    events = calc.compute_projection(base, "€", horizon, entries, dict(scenario), engine="events")
+    assert buckets["curve"] == events["curve"]
+    assert buckets["milestones"] == events["milestones"]
+    assert buckets["kpi"] == pytest.approx(events["kpi"])
+    assert {k: v for k, v in buckets["score"].items() if k != "ratios"} == {
+        k: v for k, v in events["score"].items() if k != "ratios"
+    }
+    assert buckets["score"]["ratios"] == pytest.approx(events["score"]["ratios"])
+    assert buckets["breakdown"] == events["breakdown"]
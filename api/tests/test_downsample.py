@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from services.downsample import downsample_curve, lttb_indices
+
+
+def random_walk(rnd, n):
+    value, out = rnd.uniform(-500, 3000), []
+    for _ in range(n):
+        if rnd.random() < 0.05:
+            value += rnd.choice((-1, 1)) * rnd.uniform(200, 2500)  # loyer, salaire...
+        value += rnd.uniform(-40, 25)
+        out.append(round(value, 2))
+    return out
+
+
+def first_negative(values):
+    return next((i for i, y in enumerate(values) if y < 0), None)
+
+
+SERIES = [random_walk(random.Random(seed), random.Random(seed).randint(200, 3000)) for seed in range(300)]
+
+
+@pytest.mark.parametrize("max_points", [3, 4, 20, 120])
+def test_invariants(max_points):
+    for values in SERIES:
+        kept = lttb_indices(values, max_points)
+        assert len(kept) <= max_points
+        assert kept == sorted(set(kept))
+        assert kept[0] == 0 and kept[-1] == len(values) - 1
+        assert min(values[i] for i in kept) == min(values)
+        crossing = first_negative(values)
+        if crossing is not None and max_points >= 4:
+            assert crossing in kept
+
+
+def test_crossing_and_minimum_in_same_bucket():
+    # Solde qui passe sous zéro puis touche son minimum deux jours plus tard
+    values = [100.0] * 50 + [-5.0, -20.0, -80.0, -10.0] + [50.0] * 46
+    kept = lttb_indices(values, 6)
+    assert len(kept) <= 6
+    assert 50 in kept and 52 in kept
+
+
+def test_short_series_pass_through():
+    values = [3.0, -1.0, 2.0, 5.0]
+    assert lttb_indices(values, 4) == [0, 1, 2, 3]
+    assert lttb_indices(values, 10) == [0, 1, 2, 3]
+    curve = [{"date": f"2024-01-0{i + 1}", "balance": v} for i, v in enumerate(values)]
+    assert downsample_curve(curve, 4) is curve
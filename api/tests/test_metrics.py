@@ -0,0 +1,52 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from routers import metrics as metrics_router
+from services.limits import MAX_BODY_BYTES
+from services.metrics import MetricsMiddleware, SamplingProfiler, profiler, registry
+
+
+def test_metrics_middleware_is_outermost():
+    assert main.app.user_middleware[0].cls is MetricsMiddleware
+
+
+def test_rejected_body_is_counted():
+    client = TestClient(main.app)
+    r = client.post(
+        "/api/calc",
+        content=b" " * (MAX_BODY_BYTES + 1),
+        headers={"content-type": "application/json"},
+    )
+    assert r.status_code == 413
+    assert 'method="POST",route="unmatched",status="413"' in registry.render()
+
+
+def test_profiler_stops_after_duration():
+    profiler = SamplingProfiler(interval=0.005)
+    profiler.start(duration=0.1)
+    assert profiler.running and profiler.stats()["remaining_s"] is not None
+    time.sleep(0.5)
+    assert not profiler.running
+    assert profiler.samples > 0
+
+
+def test_profiler_routes_need_a_configured_token(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", None)
+    assert client.post("/api/metrics/profiler", params={"enabled": "true"}).status_code == 404
+    assert client.get("/api/metrics/profile").status_code == 404
+    assert not profiler.running
+
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "secret")
+    params = {"enabled": "true", "duration_s": 1}
+    assert client.post("/api/metrics/profiler", params=params).status_code == 403
+    headers = {"X-Metrics-Token": "secret"}
+    r = client.post("/api/metrics/profiler", params={**params, "interval_ms": 1}, headers=headers)
+    assert r.status_code == 422
+    try:
+        r = client.post("/api/metrics/profiler", params={**params, "interval_ms": 5}, headers=headers)
+        assert r.status_code == 200 and r.json()["interval_ms"] == 5.0
+    finally:
+        profiler.stop()
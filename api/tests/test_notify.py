@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+
+from services.notify import TelegramDispatcher
+
+
+class StubTelegram:
+    """Serveur HTTP local : répond aux POST dans l'ordre de `responses`, puis 200."""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.requests = []  # (instant, chemin, corps JSON)
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def base_url(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                headers = {k.lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                self.requests.append((time.monotonic(), lines[0].split()[1], json.loads(body or b"{}")))
+                status, payload = self.responses.pop(0) if self.responses else (200, {"ok": True})
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def dispatcher_for(stub, **kwargs):
+    options = {"interval": 60.0, "backoff": 0.01, "timeout": 2.0, **kwargs}
+    return TelegramDispatcher("TOKEN", "42", base_url=stub.base_url, **options)
+
+
+async def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "délai dépassé"
+        await asyncio.sleep(0.01)
+
+
+def test_visits_are_batched_into_one_digest():
+    async def scenario():
+        async with StubTelegram() as stub:
+            d = dispatcher_for(stub, interval=0.1)
+            await d.start()
+            for _ in range(3):
+                d.record_visit()
+            await wait_for(lambda: d.sent == 1)
+            await asyncio.sleep(0.25)  # intervalle suivant sans visite : rien de plus
+            await d.stop()
+            return stub.requests, d.stats()
+
+    requests, stats = asyncio.run(scenario())
+    assert len(requests) == 1
+    _, path, body = requests[0]
+    assert path == "/botTOKEN/sendMessage"
+    assert body["chat_id"] == "42" and body["text"].startswith("📈 3 visites")
+    assert stats["sent"] == 1 and stats["pending_visits"] == 0
+
+
+def test_server_errors_are_retried_with_backoff():
+    async def scenario():
+        async with StubTelegram([(500, {}), (502, {}), (503, {})]) as stub:
+            d = dispatcher_for(stub, backoff=0.05)
+            await d.start()
+            assert d.enqueue("hello")
+            await wait_for(lambda: d.sent == 1)
+            await d.stop()
+            return stub.requests, d.stats()
+
+    requests, stats = asyncio.run(scenario())
+    assert len(requests) == 4
+    assert stats["retries"] == 3 and stats["failed"] == 0
+    gaps = [b[0] - a[0] for a, b in zip(requests, requests[1:])]
+    # Délai doublé à chaque essai : 0.05, 0.1, 0.2 (+ 25 % de gigue au plus)
+    for attempt, gap in enumerate(gaps):
+        assert gap >= 0.05 * 2 ** attempt * 0.95
+
+
+def test_rate_limit_honours_retry_after():
+    async def scenario():
+        limited = (429, {"ok": False, "parameters": {"retry_after": 0.3}})
+        async with StubTelegram([limited]) as stub:
+            # Backoff très long : seule la consigne retry_after permet de réussir à temps
+            d = dispatcher_for(stub, backoff=30.0)
+            await d.start()
+            d.enqueue("hello")
+            await wait_for(lambda: d.sent == 1, timeout=2.0)
+            await d.stop()
+            return stub.requests
+
+    requests = asyncio.run(scenario())
+    assert len(requests) == 2
+    assert requests[1][0] - requests[0][0] >= 0.3 * 0.95
+
+
+def test_client_errors_and_exhausted_retries_fail():
+    async def scenario():
+        async with StubTelegram([(400, {}), (500, {}), (500, {})]) as stub:
+            d = dispatcher_for(stub, max_retries=1)
+            await d.start()
+            d.enqueue("invalide")  # 400 : définitif, pas de reprise
+            d.enqueue("instable")  # 500 puis 500 : reprises épuisées
+            await wait_for(lambda: d.failed == 2)
+            await d.stop()
+            return stub.requests, d.stats()
+
+    requests, stats = asyncio.run(scenario())
+    assert len(requests) == 3
+    assert stats["retries"] == 1 and stats["sent"] == 0
+
+
+def test_full_queue_drops_messages():
+    async def scenario():
+        async with StubTelegram() as stub:
+            d = dispatcher_for(stub, max_queue=2)
+            await d.start()
+            # L'envoyeur n'a pas encore tourné : la file se remplit
+            accepted = [d.enqueue(f"m{i}") for i in range(5)]
+            await d.stop()
+            return accepted, stub.requests, d.stats()
+
+    accepted, requests, stats = asyncio.run(scenario())
+    assert accepted == [True, True, False, False, False]
+    assert stats["dropped"] == 3
+    assert [body["text"] for _, _, body in requests] == ["m0", "m1"]
+
+
+def test_disabled_without_credentials():
+    d = TelegramDispatcher(None, None)
+    asyncio.run(d.start())
+    assert not d.running and d.enqueue("x") is False
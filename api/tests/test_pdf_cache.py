@@ -0,0 +1,38 @@
+import time
+
+from services.pdf_cache import DiskStore
+
+
+def dir_bytes(path):
+    return sum(p.stat().st_size for p in path.glob("*.pdf"))
+
+
+def test_bound_is_shared_by_workers(tmp_path):
+    # Deux workers sur le même dossier : la borne vaut pour le dossier entier
+    a, b = DiskStore(tmp_path, 3000), DiskStore(tmp_path, 3000)
+    for i in range(10):
+        (a if i % 2 else b).put(f"k{i}", b"x" * 1000)
+        time.sleep(0.01)
+        assert dir_bytes(tmp_path) <= 3000
+    assert sorted(p.stem for p in tmp_path.glob("*.pdf")) == ["k7", "k8", "k9"]
+
+
+def test_entry_written_by_another_worker_is_adopted(tmp_path):
+    a, b = DiskStore(tmp_path, 10_000), DiskStore(tmp_path, 10_000)
+    a.put("shared", b"%PDF-1.7 data")
+    found = b.open("shared")
+    assert found is not None
+    fh, size = found
+    with fh:
+        assert fh.read() == b"%PDF-1.7 data" and size == 13
+    assert b.stats()["items"] == 1
+
+
+def test_entry_evicted_by_another_worker_is_a_miss(tmp_path):
+    a, b = DiskStore(tmp_path, 1500), DiskStore(tmp_path, 1500)
+    a.put("old", b"x" * 1000)
+    assert b.open("old") is not None
+    time.sleep(0.01)
+    b.put("new", b"y" * 1000)
+    assert a.open("old") is None
+    assert a.stats()["items"] == 0
@@ -0,0 +1,57 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import services.pdf_pool as pdf_pool_module
+from routers import pdf_export
+from services.pdf_pool import PdfRenderPool, PoolRestarted, RenderTimeout
+
+PAYLOAD = {"meta": {"title": "t"}, "summary": {"end": 1.0}}
+
+
+def post_export(monkeypatch, render):
+    # Cache vide, rendu remplacé : seule la traduction des erreurs est testée
+    monkeypatch.setattr(pdf_export.pdf_pool, "render", render)
+    monkeypatch.setattr(pdf_export.pdf_cache, "get_bytes", lambda key: None)
+    monkeypatch.setattr(pdf_export.pdf_cache, "open_disk", lambda key: None)
+    app = FastAPI()
+    app.include_router(pdf_export.router, prefix="/api")
+    return TestClient(app).post("/api/export-pdf", json=PAYLOAD)
+
+
+def test_broken_pool_is_retryable(monkeypatch):
+    # Pool tué par le délai d'une autre tâche : le rendu en cours voit BrokenProcessPool
+    def broken(data):
+        raise BrokenProcessPool("pool tué")
+
+    monkeypatch.setattr(pdf_pool_module, "_render", broken)
+    pool = PdfRenderPool(workers=1, max_queue=1, timeout=5.0)
+    pool._executor = ThreadPoolExecutor(max_workers=1)
+    with pytest.raises(PoolRestarted) as exc:
+        asyncio.run(pool.render(PAYLOAD))
+    assert exc.value.retry_after >= 1
+    assert pool.stats()["restarts"] == 1 and pool._executor is None
+
+
+@pytest.mark.parametrize("error", [
+    RenderTimeout("Rendu PDF > 30s", 4),
+    PoolRestarted("Rendu PDF interrompu (pool redémarré), réessayer", 4),
+])
+def test_pool_errors_are_503_with_retry_after(monkeypatch, error):
+    async def render(data):
+        raise error
+
+    response = post_export(monkeypatch, render)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "4"
+
+
+def test_render_errors_stay_400(monkeypatch):
+    async def render(data):
+        raise ValueError("gabarit invalide")
+
+    assert post_export(monkeypatch, render).status_code == 400
@@ -0,0 +1,105 @@
+import calendar
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from services.recurrence import (
+    BIWEEKLY,
+    EVERY_N_DAYS,
+    KINDS,
+    LAST_BUSINESS_DAY,
+    MONTHLY,
+    ONEOFF,
+    QUARTERLY,
+    WEEKLY,
+    YEARLY,
+    iter_occurrences,
+    occurrence_offsets,
+    occurrences,
+)
+
+# Formes closes (occurrences, occurrence_offsets) comparées à l'itérateur de
+# référence, qui parcourt toutes les périodes depuis l'ancrage.
+
+
+def reference(rec, anchor, window_start, window_end, every_days=None, until=None):
+    return [d for d in iter_occurrences(rec, anchor, window_end, every_days, until) if d >= window_start]
+
+
+def check(rec, anchor, window_start, window_end, every_days=None, until=None):
+    expected = reference(rec, anchor, window_start, window_end, every_days, until)
+    assert occurrences(rec, anchor, window_start, window_end, every_days, until) == expected
+    horizon = (window_end - window_start).days
+    offsets = occurrence_offsets(rec, anchor, window_start, horizon, every_days, until)
+    assert offsets == [(d - window_start).days for d in expected]
+    return expected
+
+
+@pytest.mark.parametrize("rec", [MONTHLY, QUARTERLY, YEARLY])
+@pytest.mark.parametrize("day", [29, 30, 31])
+@pytest.mark.parametrize("anchor_month", [1, 3, 8, 12])
+def test_calendar_kinds_anchored_at_month_end(rec, day, anchor_month):
+    anchor = date(2023, anchor_month, day)
+    # Fenêtre loin après l'ancrage, à cheval sur un février bissextile
+    expected = check(rec, anchor, date(2027, 11, 15), date(2030, 12, 31))
+    assert expected
+    for d in expected:
+        assert d.day == min(day, calendar.monthrange(d.year, d.month)[1])
+
+
+@pytest.mark.parametrize("day", [29, 30, 31])
+def test_month_end_anchor_does_not_drift(day):
+    anchor = date(2024, 1, day)
+    got = occurrences(MONTHLY, anchor, anchor, date(2024, 5, 31))
+    assert [d.day for d in got] == [day, 29, min(day, 31), min(day, 30), min(day, 31)]
+    check(MONTHLY, anchor, anchor, date(2024, 5, 31))
+
+
+@pytest.mark.parametrize("every_days", [1, 3, 10, 45])
+def test_every_n_days(every_days):
+    check(EVERY_N_DAYS, date(2020, 3, 7), date(2026, 1, 1), date(2026, 12, 31), every_days=every_days)
+
+
+@pytest.mark.parametrize("rec", [WEEKLY, BIWEEKLY, LAST_BUSINESS_DAY])
+def test_window_after_many_periods(rec):
+    # Des centaines de périodes entre l'ancrage et la fenêtre
+    check(rec, date(2001, 5, 31), date(2025, 2, 10), date(2025, 9, 30))
+
+
+def test_last_business_day_is_last_weekday_of_month():
+    got = check(LAST_BUSINESS_DAY, date(2024, 1, 1), date(2024, 1, 1), date(2024, 12, 31))
+    assert len(got) == 12
+    for d in got:
+        last = calendar.monthrange(d.year, d.month)[1]
+        assert d.weekday() < 5
+        assert all(d.replace(day=x).weekday() >= 5 for x in range(d.day + 1, last + 1))
+
+
+@pytest.mark.parametrize("rec", [r for r in KINDS if r != ONEOFF])
+def test_until_bounds_the_series(rec):
+    anchor = date(2022, 1, 31)
+    until = date(2024, 7, 15)
+    got = check(rec, anchor, date(2024, 1, 1), date(2025, 1, 1), every_days=9, until=until)
+    assert got and max(got) <= until
+    # Fin antérieure à la fenêtre : aucune occurrence
+    assert check(rec, anchor, date(2024, 8, 1), date(2025, 1, 1), every_days=9, until=until) == []
+
+
+def test_oneoff():
+    anchor = date(2025, 6, 30)
+    assert check(ONEOFF, anchor, date(2025, 6, 1), date(2025, 7, 1)) == [anchor]
+    assert check(ONEOFF, anchor, date(2025, 7, 1), date(2025, 8, 1)) == []
+    assert check(ONEOFF, anchor, date(2025, 6, 1), date(2025, 6, 29)) == []
+
+
+def test_randomized_against_reference():
+    rnd = random.Random(1234)
+    for _ in range(3000):
+        rec = rnd.choice(KINDS)
+        anchor = date(2000, 1, 1) + timedelta(days=rnd.randrange(9000))
+        window_start = anchor + timedelta(days=rnd.randrange(-400, 6000))
+        window_end = window_start + timedelta(days=rnd.randrange(0, 800))
+        until = window_start + timedelta(days=rnd.randrange(-200, 900)) if rnd.random() < 0.3 else None
+        every_days = rnd.randrange(1, 60)
+        check(rec, anchor, window_start, window_end, every_days, until)
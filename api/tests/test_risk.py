@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import calc
+from services.risk import MAX_CELLS
+
+BUDGET = {
+    "base": 1000,
+    "horizon_days": 365,
+    "entries": [
+        {"type": "income", "amount": 2000},
+        {"type": "expense", "amount": 900, "rec": "weekly", "cat": "variable"},
+    ],
+}
+
+
+def client():
+    app = FastAPI()
+    app.include_router(calc.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_simulations_are_capped_by_cell_budget():
+    r = client().post("/api/calc/risk", json={**BUDGET, "simulations": 100_000})
+    assert r.status_code == 200
+    meta = r.json()["meta"]
+    assert meta["capped"] is True
+    assert meta["simulations"] * (meta["horizon_days"] + 1) <= MAX_CELLS
+
+
+def test_risk_runs_on_calc_executor_and_is_reproducible():
+    c = client()
+    before = c.get("/api/calc/executor").json()["computed"]
+    first = c.post("/api/calc/risk", json={**BUDGET, "simulations": 300}).json()
+    second = c.post("/api/calc/risk", json={**BUDGET, "simulations": 300}).json()
+    assert c.get("/api/calc/executor").json()["computed"] == before + 2
+    assert first["bands"] == second["bands"]
@@ -0,0 +1,50 @@
+import pytest
+
+from services.sessions import CalcSession, InvalidPatch
+
+ENTRIES = [
+    {"type": "income", "amount": 2000.0, "rec": "monthly"},
+    {"type": "expense", "amount": 800.0, "rec": "monthly", "cat": "fixed"},
+]
+
+
+@pytest.fixture
+def session():
+    return CalcSession(1000.0, "€", 90, ENTRIES, {})
+
+
+def state(s):
+    return s.base, dict(s.entries), list(s.balances)
+
+
+@pytest.mark.parametrize(
+    "ops",
+    [
+        [{"op": "base"}],
+        [{"op": "base", "value": None}],
+        [{"op": "base", "value": "abc"}],
+        [{"op": "add"}],
+        [{"op": "add", "entry": "x"}],
+        [{"op": "update", "id": "0"}],
+        [{"op": "update", "id": "0", "entry": None}],
+        [{"op": "update", "id": "nope", "entry": ENTRIES[0]}],
+        [{"op": "remove", "id": "nope"}],
+        [{"op": "remove"}],
+        # Opération valide suivie d'une invalide : tout le patch est rejeté
+        [{"op": "base", "value": 5.0}, {"op": "remove", "id": "1"}, {"op": "base"}],
+    ],
+)
+def test_invalid_patch_changes_nothing(session, ops):
+    before = state(session)
+    with pytest.raises(InvalidPatch):
+        session.apply(ops)
+    assert state(session) == before
+
+
+def test_valid_patch_matches_fresh_session(session):
+    entry_id = next(iter(session.entries))
+    update = {"type": "expense", "amount": 50.0, "rec": "weekly", "cat": "variable"}
+    session.apply([{"op": "base", "value": 0}, {"op": "update", "id": entry_id, "entry": update}])
+    fresh = CalcSession(0.0, "€", 90, [update, ENTRIES[1]], {})
+    assert session.base == 0.0
+    assert session.balances == fresh.balances
@@ -0,0 +1,43 @@
+import io
+from datetime import date
+
+import pytest
+
+from services.statement import import_statement, parse_amount
+
+TODAY = date(2024, 7, 1)
+
+
+@pytest.mark.parametrize("text", ["nan", "NaN", "inf", "-inf", "Infinity", "(inf)"])
+def test_non_finite_amounts_are_rejected(text):
+    assert parse_amount(text) is None
+
+
+def test_non_finite_rows_are_skipped_csv():
+    csv_data = (
+        "Date;Libellé;Montant;Solde\n"
+        "03/06/2024;CB BOULANGERIE;-4,20;nan\n"
+        "02/06/2024;CB ERREUR EXPORT;nan;100,00\n"
+        "01/06/2024;CB ERREUR EXPORT;inf;100,00\n"
+        "01/06/2024;CB PHARMACIE;-12,50;104,20\n"
+    ).encode("utf-8")
+    result = import_statement(io.BytesIO(csv_data), today=TODAY)
+    assert result["stats"]["transactions"] == 2
+    assert result["stats"]["skipped"] == 2
+    assert result["everyday_spending"]["monthly"] == pytest.approx(16.70)
+    assert result["request"]["base"] == 104.20
+
+
+def test_non_finite_rows_are_skipped_ofx():
+    ofx = (
+        "OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKTRANLIST>\n"
+        "<STMTTRN><DTPOSTED>20240601<TRNAMT>-12.50<NAME>CB PHARMACIE</STMTTRN>\n"
+        "<STMTTRN><DTPOSTED>20240602<TRNAMT>NaN<NAME>CB ERREUR</STMTTRN>\n"
+        "<STMTTRN><DTPOSTED>20240603<TRNAMT>-Infinity<NAME>CB ERREUR</STMTTRN>\n"
+        "</BANKTRANLIST><LEDGERBAL><BALAMT>inf</LEDGERBAL></OFX>\n"
+    ).encode("ascii")
+    result = import_statement(io.BytesIO(ofx), today=TODAY)
+    assert result["stats"]["transactions"] == 1
+    assert result["stats"]["skipped"] == 2
+    assert result["request"]["base"] == 0.0
+    assert all(e["amount"] == e["amount"] and e["amount"] < float("inf") for e in result["request"]["entries"])
@@ -0,0 +1,34 @@
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.static_assets import StaticBundle, hashed_name
+
+SCRIPT = b"console.log('serenity');\n"
+STYLE = b"body { margin: 0; }\n"
+
+
+def test_absolute_references_get_the_mount_prefix(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_bytes(SCRIPT)
+    (tmp_path / "style.css").write_bytes(STYLE)
+    (tmp_path / "index.html").write_text(
+        '<script src="/js/app.js"></script>'
+        '<link href="/app/style.css" rel="stylesheet">'
+        '<link href="style.css" rel="stylesheet">'
+    )
+    bundle = StaticBundle(tmp_path, prefix="/app")
+    app = FastAPI()
+    app.mount("/app", bundle)
+    client = TestClient(app)
+
+    page = client.get("/app/").text
+    script, style = hashed_name("js/app.js", SCRIPT), hashed_name("style.css", STYLE)
+    assert f'src="/app/{script}"' in page
+    assert f'href="/app/{style}"' in page
+    assert f'href="{style}"' in page
+    # Chaque référence réécrite est servie sous le point de montage
+    for ref in re.findall(r'(?:src|href)="(/[^"]+)"', page):
+        r = client.get(ref)
+        assert r.status_code == 200 and "immutable" in r.headers["cache-control"]
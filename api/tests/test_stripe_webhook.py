@@ -0,0 +1,83 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import pro, stripe
+from services.billing import LicenseVerifier, RevocationList, stripe_signature
+
+FIXTURES = Path(__file__).resolve().parents[1] / "fixtures" / "stripe"
+WEBHOOK_SECRET = "whsec_test_serenity"
+LICENSE_SECRET = "license-test-secret"
+
+
+def load(name):
+    return (FIXTURES / name).read_bytes()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    revocations = RevocationList(tmp_path / "revoked.jsonl", check_interval=0.0)
+    verifier = LicenseVerifier(LICENSE_SECRET, revocations, ttl=60.0)
+    monkeypatch.setattr(stripe, "STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(stripe, "revocations", revocations)
+    monkeypatch.setattr(pro, "verifier", verifier)
+    app = FastAPI()
+    app.include_router(stripe.router, prefix="/api")
+    app.include_router(pro.router, prefix="/api")
+    c = TestClient(app)
+    c.verifier = verifier
+    return c
+
+
+def post_event(client, body, secret=WEBHOOK_SECRET):
+    signature = stripe_signature(body, secret, int(time.time()))
+    return client.post(
+        "/api/stripe/webhook",
+        content=body,
+        headers={"Stripe-Signature": signature, "Content-Type": "application/json"},
+    )
+
+
+@pytest.mark.parametrize("fixture", ["charge_refunded.json", "subscription_deleted.json"])
+def test_revoking_event_then_replay(client, fixture):
+    body = load(fixture)
+    license_id = json.loads(body)["data"]["object"]["metadata"]["license_id"]
+    key = client.verifier.issue(license_id, "client@example.com")
+    assert client.get("/api/license", headers={"X-License-Key": key}).status_code == 200
+
+    r = post_event(client, body)
+    assert r.status_code == 200 and r.json() == {"status": "revoked"}
+    # Stripe rejoue les événements : sans effet la seconde fois
+    r = post_event(client, body)
+    assert r.status_code == 200 and r.json() == {"status": "duplicate"}
+
+    r = client.get("/api/license", headers={"X-License-Key": key})
+    assert r.status_code == 403
+
+
+def test_checkout_is_ignored(client):
+    r = post_event(client, load("checkout_completed.json"))
+    assert r.status_code == 200 and r.json() == {"status": "ignored"}
+
+
+def test_bad_signature_is_rejected(client):
+    body = load("charge_refunded.json")
+    assert post_event(client, body, secret="whsec_wrong").status_code == 400
+    r = client.post("/api/stripe/webhook", content=body)
+    assert r.status_code == 400
+    # Rien n'a été révoqué
+    assert post_event(client, body).json() == {"status": "revoked"}
+
+
+@pytest.mark.parametrize("key", ["SW1.é.é", "SW1.eyJsaWQiOiJ4In0.sïgnature", "clé-invalide"])
+def test_non_ascii_license_key_is_refused(client, key):
+    # Starlette décode les en-têtes en latin-1 : un caractère accentué arrive tel quel
+    raw = key.encode("latin-1")
+    r = client.get("/api/license", headers=[(b"x-license-key", raw)])
+    assert r.status_code == 403
+    r = client.get("/api/license", headers=[(b"authorization", b"Bearer " + raw)])
+    assert r.status_code == 403